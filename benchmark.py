@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Script đo hiệu năng các phần xử lý nội bộ của bot (không cần kết nối Discord)
+"""
+
+import sys
+import time
+
+def _timed(label, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    print(f"• {label}: {elapsed * 1000:.2f} ms")
+    return result
+
+def bench_send_plan(project_count=5000, partner_count=250):
+    """Đo chi phí lập plan gửi cho !send -all với project_count projects"""
+    from modules.send_plan import build_send_plan
+
+    print(f"📊 Send plan: {project_count} projects / {partner_count} partners")
+    projects_per_partner = project_count // partner_count
+    partner_entries = []
+    channels = {}
+    for pid in range(partner_count):
+        partner = {'partner_id': pid, 'partner_name': f'partner_{pid}'}
+        projects = []
+        for i in range(projects_per_partner):
+            project_id = pid * projects_per_partner + i
+            channel_id = 10**17 + project_id
+            channels[channel_id] = object()
+            projects.append({'project_id': project_id, 'project_name': f'proj{project_id:06d}', 'channel_id': str(channel_id)})
+        partner_entries.append((partner, projects, projects))
+
+    # Cách cũ: với mỗi project quét lại toàn bộ partners để tìm partner
+    def legacy_lookup():
+        all_projects = [p for _, projects, _ in partner_entries for p in projects]
+        for project in all_projects:
+            for partner, projects, _ in partner_entries:
+                if any(p['project_id'] == project['project_id'] for p in projects):
+                    break
+
+    _timed("legacy partner lookup", legacy_lookup)
+    targets, missing = _timed(
+        "build_send_plan",
+        build_send_plan,
+        partner_entries,
+        "Benchmark message",
+        lambda channel_id: channels.get(int(channel_id)),
+        lambda partner_id: f"Dear @partner_{partner_id},"
+    )
+    print(f"  → {len(targets)} targets, {len(missing)} missing")
+
+def bench_loop_lag(command_count=20, row_count=200000):
+    """Đo độ trễ event loop khi nhiều lệnh chạy query nặng cùng lúc"""
+    import asyncio
+    import os
+    import sqlite3
+    import tempfile
+    from modules import db_utils
+    from modules.loop_monitor import monitor_loop_lag, get_loop_lag_stats
+
+    print(f"📊 Event loop lag: {command_count} concurrent commands, {row_count} messages")
+    workdir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        conn = sqlite3.connect('bot_database.db')
+        conn.execute('CREATE TABLE messages (message_id INTEGER PRIMARY KEY, content TEXT, timestamp TEXT)')
+        conn.executemany('INSERT INTO messages (content, timestamp) VALUES (?, ?)',
+                         ((f'message {i}', f'2024-01-01T00:00:{i % 60:02d}') for i in range(row_count)))
+        conn.commit()
+        conn.close()
+
+        def heavy_query(conn):
+            cur = conn.cursor()
+            cur.execute('SELECT content FROM messages ORDER BY timestamp DESC, content LIMIT 50')
+            return cur.fetchall()
+
+        async def blocking_command():
+            # Cách cũ: mở kết nối và query đồng bộ ngay trên event loop
+            conn = sqlite3.connect('bot_database.db')
+            try:
+                heavy_query(conn)
+            finally:
+                conn.close()
+            await asyncio.sleep(0)
+
+        async def offloaded_command():
+            await db_utils.db_read(heavy_query)
+
+        async def run(command):
+            get_loop_lag_stats(reset=True)
+            monitor = asyncio.create_task(monitor_loop_lag(interval=0.01, warn_threshold=None))
+            await asyncio.sleep(0.05)
+            await asyncio.gather(*(command() for _ in range(command_count)))
+            monitor.cancel()
+            return get_loop_lag_stats()
+
+        for label, command in (("sync on loop", blocking_command), ("db_read", offloaded_command)):
+            stats = asyncio.run(run(command))
+            print(f"• {label}: max lag {stats['max'] * 1000:.1f} ms, avg {stats['avg'] * 1000:.1f} ms")
+    finally:
+        os.chdir(cwd)
+
+def bench_partner_list(partner_count=1000, projects_per_partner=5):
+    """So sánh số query và thời gian tải danh sách partners: N+1 cũ và hai query gộp"""
+    import sqlite3
+    from modules.migrations import apply_migrations
+    from modules.partner_summary import load_partner_summaries
+
+    print(f"📊 Partner list: {partner_count} partners x {projects_per_partner} projects")
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    apply_migrations(conn)
+    conn.executemany('INSERT INTO partners (partner_id, partner_name, server_id) VALUES (?, ?, ?)',
+                     [(pid, f'partner_{pid:04d}', str(pid)) for pid in range(1, partner_count + 1)])
+    conn.executemany('INSERT INTO projects (partner_id, project_name, project_code, channel_id) VALUES (?, ?, ?, ?)',
+                     [(pid, f'proj{pid:04d}-{i}', f'proj{pid:04d}'[:6], str(pid * 100 + i))
+                      for pid in range(1, partner_count + 1) for i in range(projects_per_partner)])
+    conn.executemany('INSERT INTO partner_discord_users (partner_id, discord_username, tag_type) VALUES (?, ?, ?)',
+                     [(pid, f'<@{pid}{i}>', 'user_mention') for pid in range(1, partner_count + 1) for i in range(2)])
+    conn.commit()
+
+    statements = []
+    conn.set_trace_callback(statements.append)
+
+    # Cách cũ: GROUP_CONCAT rồi một query Discord users cho mỗi partner
+    def legacy_list():
+        rows = conn.execute('''
+            SELECT pt.partner_id, GROUP_CONCAT(p.project_name, ', ') as projects
+            FROM partners pt
+            LEFT JOIN projects p ON pt.partner_id = p.partner_id
+            GROUP BY pt.partner_id
+        ''').fetchall()
+        for row in rows:
+            conn.execute('SELECT discord_username FROM partner_discord_users WHERE partner_id = ?',
+                         (row['partner_id'],)).fetchall()
+
+    for label, fn in (("legacy N+1", legacy_list), ("load_partner_summaries", lambda: load_partner_summaries(conn))):
+        statements.clear()
+        _timed(label, fn)
+        print(f"  → {len(statements)} queries")
+    conn.close()
+
+def bench_time_format(count=100000):
+    """So sánh format_time_with_timezones: parse offset mỗi lần (cũ), ISO string và epoch ms"""
+    from datetime import datetime, timedelta, timezone
+    from modules.utils import format_time_with_timezones
+    from modules.timezones import to_epoch_ms
+
+    print(f"📊 Time format: {count} rows, 2 timezones each")
+    base = datetime(2026, 1, 1)
+    iso_values = [(base + timedelta(seconds=i * 37)).isoformat() for i in range(count)]
+    epoch_values = [to_epoch_ms(value) for value in iso_values]
+
+    # Cách cũ: parse ISO và tạo lại timezone từ chuỗi offset cho mỗi dòng
+    def legacy_format(utc_timestamp, my_timezone, partner_timezone):
+        utc_time = datetime.fromisoformat(utc_timestamp.replace('Z', '+00:00'))
+        if utc_time.tzinfo is None:
+            utc_time = utc_time.replace(tzinfo=timezone.utc)
+        result = []
+        for tz in (my_timezone, partner_timezone):
+            offset = timedelta(hours=int(tz[1:3]), minutes=int(tz[4:6]))
+            offset = offset if tz.startswith('+') else -offset
+            result.append(f"{utc_time.astimezone(timezone(offset)).strftime('%Y-%m-%d %H:%M:%S')} ({tz})")
+        return '\n'.join(result)
+
+    _timed("legacy (parse offsets per row)", lambda: [legacy_format(v, '+07:00', '+05:30') for v in iso_values])
+    _timed("ISO string, cached tzinfo", lambda: [format_time_with_timezones(v, '+07:00', '+05:30') for v in iso_values])
+    _timed("epoch ms, cached tzinfo", lambda: [format_time_with_timezones(v, '+07:00', '+05:30') for v in epoch_values])
+
+BENCHMARKS = {
+    'send_plan': bench_send_plan,
+    'loop_lag': bench_loop_lag,
+    'partner_list': bench_partner_list,
+    'time_format': bench_time_format,
+}
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
+        print()
+
+if __name__ == "__main__":
+    main()
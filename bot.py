@@ -1,6 +1,5 @@
 import os
 import discord
-import sqlite3
 from dotenv import load_dotenv
 import shlex
 from datetime import datetime, timezone, timedelta
@@ -18,18 +17,35 @@ from modules.project import (
 )
 from modules.message import (
     handle_send, handle_list_messages, handle_message_status, 
-    handle_reply_rules, handle_status_reply
+    handle_reply_rules, handle_status_reply, resume_send_jobs
 )
+from modules.outbox import recover_interrupted_items
+from modules.registry import load_registry
+from modules.tracked_messages import load_tracked_messages, is_tracked_message
+from modules.schedule import handle_schedule, send_scheduled
+from modules.template import handle_template
+from modules.history import handle_history
+from modules.project_sync import (
+    project_channel_changed, project_channel_updated, project_channel_deleted, run_project_reconciler
+)
+from modules.scheduler import run_scheduler
 from modules.project_update import handle_update_projects
+from modules.db_utils import get_db_connection, close_all_connections
+from modules.logger import log_action, set_log_level, get_log_level
+from modules.migrations import apply_migrations
+from modules.loop_monitor import monitor_loop_lag, get_loop_lag_stats
+from modules.router import register_command, dispatch, get_command_stats
+from modules.channel_index import (
+    build_channel_index, index_guild, remove_guild, index_channel, remove_channel
+)
 
 # Tải biến môi trường từ file .env
 load_dotenv()
 TOKEN = os.getenv('DISCORD_TOKEN')
-print(f"Token loaded: {'Yes' if TOKEN else 'No'}")
+log_action("INFO", f"Token loaded: {'Yes' if TOKEN else 'No'}")
 if not TOKEN:
     raise ValueError("Không tìm thấy DISCORD_TOKEN trong file .env hoặc biến môi trường!\nHãy chắc chắn rằng bạn đã tạo file .env với dòng: DISCORD_TOKEN=token_cua_ban")
 
-DATABASE = 'bot_database.db'
 
 # Hàm lấy thời gian Việt Nam
 def get_vietnam_time():
@@ -42,31 +58,6 @@ def normalize_name(name):
     """Chuẩn hóa tên để tránh xung đột"""
     return name.strip().lower().replace(' ', '_')
 
-def find_partner_by_name_or_username(conn, identifier):
-    """Tìm partner theo tên hoặc discord username"""
-    cur = conn.cursor()
-    
-    # Thử tìm theo partner_name
-    cur.execute('''
-        SELECT partner_id, partner_name, server_id, timezone, discord_username, tag_type
-        FROM partners 
-        WHERE partner_name = ?
-    ''', (identifier,))
-    partner = cur.fetchone()
-    
-    if partner:
-        return partner
-    
-    # Nếu không tìm thấy, thử tìm theo discord_username
-    cur.execute('''
-        SELECT partner_id, partner_name, server_id, timezone, discord_username, tag_type
-        FROM partners 
-        WHERE discord_username = ?
-    ''', (identifier,))
-    partner = cur.fetchone()
-    
-    return partner
-
 # Hàm format timezone thành UTC+/- format
 def format_timezone_display(timezone_str):
     """Format timezone string thành UTC+/- format"""
@@ -119,126 +110,83 @@ def validate_message_content(content):
     
     return True, ""
 
-# Hàm tạo tag message
-def create_tag_message(partner_info):
-    """Tạo tag message dựa trên cấu hình partner"""
-    # sqlite3.Row objects use bracket notation, not .get() method
-    discord_username = partner_info['discord_username'] if 'discord_username' in partner_info.keys() else None
-    
-    # Nếu có discord_username thì tag trực tiếp, nếu không thì dùng @everyone
-    if discord_username:
-        # Xử lý cả user ID mention và username thường
-        if discord_username.startswith('<@') and discord_username.endswith('>'):
-            # Đây là user ID mention, giữ nguyên để Discord tự động resolve
-            return discord_username
-        else:
-            # Đây là username thường, thêm @ nếu chưa có
-            clean_username = discord_username.replace('@', '')
-            return f"@{clean_username}"
-    else:
-        return "@everyone"
-
-# Hàm logging
-def log_action(action, details=""):
-    timestamp = get_vietnam_time().strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = f"[{timestamp}] {action}: {details}"
-    print(log_entry)
-    
-    # Lưu vào file log
-    try:
-        with open('bot_log.txt', 'a', encoding='utf-8') as f:
-            f.write(log_entry + '\n')
-    except:
-        pass
-
-# Kết nối tới database và tạo bảng
-def get_db_connection():
-    """Tạo kết nối database với migration tự động"""
-    conn = sqlite3.connect('bot_database.db')
-    conn.row_factory = sqlite3.Row  # Cho phép truy cập bằng tên cột
-    cur = conn.cursor()
-    
-    # Tạo bảng partners
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS partners (
-            partner_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            partner_name TEXT NOT NULL,
-            server_id TEXT NOT NULL,
-            discord_username TEXT,
-            timezone TEXT DEFAULT '+07:00',
-            tag_type TEXT DEFAULT 'everyone',
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(partner_name, server_id)
-        )
-    ''')
-    
-    # Tạo bảng projects
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS projects (
-            project_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            project_name TEXT NOT NULL,
-            partner_id INTEGER NOT NULL,
-            channel_id TEXT NOT NULL,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (partner_id) REFERENCES partners (partner_id) ON DELETE CASCADE,
-            UNIQUE(project_name, partner_id)
-        )
-    ''')
-    
-    # Tạo bảng messages
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS messages (
-            message_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            partner_id INTEGER NOT NULL,
-            project_id INTEGER NOT NULL,
-            content TEXT NOT NULL,
-            discord_message_id TEXT,
-            status TEXT DEFAULT 'sent',
-            reply_status TEXT DEFAULT 'pending',
-            reply_timestamp TEXT,
-            timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (partner_id) REFERENCES partners (partner_id) ON DELETE CASCADE,
-            FOREIGN KEY (project_id) REFERENCES projects (project_id) ON DELETE CASCADE
-        )
-    ''')
-    
-    # Tạo bảng schedules
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS schedules (
-            schedule_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            partner_id INTEGER NOT NULL,
-            project_id INTEGER NOT NULL,
-            content TEXT NOT NULL,
-            scheduled_for TEXT NOT NULL,
-            status TEXT DEFAULT 'pending',
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (partner_id) REFERENCES partners (partner_id) ON DELETE CASCADE,
-            FOREIGN KEY (project_id) REFERENCES projects (project_id) ON DELETE CASCADE
-        )
-    ''')
-    
-    # Tạo bảng templates
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS templates (
-            template_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            template_name TEXT NOT NULL UNIQUE,
-            template_content TEXT NOT NULL,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
+# Áp dụng migration một lần khi khởi động (kết nối dùng chung từ modules.db_utils)
+def init_database():
+    """Đưa schema database lên phiên bản mới nhất"""
+    conn = get_db_connection()
+    applied = apply_migrations(conn)
+    for version, name in applied:
+        log_action("INFO", f"Đã áp dụng migration {version}: {name}")
+    interrupted = recover_interrupted_items(conn)
     conn.commit()
-    return conn
+    if interrupted:
+        log_action("INFO", f"{interrupted} outbox item(s) bị ngắt giữa chừng được đánh dấu unknown")
+    # Nạp registry partners/projects để các lệnh tra cứu từ bộ nhớ
+    log_action("INFO", f"Registry: {load_registry(conn)} partner(s)")
+    log_action("INFO", f"Tracking {load_tracked_messages(conn)} sent message(s) for status replies")
 
 # Cấu hình Intents
 intents = discord.Intents.default()
 intents.message_content = True
 client = discord.Client(intents=intents)
+loop_monitor_task = None
+resume_task = None
+scheduler_task = None
+reconcile_task = None
 
 @client.event
 async def on_ready():
-    print(f'Bot đã đăng nhập với tên {client.user}')
-    print('Bot đang sử dụng cấu trúc modular mới!')
+    log_action("INFO", f'Bot đã đăng nhập với tên {client.user}')
+    log_action("INFO", 'Bot đang sử dụng cấu trúc modular mới!')
+    channel_count = build_channel_index(client)
+    log_action("INFO", f'Đã index {channel_count} channels trong {len(client.guilds)} servers')
+    
+    # on_ready có thể chạy lại khi reconnect, chỉ tạo task theo dõi loop một lần
+    global loop_monitor_task, resume_task, scheduler_task, reconcile_task
+    started = []
+    if loop_monitor_task is None:
+        loop_monitor_task = asyncio.create_task(monitor_loop_lag())
+        started.append('loop monitor')
+    # Gửi tiếp các !send dang dở trước lần restart (chỉ một lần, sau khi index channel xong)
+    if resume_task is None:
+        resume_task = asyncio.create_task(resume_send_jobs(client))
+        started.append('outbox resume')
+    if scheduler_task is None:
+        scheduler_task = asyncio.create_task(run_scheduler(lambda schedule_ids: send_scheduled(schedule_ids, client)))
+        started.append('scheduler')
+    if reconcile_task is None:
+        reconcile_task = asyncio.create_task(run_project_reconciler(client))
+        started.append('project reconciler')
+    if started:
+        log_action("INFO", f"Đã khởi động task nền: {', '.join(started)}")
+
+# Giữ channel index và projects luôn cập nhật theo các sự kiện guild/channel
+@client.event
+async def on_guild_join(guild):
+    index_guild(guild)
+
+@client.event
+async def on_guild_available(guild):
+    index_guild(guild)
+
+@client.event
+async def on_guild_remove(guild):
+    remove_guild(guild)
+
+@client.event
+async def on_guild_channel_create(channel):
+    index_channel(channel)
+    await project_channel_changed(channel)
+
+@client.event
+async def on_guild_channel_update(before, after):
+    index_channel(after)
+    await project_channel_updated(before, after)
+
+@client.event
+async def on_guild_channel_delete(channel):
+    remove_channel(channel)
+    await project_channel_deleted(channel)
 
 @client.event
 async def on_message(message):
@@ -247,55 +195,53 @@ async def on_message(message):
         return
 
     try:
-        # Xử lý reply vào tin nhắn của bot để update status
+        # Xử lý reply vào tin nhắn của bot để update status; reply vào tin không được
+        # tracking bị loại ngay bằng set trong bộ nhớ, không query DB
         if message.reference and message.reference.resolved:
-            await handle_status_reply(message)
-            return
-        
-        # Xử lý các lệnh partner
-        if message.content.startswith('!add_partner'):
-            await handle_add_partner(message)
-        elif message.content.startswith('!list_partners') or message.content.startswith('!list_partner'):
-            await handle_list_partners(message)
-        elif message.content.startswith('!info_partner'):
-            await handle_info_partner(message)
-        elif message.content.startswith('!set_timezone'):
-            await handle_set_timezone(message)
-        elif message.content.startswith('!delete_partner'):
-            await handle_delete_partner(message)
-        elif message.content.startswith('!update_discord_user'):
-            await handle_update_discord_user(message)
-        
-        # Xử lý các lệnh project
-        elif message.content.startswith('!list_projects'):
-            await handle_list_projects(message)
-        elif message.content.startswith('!info_project'):
-            await handle_info_project(message)
-        elif message.content.startswith('!delete_project'):
-            await handle_delete_project(message)
-        elif message.content.startswith('!update_projects'):
-            await handle_update_projects(message)
-        
-        # Xử lý các lệnh message
-        elif message.content.startswith('!send'):
-            await handle_send(message)
-        elif message.content.startswith('!list'):
-            await handle_list_messages(message)
-        elif message.content.startswith('!message_status'):
-            await handle_message_status(message)
-        elif message.content.startswith('!reply_rules'):
-            await handle_reply_rules(message)
-        
-        # Lệnh help
-        elif message.content.startswith('!help'):
-            await handle_help(message)
+            if is_tracked_message(message.reference.message_id):
+                await handle_status_reply(message)
+                return
         
+        # Lệnh được tra trong bảng COMMANDS, tin nhắn thường trả về ngay
+        await dispatch(message)
+
     except Exception as e:
         error_msg = f"Error: {str(e)}"
-        print(f"Error in on_message: {e}")
+        log_action("ERROR", f"Error in on_message: {e}")
         traceback.print_exc()
         await message.channel.send(error_msg)
 
+# Hàm xử lý lệnh !log_level - đổi mức log khi bot đang chạy
+async def handle_log_level(message):
+    """Handle !log_level [DEBUG|INFO|WARNING|ERROR] command"""
+    parts = message.content.split()
+    if len(parts) < 2:
+        await message.channel.send(f"📝 Current log level: `{get_log_level()}`")
+        return
+    if not set_log_level(parts[1]):
+        await message.channel.send("❌ Invalid log level. Use one of: DEBUG, INFO, WARNING, ERROR")
+        return
+    log_action("LOG_LEVEL", f"Log level set to {get_log_level()} by {message.author}")
+    await message.channel.send(f"✅ Log level set to `{get_log_level()}`")
+
+# Hàm xử lý lệnh !stats - thống kê độ trễ từng lệnh và event loop
+async def handle_stats(message):
+    """Handle !stats [-reset] command"""
+    reset = '-reset' in message.content.split()
+    command_stats = get_command_stats(reset=reset)
+    lag = get_loop_lag_stats(reset=reset)
+
+    response = "**📈 Bot Stats:**\n\n"
+    response += f"**Event loop lag:** avg {lag['avg'] * 1000:.1f} ms, max {lag['max'] * 1000:.1f} ms ({lag['samples']} samples)\n\n"
+    if command_stats:
+        response += "**Commands:**\n"
+        for name, stats in sorted(command_stats.items(), key=lambda item: -item[1]['calls']):
+            response += (f"• `{name}` - {stats['calls']} calls, {stats['errors']} errors, "
+                         f"avg {stats['avg'] * 1000:.0f} ms, max {stats['max'] * 1000:.0f} ms\n")
+    else:
+        response += "No commands recorded yet."
+    await message.channel.send(response)
+
 # Hàm xử lý lệnh !help
 async def handle_help(message):
     """Handle !help command (English)"""
@@ -318,9 +264,19 @@ async def handle_help(message):
 **💬 Message Commands:**
 • `!send -p <partner> | <content>` - Send message to ALL projects of partner
 • `!send -p <partner> -c <channel1> -c <channel2> | <content>` - Send message to specific projects
-• `!list [-p partner] [-c project] [-all]` - Track messages
+• `!list [-p partner] [-c project_code] [-all] [-before cursor]` - Track messages (paged)
+• `!history [-p partner] [-c code] [-s status] [-from date] [-to date] [-replied|-unreplied]` - Search message history (`!history help`)
 • `!message_status <partner> <project> <status>` - Update status
+• `!message_status <partner> -all <status>` / `!message_status -b <broadcast_id> <status>` - Advance many messages at once
 • `!reply_rules` - Partner reply instructions
+• `!schedule <YYYY-MM-DD> <HH:MM> -p <partner> [-c <channel>] | <content>` - Schedule a send (partner local time)
+• `!schedule list` / `!schedule cancel <id>` - Manage scheduled sends
+• `!template add <name> | <content>` / `!template list` / `!template delete <name>` - Manage templates
+• `!send -t <name> -p <partner> [| <message>]` - Send a template (`{partner}`, `{project}`, `{project_code}`, `{partner_time}`, `{message}`)
+
+**🛠️ Admin Commands:**
+• `!log_level [DEBUG|INFO|WARNING|ERROR]` - Show or change the log level
+• `!stats [-reset]` - Command latency/error counters and event loop lag
 
 **📊 Status Types:**
 • `request` → `order received` → `build sent` → `test pass` → `release app`
@@ -351,5 +307,40 @@ Partners can reply to bot messages to automatically update status through the wo
 """
     await message.channel.send(help_text)
 
+# Bảng lệnh: tên lệnh -> (handler, alias...)
+COMMANDS = {
+    # Partner
+    '!add_partner': (handle_add_partner,),
+    '!list_partners': (handle_list_partners, '!list_partner'),
+    '!info_partner': (handle_info_partner,),
+    '!set_timezone': (handle_set_timezone,),
+    '!delete_partner': (handle_delete_partner,),
+    '!update_discord_user': (handle_update_discord_user,),
+    # Project
+    '!list_projects': (handle_list_projects,),
+    '!info_project': (handle_info_project,),
+    '!delete_project': (handle_delete_project,),
+    '!update_projects': (handle_update_projects,),
+    # Message
+    '!send': (handle_send,),
+    '!list': (handle_list_messages, '!list_messages'),
+    '!message_status': (handle_message_status,),
+    '!history': (handle_history,),
+    '!reply_rules': (handle_reply_rules,),
+    '!schedule': (handle_schedule,),
+    '!template': (handle_template,),
+    # Quản trị
+    '!log_level': (handle_log_level,),
+    '!stats': (handle_stats,),
+    '!help': (handle_help,),
+}
+
+for command_name, (command_handler, *command_aliases) in COMMANDS.items():
+    register_command(command_name, command_handler, *command_aliases)
+
 if __name__ == "__main__":
-    client.run(TOKEN) 
\ No newline at end of file
+    init_database()
+    try:
+        client.run(TOKEN)
+    finally:
+        close_all_connections() 
\ No newline at end of file
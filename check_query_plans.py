@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Script kiểm tra EXPLAIN QUERY PLAN của các query tra cứu chính.
+Thoát với mã lỗi 1 nếu có query phải quét toàn bộ bảng (full table scan).
+"""
+
+import re
+import sqlite3
+import sys
+from modules.migrations import apply_migrations
+from modules.status import TEST_PASS, transition_sources
+import modules.queries as q
+
+def _in(count):
+    return ','.join('?' * count)
+
+def _transition(condition, params, to_code=TEST_PASS):
+    sources = transition_sources(to_code)
+    sql = q.MESSAGE_TRANSITION_SQL.format(condition=condition, sources=_in(len(sources)))
+    return sql, ('test pass', to_code, 1, None, *params, *sources)
+
+NOW_MS = 1900000000000
+SUMMARY_WHERE = q.PARTNER_IDS_WHERE.format(placeholders=_in(2))
+
+# (tên, query, params) - chính các query handlers chạy (modules/queries.py) với params mẫu
+HOT_QUERIES = [
+    ('status reply lookup', q.MESSAGES_BY_DISCORD_ID_SQL, ('1',)),
+    ('status reply', *_transition(q.MESSAGE_ID_CONDITION, (1,))),
+    ('status reply with broadcast siblings', *_transition(q.REPLY_SIBLINGS_CONDITION, (1, 1, 1))),
+    ('message_status partner -all', *_transition(q.PARTNER_LATEST_MESSAGES_CONDITION, (1,))),
+    ('message_status broadcast', *_transition(q.BROADCAST_CONDITION, (1,))),
+    ('message_status broadcast count', q.BROADCAST_COUNT_SQL, (1,)),
+    ('message_status project by name', q.PROJECT_BY_NAME_SQL, (1, 'a')),
+    ('send report job items', q.OUTBOX_JOB_ITEMS_SQL, (1,)),
+    ('message_status latest message', q.LATEST_MESSAGE_STATUS_SQL, ('test pass', TEST_PASS, 1, 1)),
+    ('history all (next page)', *q.history_query(q.HistoryFilter(), 26, (NOW_MS, 100))),
+    ('history by partner (next page)', *q.history_query(q.HistoryFilter(partner_ids=[1]), 26, (NOW_MS, 100))),
+    ('history by project code and date range',
+     *q.history_query(q.HistoryFilter(project_codes=['abc123'], since=1767200400000, until=1769878800000), 26)),
+    ('list_projects (all partners)', q.ALL_PROJECTS_SQL, ()),
+    ('delete_project lookup', q.PROJECT_WITH_PARTNER_BY_NAME_SQL, ('a',)),
+    ('delete_project messages', q.DELETE_PROJECT_MESSAGES_SQL, (1,)),
+    ('delete_project', q.DELETE_PROJECT_SQL, (1,)),
+    ('project by code in partner', q.PROJECT_BY_CODE_SQL, (1, 'abc123')),
+    ('list_projects partner projects', q.PARTNER_PROJECT_LIST_SQL, (1,)),
+    ('info_project in partner', q.PROJECT_INFO_IN_PARTNER_SQL, (1, 'abc123')),
+    ('info_project (all partners)', q.PROJECT_INFO_SQL, ('abc123',)),
+    ('info_project stats', q.PROJECT_STATUS_COUNTS_SQL, (1,)),
+    ('info_project recent messages', q.PROJECT_RECENT_MESSAGES_SQL, (1,)),
+    ('partners of a server', q.SERVER_PARTNERS_SQL, ('1',)),
+    ('partner projects', q.PARTNER_CHANNEL_PROJECTS_SQL, (1,)),
+    ('rename channel project', q.RENAME_CHANNEL_PROJECT_SQL, ('a', 'a', '1')),
+    ('insert channel project', q.INSERT_CHANNEL_PROJECT_SQL, (1, 'a', 'a', '1', 1, '1')),
+    ('delete channel project', q.DELETE_CHANNEL_PROJECT_SQL, ('1',)),
+    ('partner in server', q.PARTNER_IN_SERVER_SQL, ('a', '1')),
+    ('delete_partner outbox items', q.FAIL_PARTNER_OUTBOX_ITEMS_SQL, (0, 1)),
+    ('delete_partner schedules', q.CANCEL_PARTNER_SCHEDULES_SQL, (1,)),
+    ('delete_partner messages', q.DELETE_PARTNER_MESSAGES_SQL, (1,)),
+    ('delete_partner projects', q.DELETE_PARTNER_PROJECTS_SQL, (1,)),
+    ('delete_partner users', q.DELETE_PARTNER_USERS_SQL, (1,)),
+    ('delete_partner', q.DELETE_PARTNER_SQL, (1,)),
+    ('info_partner stats', q.PARTNER_STATUS_COUNTS_SQL, (1,)),
+    ('info_partner recent messages', q.PARTNER_RECENT_MESSAGES_SQL, (1,)),
+    ('partner summary', q.PARTNER_SUMMARY_SQL.format(where=SUMMARY_WHERE), (1, 2)),
+    ('partner summary users', q.PARTNER_SUMMARY_USERS_SQL.format(where=SUMMARY_WHERE), (1, 2)),
+    ('outbox pending items', q.OUTBOX_PENDING_ITEMS_SQL, (1, 0, 50)),
+    ('outbox mark sending', q.OUTBOX_MARK_SENDING_SQL, (0, 1)),
+    ('outbox mark sent', q.OUTBOX_MARK_SENT_SQL, ('1', 0, 1)),
+    ('outbox sent message', q.INSERT_SENT_MESSAGE_SQL, (1, 1, 'x', '1', 'request', 0, 0, 1)),
+    ('outbox mark failed', q.OUTBOX_MARK_FAILED_SQL, ('x', 0, 1)),
+    ('outbox finish job', q.OUTBOX_FINISH_JOB_SQL, (0, 1)),
+    ('outbox pending jobs', q.OUTBOX_PENDING_JOBS_SQL, ()),
+    ('outbox recover sending', q.OUTBOX_RECOVER_SENDING_SQL, (0,)),
+    ('due schedules', q.DUE_SCHEDULES_SQL.format(placeholders=_in(2)), (1, 2)),
+    ('scheduled send pending projects', q.PENDING_SCHEDULE_PROJECTS_SQL.format(placeholders=_in(2)), (1, 2)),
+    ('scheduled send mark sent', q.MARK_SCHEDULES_SENT_SQL.format(placeholders=_in(2)), (1, 2)),
+    ('schedule cancel', q.CANCEL_SCHEDULES_SQL.format(placeholders=_in(2)), (1, 2)),
+    ('pending schedules', q.PENDING_SCHEDULE_LIST_SQL, (20,)),
+    ('template by name', q.TEMPLATE_BY_NAME_SQL, ('a',)),
+]
+
+# "SCAN <bảng>" không kèm index nghĩa là quét toàn bộ bảng
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+def find_full_scans(conn, queries=HOT_QUERIES):
+    """Trả về list (tên query, chi tiết plan) của các query bị full table scan"""
+    problems = []
+    for name, query, params in queries:
+        for row in conn.execute('EXPLAIN QUERY PLAN ' + query, params):
+            detail = row[-1]
+            if FULL_SCAN.match(detail):
+                problems.append((name, detail))
+    return problems
+
+def main():
+    conn = sqlite3.connect(':memory:')
+    apply_migrations(conn)
+    problems = find_full_scans(conn)
+    if problems:
+        for name, detail in problems:
+            print(f"❌ {name}: {detail}")
+        return 1
+    print(f"✅ {len(HOT_QUERIES)} queries dùng index, không có full table scan")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -23,6 +23,8 @@ def clear_database():
         
         # Xóa data từ các bảng theo thứ tự để tránh lỗi foreign key
         tables_to_clear = [
+            'outbox_items',
+            'outbox_jobs',
             'messages',
             'schedules', 
             'templates',
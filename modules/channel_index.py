@@ -0,0 +1,37 @@
+# Index channel_id -> channel object cho mọi server mà bot tham gia
+_channels = {}
+
+def build_channel_index(client):
+    """Xây lại toàn bộ index từ client.guilds (gọi trong on_ready)"""
+    _channels.clear()
+    for guild in client.guilds:
+        index_guild(guild)
+    return len(_channels)
+
+def index_guild(guild):
+    """Thêm tất cả channels của một guild vào index"""
+    for channel in guild.channels:
+        _channels[channel.id] = channel
+
+def remove_guild(guild):
+    """Xóa tất cả channels của một guild khỏi index"""
+    for channel_id in [cid for cid, c in _channels.items() if c.guild.id == guild.id]:
+        del _channels[channel_id]
+
+def index_channel(channel):
+    """Thêm hoặc cập nhật một channel"""
+    _channels[channel.id] = channel
+
+def remove_channel(channel):
+    """Xóa một channel khỏi index"""
+    _channels.pop(channel.id, None)
+
+def resolve_channel(channel_id, client=None):
+    """Tra channel theo ID trong O(1), fallback về cache của client nếu index chưa có"""
+    channel_id = int(channel_id) if not isinstance(channel_id, int) else channel_id
+    channel = _channels.get(channel_id)
+    if channel is None and client is not None:
+        channel = client.get_channel(channel_id)
+        if channel is not None:
+            _channels[channel_id] = channel
+    return channel
@@ -2,4 +2,47 @@
  
 # Ví dụ:
 MAX_PROJECT_NAME_LENGTH = 50
-MAX_MESSAGE_LENGTH = 2000 
\ No newline at end of file
+MAX_MESSAGE_LENGTH = 2000
+
+# Cấu hình gửi song song cho !send
+SEND_CONCURRENCY = 10           # Số channel gửi cùng lúc tối đa
+ROUTE_BUCKET_CAPACITY = 5       # Bucket POST /channels/{channel_id}/messages: 5 tin...
+ROUTE_BUCKET_PERIOD = 5.0       # ...mỗi 5 giây cho mỗi channel
+GLOBAL_BUCKET_CAPACITY = 50     # Global rate limit của Discord: 50 request...
+GLOBAL_BUCKET_PERIOD = 1.0      # ...mỗi giây
+
+# Cấu hình database
+DATABASE = 'bot_database.db'
+DB_READER_THREADS = 4           # Số thread đọc database song song
+DB_BUSY_TIMEOUT = 5.0           # Thời gian chờ lock tối đa (giây)
+DB_CACHE_SIZE_KB = 20000        # PRAGMA cache_size (KiB) cho mỗi kết nối
+DB_MMAP_SIZE = 256 * 1024 * 1024  # PRAGMA mmap_size (bytes)
+DB_STATEMENT_CACHE_SIZE = 256   # Số prepared statement được cache trên mỗi kết nối
+
+# Theo dõi độ trễ event loop
+LOOP_LAG_INTERVAL = 0.5         # Chu kỳ đo (giây)
+LOOP_LAG_WARN_THRESHOLD = 0.25  # Ghi log cảnh báo khi loop bị chặn lâu hơn (giây)
+
+# Cấu hình logging
+LOG_FILE = 'bot_log.txt'
+LOG_LEVEL = 'INFO'              # Mặc định, có thể đổi bằng biến môi trường LOG_LEVEL hoặc !log_level
+LOG_MAX_BYTES = 5 * 1024 * 1024 # Xoay file log khi vượt quá dung lượng này
+LOG_BACKUP_COUNT = 3            # Số file log cũ được giữ lại (bot_log.txt.1 ... .3)
+LOG_BATCH_SIZE = 200            # Số dòng tối đa ghi trong một lần flush
+LOG_FLUSH_INTERVAL = 0.5        # Thời gian chờ tối đa của thread ghi log (giây)
+
+# Prefix của mọi lệnh bot
+COMMAND_PREFIX = '!'
+
+# Outbox cho !send
+OUTBOX_BATCH_SIZE = 50          # Số item được claim và gửi trong mỗi lô
+
+# Lên lịch gửi (!schedule)
+SCHEDULE_TIME_FORMAT = '%Y-%m-%d %H:%M'  # Giờ hẹn theo timezone của partner
+SCHEDULE_LIST_LIMIT = 20                 # Số lịch tối đa hiển thị trong !schedule list
+
+# Phân trang output của các lệnh liệt kê
+LIST_PAGE_SIZE = 25             # Số messages mỗi trang của !list (trang tiếp theo dùng -before)
+
+# Đồng bộ projects với channels
+PROJECT_RECONCILE_INTERVAL = 6 * 60 * 60  # Chu kỳ reconcile toàn bộ (giây)
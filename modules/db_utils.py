@@ -1,18 +1,95 @@
+import asyncio
 import sqlite3
-from datetime import datetime, timezone
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from modules.constants import (
+    DATABASE, DB_READER_THREADS, DB_CACHE_SIZE_KB, DB_MMAP_SIZE,
+    DB_STATEMENT_CACHE_SIZE, DB_BUSY_TIMEOUT
+)
+# Query chạy trên thread riêng để không chặn event loop:
+# một thread ghi duy nhất (tránh tranh chấp lock) và một pool thread đọc
+_writer_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+_reader_executor = ThreadPoolExecutor(max_workers=DB_READER_THREADS, thread_name_prefix='db-reader')
 
-def get_db_connection():
-    conn = sqlite3.connect('bot_database.db')
+# Mỗi thread giữ một kết nối lâu dài, không mở/đóng lại theo từng lệnh
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+
+def _open_connection():
+    conn = sqlite3.connect(DATABASE, timeout=DB_BUSY_TIMEOUT, cached_statements=DB_STATEMENT_CACHE_SIZE)
     conn.row_factory = sqlite3.Row
+    # WAL: reader không chặn writer (và ngược lại) trong lúc broadcast
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA cache_size=-{DB_CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size={DB_MMAP_SIZE}')
+    return conn
+
+def get_db_connection():
+    """Trả về kết nối của thread hiện tại, mở mới ở lần gọi đầu tiên"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = _open_connection()
+        _local.conn = conn
+        with _connections_lock:
+            _connections.append(conn)
     return conn
 
-# Hàm logging
-def log_action(action, details=""):
-    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = f"[{timestamp}] {action}: {details}"
-    print(log_entry)
+def _close_thread_connection(barrier=None):
+    """Đóng kết nối của thread hiện tại (sqlite3 chỉ cho đóng trên thread đã mở)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        _local.conn = None
+        with _connections_lock:
+            _connections.remove(conn)
+        conn.close()
+    if barrier is not None:
+        # Giữ thread này lại để mỗi task đóng kết nối chạy trên một thread khác nhau
+        try:
+            barrier.wait(timeout=DB_BUSY_TIMEOUT)
+        except threading.BrokenBarrierError:
+            pass
+
+def _close_executor_connections(executor, workers):
+    """Gửi một task đóng kết nối tới từng thread của executor rồi tắt executor"""
+    barrier = threading.Barrier(workers)
     try:
-        with open('bot_log.txt', 'a', encoding='utf-8') as f:
-            f.write(log_entry + '\n')
-    except:
-        pass 
\ No newline at end of file
+        futures = [executor.submit(_close_thread_connection, barrier) for _ in range(workers)]
+    except RuntimeError:
+        # Executor đã tắt
+        return
+    for future in futures:
+        try:
+            future.result()
+        except sqlite3.Error:
+            pass
+    executor.shutdown(wait=True)
+
+def close_all_connections():
+    """Đóng mọi kết nối đã mở, mỗi kết nối trên thread của nó (gọi khi bot tắt)"""
+    _close_executor_connections(_writer_executor, 1)
+    _close_executor_connections(_reader_executor, DB_READER_THREADS)
+    # Kết nối của thread chính (init_database)
+    _close_thread_connection()
+
+def _run_with_connection(fn, args):
+    """Chạy fn(conn, *args) trong một transaction, commit khi thành công"""
+    conn = get_db_connection()
+    try:
+        result = fn(conn, *args)
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+
+async def db_read(fn, *args):
+    """Chạy hàm đọc fn(conn, *args) trên pool thread đọc"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_reader_executor, _run_with_connection, fn, args)
+
+async def db_write(fn, *args):
+    """Chạy hàm ghi fn(conn, *args) trên thread ghi duy nhất"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_writer_executor, _run_with_connection, fn, args)
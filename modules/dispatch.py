@@ -0,0 +1,84 @@
+import asyncio
+import time
+from modules.constants import (
+    SEND_CONCURRENCY, ROUTE_BUCKET_CAPACITY, ROUTE_BUCKET_PERIOD,
+    GLOBAL_BUCKET_CAPACITY, GLOBAL_BUCKET_PERIOD
+)
+
+# Token bucket cho một route (mặc định theo bucket của Discord: 5 tin / 5 giây / channel)
+class TokenBucket:
+    """Token bucket bất đồng bộ, nạp lại đều theo thời gian"""
+
+    def __init__(self, capacity, period):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def is_idle(self):
+        """Bucket đã đầy lại hoàn toàn thì có thể bỏ đi"""
+        self._refill()
+        return self.tokens >= self.capacity
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+# Bộ giới hạn theo route + global, dùng chung cho mọi lệnh gửi
+class RouteLimiter:
+    """Giữ một TokenBucket cho mỗi route key (channel_id) và một bucket global"""
+
+    MAX_IDLE_BUCKETS = 1000
+
+    def __init__(self, route_capacity=ROUTE_BUCKET_CAPACITY, route_period=ROUTE_BUCKET_PERIOD,
+                 global_capacity=GLOBAL_BUCKET_CAPACITY, global_period=GLOBAL_BUCKET_PERIOD):
+        self.route_capacity = route_capacity
+        self.route_period = route_period
+        self.global_bucket = TokenBucket(global_capacity, global_period)
+        self.buckets = {}
+
+    def _bucket(self, route_key):
+        bucket = self.buckets.get(route_key)
+        if bucket is None:
+            if len(self.buckets) >= self.MAX_IDLE_BUCKETS:
+                # Dọn các bucket không còn dùng để dict không phình mãi
+                self.buckets = {k: b for k, b in self.buckets.items() if not b.is_idle()}
+            bucket = TokenBucket(self.route_capacity, self.route_period)
+            self.buckets[route_key] = bucket
+        return bucket
+
+    async def acquire(self, route_key):
+        await self._bucket(route_key).acquire()
+        await self.global_bucket.acquire()
+
+_default_limiter = RouteLimiter()
+
+# Gửi song song nhiều job, giới hạn concurrency và rate limit theo route
+async def fan_out(jobs, concurrency=SEND_CONCURRENCY, limiter=None):
+    """Chạy các job (route_key, coroutine_factory) song song.
+
+    Trả về list (ok, result_or_exception) theo đúng thứ tự của jobs.
+    """
+    limiter = limiter or _default_limiter
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(route_key, factory):
+        async with semaphore:
+            await limiter.acquire(route_key)
+            try:
+                return True, await factory()
+            except Exception as e:
+                return False, e
+
+    return await asyncio.gather(*(run(route_key, factory) for route_key, factory in jobs))
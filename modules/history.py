@@ -0,0 +1,177 @@
+from datetime import datetime, timedelta
+from modules.db_utils import db_read
+from modules.logger import log_action
+from modules.constants import LIST_PAGE_SIZE
+from modules.utils import make_project_code, format_time_with_timezones
+from modules.timezones import get_tzinfo, to_epoch_ms
+from modules.status import STATUS_NAMES, normalize_status, status_name
+from modules.partner import find_partner_by_name_or_username
+from modules.paginator import Paginator, next_page_command
+from modules.router import command_failed
+from modules.queries import HistoryFilter, history_query
+import shlex
+
+# Lịch sử messages với bộ lọc và phân trang keyset theo (timestamp_ms, message_id):
+# trang thứ 100 chỉ tốn một lần seek index như trang đầu, không dùng OFFSET
+
+HISTORY_DATE_FORMAT = '%Y-%m-%d'
+HISTORY_TIMEZONE = '+07:00'  # Ngày trong -from/-to tính theo giờ hiển thị của bot
+
+def encode_cursor(row):
+    """Cursor của trang tiếp theo từ dòng cuối của trang hiện tại"""
+    return f"{row['message_id']}@{row['timestamp_ms']}"
+
+def decode_cursor(cursor):
+    """'<message_id>@<timestamp_ms>' -> (timestamp_ms, message_id); raise ValueError nếu sai định dạng"""
+    message_id, sep, timestamp_ms = cursor.partition('@')
+    if not sep:
+        raise ValueError(f'Invalid cursor: {cursor}')
+    return int(timestamp_ms), int(message_id)
+
+def _date_to_epoch_ms(date_str, days=0):
+    """'YYYY-MM-DD' (giờ bot) -> epoch ms UTC của 00:00 ngày đó"""
+    local = datetime.strptime(date_str, HISTORY_DATE_FORMAT) + timedelta(days=days)
+    return to_epoch_ms(local.replace(tzinfo=get_tzinfo(HISTORY_TIMEZONE)))
+
+def query_history(conn, filters, limit, cursor=None):
+    """Trả về (tối đa limit messages mới nhất khớp filters, cursor trang tiếp theo hoặc None)"""
+    # Lấy dư một dòng để biết còn trang sau hay không
+    rows = conn.execute(*history_query(filters, limit + 1, cursor)).fetchall()
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
+
+def resolve_history_partners(conn, partner_names):
+    """Trả về (partner_ids, các tên partner không tìm thấy)"""
+    partner_ids = []
+    missing_partners = []
+    for partner_name in partner_names:
+        partner = find_partner_by_name_or_username(conn, partner_name)
+        if not partner:
+            missing_partners.append(partner_name)
+        elif partner['partner_id'] not in partner_ids:
+            partner_ids.append(partner['partner_id'])
+    return partner_ids, missing_partners
+
+def parse_history_args(args):
+    """Parse flags của !list/!history.
+
+    Trả về (partner_names, filters, cursor, show_all, None) hoặc (None, None, None, None, lỗi).
+    """
+    partner_names = []
+    filters = HistoryFilter()
+    cursor = None
+    show_all = False
+    value_flags = {'-p', '-c', '-s', '-from', '-to', '-before'}
+
+    i = 1
+    while i < len(args):
+        flag = args[i]
+        if flag in value_flags:
+            if i + 1 >= len(args):
+                return None, None, None, None, f'❌ Invalid syntax! {flag} must be followed by a value'
+            value = args[i + 1].strip()
+            i += 2
+            try:
+                if flag == '-p':
+                    partner_names.append(value)
+                elif flag == '-c':
+                    filters.project_codes.append(make_project_code(value))
+                elif flag == '-s':
+                    status_code = normalize_status(value)
+                    if status_code is None:
+                        return None, None, None, None, f'❌ Invalid status for -s! Valid statuses: {", ".join(STATUS_NAMES)}'
+                    filters.statuses.append(status_code)
+                elif flag == '-from':
+                    filters.since = _date_to_epoch_ms(value)
+                elif flag == '-to':
+                    filters.until = _date_to_epoch_ms(value, days=1)
+                else:
+                    cursor = decode_cursor(value)
+            except ValueError:
+                if flag == '-before':
+                    return None, None, None, None, '❌ Invalid cursor! Copy the next page command from the previous page'
+                return None, None, None, None, f'❌ Invalid date for {flag}! Use: YYYY-MM-DD'
+        elif flag == '-replied':
+            filters.replied = True
+            i += 1
+        elif flag == '-unreplied':
+            filters.replied = False
+            i += 1
+        elif flag == '-all':
+            show_all = True
+            i += 1
+        else:
+            i += 1
+    return partner_names, filters, cursor, show_all, None
+
+def load_history_page(conn, partner_names, filters, limit, cursor=None):
+    """Trả về (rows, next_cursor, missing_partners); không có partner hợp lệ nào thì rows rỗng"""
+    missing_partners = []
+    if partner_names:
+        filters.partner_ids, missing_partners = resolve_history_partners(conn, partner_names)
+        if not filters.partner_ids:
+            return [], None, missing_partners
+    rows, next_cursor = query_history(conn, filters, limit, cursor)
+    return rows, next_cursor, missing_partners
+
+HISTORY_USAGE = ('**🕘 !history** - Message history, newest first\n'
+                 '`!history [-p <partner>] [-c <project_code>] [-s <status>] [-from YYYY-MM-DD] [-to YYYY-MM-DD] '
+                 '[-replied | -unreplied] [-before <cursor>]`\n'
+                 '• `-p`, `-c`, `-s` can be repeated; dates are inclusive (+07:00)\n'
+                 '• The last line of each page gives the command for the next page')
+
+def _format_list_row(row):
+    formatted_time = format_time_with_timezones(row['timestamp_ms'], '+07:00', row['timezone'])
+    content = row['content'][:100] + '...' if len(row['content']) > 100 else row['content']
+    return (f'**{status_name(row["status_code"])}** - {row["partner_name"]}/{row["project_name"]}\n'
+            f'• {content}\n'
+            f'• {formatted_time}\n')
+
+def _format_history_row(row):
+    text = f'`#{row["message_id"]}` ' + _format_list_row(row)
+    if row['reply_timestamp_ms'] is not None:
+        reply = (row['reply_content'] or '')[:100]
+        text += f'↩️ {format_time_with_timezones(row["reply_timestamp_ms"], "+07:00")}: {reply}\n'
+    return text
+
+async def send_history(message, header, format_row=_format_list_row, empty_text='❌ No messages found.'):
+    """Parse args của message, đọc một trang lịch sử và gửi theo trang kèm lệnh lấy trang tiếp theo"""
+    args = shlex.split(message.content)
+    partner_names, filters, cursor, show_all, error = parse_history_args(args)
+    if error:
+        await message.channel.send(error)
+        return
+    rows, next_cursor, missing_partners = await db_read(
+        load_history_page, partner_names, filters, LIST_PAGE_SIZE, cursor
+    )
+    for partner_name in missing_partners:
+        await message.channel.send(f'❌ Partner not found: **{partner_name}**')
+    if not rows:
+        await message.channel.send('📋 No more messages.' if cursor else empty_text)
+        return
+
+    paginator = Paginator(message.channel, header=header(partner_names, show_all))
+    for row in rows:
+        await paginator.add(format_row(row))
+    if next_cursor:
+        await paginator.add_line(f'➡️ Next page: `{next_page_command(args, "-before", next_cursor)}`')
+    await paginator.flush()
+
+# Hàm xử lý lệnh !history
+async def handle_history(message):
+    """Handle !history command (English)"""
+    try:
+        if message.content.split()[1:2] == ['help']:
+            await message.channel.send(HISTORY_USAGE)
+            return
+        await send_history(
+            message,
+            lambda partner_names, show_all: '**🕘 Message History:**\n',
+            format_row=_format_history_row,
+            empty_text='❌ No messages match these filters.'
+        )
+    except Exception as e:
+        command_failed()
+        log_action("ERROR", f"History error: {e}")
+        await message.channel.send(f'❌ Error: {e}')
@@ -0,0 +1,120 @@
+import atexit
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from modules.constants import (
+    LOG_FILE, LOG_LEVEL, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL
+)
+
+# Mức log; action không nằm trong bảng này (ADD_PARTNER, SEND, ...) được coi là INFO
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+DEBUG = LEVELS['DEBUG']
+INFO = LEVELS['INFO']
+
+_level = LEVELS.get(os.getenv('LOG_LEVEL', LOG_LEVEL).upper(), INFO)
+
+def set_log_level(level_name):
+    """Đổi mức log lúc đang chạy, trả về False nếu tên mức không hợp lệ"""
+    global _level
+    level = LEVELS.get(level_name.upper())
+    if level is None:
+        return False
+    _level = level
+    return True
+
+def get_log_level():
+    return next(name for name, value in LEVELS.items() if value == _level)
+
+def is_debug_enabled():
+    return _level <= DEBUG
+
+# Thread ghi log nền: gom nhiều dòng rồi ghi/flush một lần, xoay file theo dung lượng
+class _LogWriter(threading.Thread):
+    def __init__(self, path, max_bytes, backup_count):
+        super().__init__(name='log-writer', daemon=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue = queue.Queue()
+        self.file = None
+
+    def _open(self):
+        try:
+            self.file = open(self.path, 'a', encoding='utf-8')
+        except OSError:
+            self.file = None
+
+    def _rotate(self):
+        self.file.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f'{self.path}.{i}'
+            if os.path.exists(source):
+                os.replace(source, f'{self.path}.{i + 1}')
+        if self.backup_count > 0:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def _write(self, lines):
+        text = '\n'.join(lines) + '\n'
+        sys.stdout.write(text)
+        sys.stdout.flush()
+        if self.file is None:
+            self._open()
+        if self.file is None:
+            return
+        try:
+            self.file.write(text)
+            self.file.flush()
+            if self.max_bytes and self.file.tell() >= self.max_bytes:
+                self._rotate()
+        except OSError:
+            self.file = None
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            try:
+                batch = [self.queue.get(timeout=LOG_FLUSH_INTERVAL)]
+            except queue.Empty:
+                continue
+            while len(batch) < LOG_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [line for line in batch if line is not None]
+            if batch:
+                self._write(batch)
+        if self.file:
+            self.file.close()
+
+    def stop(self):
+        self.queue.put(None)
+        self.join(timeout=5)
+
+_writer = _LogWriter(LOG_FILE, LOG_MAX_BYTES, LOG_BACKUP_COUNT)
+_writer.start()
+atexit.register(_writer.stop)
+
+def _emit(action, details):
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    _writer.queue.put(f"[{timestamp}] {action}: {details}")
+
+# Hàm logging
+def log_action(action, details=""):
+    """Ghi một dòng log; action DEBUG/WARNING/ERROR dùng làm mức log, còn lại là INFO"""
+    if LEVELS.get(action, INFO) < _level:
+        return
+    _emit(action, details)
+
+def log_debug(message, *args):
+    """Log DEBUG với format kiểu %, chỉ format khi DEBUG đang bật"""
+    if _level > DEBUG:
+        return
+    _emit("DEBUG", message % args if args else message)
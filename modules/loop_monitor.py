@@ -0,0 +1,34 @@
+import asyncio
+from modules.constants import LOOP_LAG_INTERVAL, LOOP_LAG_WARN_THRESHOLD
+from modules.logger import log_action
+
+# Thống kê độ trễ của event loop (giây)
+_lag_stats = {'samples': 0, 'total': 0.0, 'max': 0.0}
+
+def record_lag(lag):
+    _lag_stats['samples'] += 1
+    _lag_stats['total'] += lag
+    _lag_stats['max'] = max(_lag_stats['max'], lag)
+
+def get_loop_lag_stats(reset=False):
+    """Trả về dict {samples, avg, max} và reset nếu cần"""
+    samples = _lag_stats['samples']
+    stats = {
+        'samples': samples,
+        'avg': _lag_stats['total'] / samples if samples else 0.0,
+        'max': _lag_stats['max'],
+    }
+    if reset:
+        _lag_stats.update(samples=0, total=0.0, max=0.0)
+    return stats
+
+async def monitor_loop_lag(interval=LOOP_LAG_INTERVAL, warn_threshold=LOOP_LAG_WARN_THRESHOLD):
+    """Đo độ trễ giữa thời điểm hẹn thức dậy và thời điểm loop thực sự chạy lại"""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - start - interval)
+        record_lag(lag)
+        if warn_threshold is not None and lag > warn_threshold:
+            log_action("WARNING", f"Event loop blocked for {lag * 1000:.0f} ms")
@@ -1,300 +1,312 @@
-from modules.db_utils import get_db_connection, log_action
-from modules.utils import format_time_with_timezones, validate_message_content, create_tag_message
+from modules.db_utils import db_read, db_write
+from modules.logger import log_action, log_debug
+from modules.utils import validate_message_content, make_project_code, get_partner_time_with_timezone
+from modules.template import get_template, render_template
 from modules.partner import find_partner_by_name_or_username
-from modules.project import find_project_by_code
-import discord
+from modules.registry import find_partner, all_partners, ensure_registry, tag_line_for
+from modules.outbox import create_job, run_job, load_pending_jobs
+from modules.channel_index import resolve_channel
+from modules.paginator import send_paginated
+from modules.history import send_history
+from modules.timezones import now_epoch_ms
+from modules.queries import (
+    MESSAGES_BY_DISCORD_ID_SQL, MESSAGE_TRANSITION_SQL, MESSAGE_ID_CONDITION, BROADCAST_CONDITION,
+    REPLY_SIBLINGS_CONDITION, PARTNER_LATEST_MESSAGES_CONDITION, BROADCAST_COUNT_SQL,
+    LATEST_MESSAGE_STATUS_SQL, PROJECT_BY_NAME_SQL, OUTBOX_JOB_ITEMS_SQL
+)
+from modules.status import STATUS_NAMES, normalize_status, status_for_reply_tag, status_name, can_transition, transition_sources, next_status
+from modules.send_plan import build_send_plan, oversized_targets
+from modules.constants import MAX_MESSAGE_LENGTH
+from modules.router import command_failed
 import shlex
-import asyncio
-from datetime import datetime
+
+def resolve_send_partners(partners_config):
+    """Resolve partners/projects cho !send từ registry (không query DB, gọi sau ensure_registry).
+
+    Trả về (all_partners_info, errors) với all_partners_info là list
+    (partner, projects_to_send, all_partner_projects).
+    """
+    errors = []
+    all_partners_info = []
+    
+    # Process each partner
+    for partner_name, channels, send_all, send_specific in partners_config:
+        # Debug log
+        log_debug("Processing partner: %s, channels: %s, send_all: %s, send_specific: %s", partner_name, channels, send_all, send_specific)
+        
+        # Handle -all special case
+        if partner_name == '-all':
+            # Get all partners
+            partners = all_partners(None)
+            log_debug("Found %s total partners for -all", len(partners))
+            
+            for summary in partners:
+                # Với -all, luôn gửi đến tất cả projects
+                if not summary.projects:
+                    log_debug("No projects found for partner %s", summary.partner_name)
+                    continue
+                log_debug("Sending to all %s projects for %s", len(summary.projects), summary.partner_name)
+                all_partners_info.append((summary.as_partner_dict(), summary.projects, summary.projects))
+            
+            continue  # Skip normal processing for -all
+        
+        # Find partner
+        summary = find_partner(None, partner_name)
+        if not summary:
+            errors.append(f'❌ Partner not found: **{partner_name}**')
+            continue
+        
+        # Luôn lấy toàn bộ projects của partner để tracking
+        all_partner_projects = summary.projects
+        log_debug("Found %s total projects for %s", len(all_partner_projects), partner_name)
+        
+        if not all_partner_projects:
+            errors.append(f'❌ No projects found for partner **{partner_name}**')
+            continue
+        
+        # Xác định projects cần gửi theo lệnh
+        if send_specific and channels:
+            # Nếu chỉ định channels cụ thể, chỉ gửi đến những project đó
+            projects_to_send = []
+            for channel_name in channels:
+                project_code = make_project_code(channel_name)
+                found_projects = [p for p in all_partner_projects if p['project_code'] == project_code]
+                log_debug("Found %s projects for %s with channel %s", len(found_projects), partner_name, channel_name)
+                if not found_projects:
+                    errors.append(f'❌ Channel **{channel_name}** not found in partner **{partner_name}**')
+                    continue
+                projects_to_send.extend(found_projects)
+        else:
+            # Nếu có -all hoặc không chỉ định channels, gửi đến tất cả projects
+            projects_to_send = all_partner_projects
+            log_debug("Sending to all %s projects for %s", len(projects_to_send), partner_name)
+        
+        log_debug("Total projects to send for %s: %s", partner_name, len(projects_to_send))
+        if projects_to_send:
+            all_partners_info.append((summary.as_partner_dict(), projects_to_send, all_partner_projects))  # Thêm all_partner_projects để tracking
+    
+    return all_partners_info, errors
+
+def _load_send_report(conn, job_id):
+    """Trả về (PartnerSummary của mọi partner, các partner_id có trong job, status item theo project_id)"""
+    items = conn.execute(OUTBOX_JOB_ITEMS_SQL, (job_id,)).fetchall()
+    item_status = {item['project_id']: item['status'] for item in items}
+    job_partner_ids = {item['partner_id'] for item in items}
+    return all_partners(conn), job_partner_ids, item_status
+
+def _format_send_report(summaries, job_partner_ids, item_status):
+    """Trả về (số tin đã gửi, nội dung Send Report)"""
+    reports = []
+    for summary in summaries:
+        # Partner không có item nào trong job thì không nằm trong lệnh gửi
+        if summary.partner_id not in job_partner_ids:
+            reports.append(f'- {summary.partner_name}: This partner was not included in the send request.')
+            continue
+        
+        # Hiển thị tất cả projects của partner này
+        report = f'- {summary.partner_name}:'
+        for p in summary.projects:
+            status = item_status.get(p['project_id'])
+            if status == 'sent':
+                report += f'\n    • {p["project_name"]}: The request has been sent to this project.'
+            elif status == 'unknown':
+                report += f'\n    • {p["project_name"]}: Delivery could not be confirmed (interrupted by a restart).'
+            elif status is not None:
+                report += f'\n    • {p["project_name"]}: Failed to send the request.'
+            else:
+                report += f'\n    • {p["project_name"]}: This project didn\'t get the request.'
+        reports.append(report)
+    
+    sent_count = sum(1 for status in item_status.values() if status == 'sent')
+    return sent_count, '\n'.join(reports)
+
+async def send_job_report(job_id, channel, title='Send Report'):
+    """Gửi Send Report của một outbox job vào channel"""
+    sent_count, report = _format_send_report(*await db_read(_load_send_report, job_id))
+    log_debug("Final sent_count for job %s: %s", job_id, sent_count)
+    if sent_count > 0:
+        await send_paginated(
+            channel,
+            f'**{title}:**\n' + report +
+            f'\n🔖 Broadcast #{job_id} - update all of its messages with `!message_status -b {job_id} <status>`'
+        )
+    else:
+        await channel.send('❌ Failed to send message to any channel')
+
+async def resume_send_jobs(client):
+    """Gửi tiếp các outbox job dang dở từ lần chạy trước (gọi một lần khi khởi động)"""
+    for job in await load_pending_jobs():
+        log_action("SEND", f"Resuming outbox job {job['job_id']}")
+        try:
+            await run_job(job['job_id'], job['content'], client)
+            channel = resolve_channel(job['reply_channel_id'], client) if job['reply_channel_id'] else None
+            if channel is not None:
+                await send_job_report(job['job_id'], channel, title=f'Send Report (resumed job #{job["job_id"]})')
+        except Exception as e:
+            log_action("ERROR", f"Failed to resume outbox job {job['job_id']}: {e}")
+
+def parse_send_args(args, start=1):
+    """Parse các cờ -p/-c/-all của !send (dùng chung cho !schedule).
+
+    Trả về (partners_config, None) hoặc (None, thông báo lỗi).
+    """
+    partners_config = []  # List of (partner_name, channels, send_all, send_specific) tuples
+    current_partner = None
+    current_channels = []
+    current_send_all = False
+    current_send_specific = False
+    
+    i = start
+    while i < len(args):
+        if args[i] == '-p':
+            # Save previous partner config if exists
+            if current_partner:
+                partners_config.append((current_partner, current_channels, current_send_all, current_send_specific))
+            
+            # Start new partner
+            if i + 1 < len(args):
+                current_partner = args[i + 1].strip()
+                current_channels = []
+                current_send_all = False
+                current_send_specific = False
+                i += 2
+            else:
+                return None, '❌ Invalid syntax! -p must be followed by a partner name'
+        elif args[i] == '-all':
+            # Handle -all as a special partner
+            if current_partner:
+                partners_config.append((current_partner, current_channels, current_send_all, current_send_specific))
+            
+            current_partner = '-all'
+            current_channels = []
+            current_send_all = False
+            current_send_specific = False
+            i += 1
+        elif args[i] == '-c':
+            if i + 1 < len(args):
+                if args[i + 1].strip() == '-all':
+                    current_send_all = True
+                    i += 2
+                else:
+                    current_channels.append(args[i + 1].strip())
+                    current_send_specific = True  # Đánh dấu là gửi cụ thể
+                    i += 2
+            else:
+                return None, '❌ Invalid syntax! -c must be followed by a channel name or -all'
+        else:
+            i += 1
+    
+    # Add last partner config
+    if current_partner:
+        partners_config.append((current_partner, current_channels, current_send_all, current_send_specific))
+    
+    return partners_config, None
 
 # Hàm xử lý lệnh !send
 async def handle_send(message):
     """Handle !send command (English)"""
     try:
-        # Parse command: !send -p partner -c channel1 -c channel2 | content
+        # Parse command: !send [-t template] -p partner -c channel1 -c channel2 | content
         content = message.content
+        command_part, _, message_content = content.partition('|')
+        message_content = message_content.strip()
+        args = shlex.split(command_part)
+        
+        # -t <name>: nội dung lấy từ template, phần sau | (nếu có) là {message}
+        template_name = None
+        if '-t' in args:
+            index = args.index('-t')
+            if index + 1 >= len(args):
+                await message.channel.send('❌ Invalid syntax! -t must be followed by a template name')
+                return
+            template_name = args[index + 1]
+            del args[index:index + 2]
         
         # Split content after |
-        if '|' not in content:
+        if template_name is None and '|' not in content:
             await message.channel.send('❌ Invalid syntax! Use: !send -p <partner> -c <channel1> -c <channel2> | <content>')
             return
         
-        command_part, message_content = content.split('|', 1)
-        message_content = message_content.strip()
-        
-        # Validation content
-        is_valid, error_msg = validate_message_content(message_content)
-        if not is_valid:
-            await message.channel.send(f'❌ {error_msg}')
-            return
+        template = None
+        if template_name is not None:
+            template = await get_template(template_name)
+            if template is None:
+                await message.channel.send(f'❌ Template not found: **{template_name}**')
+                return
+        else:
+            # Validation content
+            is_valid, error_msg = validate_message_content(message_content)
+            if not is_valid:
+                await message.channel.send(f'❌ {error_msg}')
+                return
         
         # Parse arguments
-        args = shlex.split(command_part)
-        partners_config = []  # List of (partner_name, channels, send_all, send_specific) tuples
-        current_partner = None
-        current_channels = []
-        current_send_all = False
-        current_send_specific = False
-        
-        i = 1
-        while i < len(args):
-            if args[i] == '-p':
-                # Save previous partner config if exists
-                if current_partner:
-                    partners_config.append((current_partner, current_channels, current_send_all, current_send_specific))
-                
-                # Start new partner
-                if i + 1 < len(args):
-                    current_partner = args[i + 1].strip()
-                    current_channels = []
-                    current_send_all = False
-                    current_send_specific = False
-                    i += 2
-                else:
-                    await message.channel.send('❌ Invalid syntax! -p must be followed by a partner name')
-                    return
-            elif args[i] == '-all':
-                # Handle -all as a special partner
-                if current_partner:
-                    partners_config.append((current_partner, current_channels, current_send_all, current_send_specific))
-                
-                current_partner = '-all'
-                current_channels = []
-                current_send_all = False
-                current_send_specific = False
-                i += 1
-            elif args[i] == '-c':
-                if i + 1 < len(args):
-                    if args[i + 1].strip() == '-all':
-                        current_send_all = True
-                        i += 2
-                    else:
-                        current_channels.append(args[i + 1].strip())
-                        current_send_specific = True  # Đánh dấu là gửi cụ thể
-                        i += 2
-                else:
-                    await message.channel.send('❌ Invalid syntax! -c must be followed by a channel name or -all')
-                    return
-            else:
-                i += 1
-        
-        # Add last partner config
-        if current_partner:
-            partners_config.append((current_partner, current_channels, current_send_all, current_send_specific))
+        partners_config, error = parse_send_args(args)
+        if error:
+            await message.channel.send(error)
+            return
         
         if not partners_config:
             await message.channel.send('❌ Invalid syntax! You must specify at least one partner with -p')
             return
         
-        conn = get_db_connection()
-        cur = conn.cursor()
+        await ensure_registry()
+        all_partners_info, errors = resolve_send_partners(partners_config)
+        for error in errors:
+            await message.channel.send(error)
         
-        all_projects_to_send = []
-        all_partners_info = []
-        
-        # Process each partner
-        for partner_name, channels, send_all, send_specific in partners_config:
-            # Debug log
-            log_action("DEBUG", f"Processing partner: {partner_name}, channels: {channels}, send_all: {send_all}, send_specific: {send_specific}")
-            
-            # Handle -all special case
-            if partner_name == '-all':
-                # Get all partners from database
-                cur.execute('SELECT partner_id, partner_name FROM partners ORDER BY partner_name')
-                all_partners = cur.fetchall()
-                log_action("DEBUG", f"Found {len(all_partners)} total partners for -all")
-                
-                for partner_row in all_partners:
-                    partner = {'partner_id': partner_row[0], 'partner_name': partner_row[1]}
-                    log_action("DEBUG", f"Processing -all partner: {partner['partner_name']}")
-                    
-                    # Luôn lấy toàn bộ projects của partner để tracking
-                    cur.execute('SELECT project_id, project_name, channel_id FROM projects WHERE partner_id = ?', (partner['partner_id'],))
-                    all_partner_projects = cur.fetchall()
-                    log_action("DEBUG", f"Found {len(all_partner_projects)} total projects for {partner['partner_name']}")
-                    
-                    if not all_partner_projects:
-                        log_action("DEBUG", f"No projects found for partner {partner['partner_name']}")
-                        continue
-                    
-                    # Với -all, luôn gửi đến tất cả projects
-                    projects_to_send = all_partner_projects
-                    log_action("DEBUG", f"Sending to all {len(projects_to_send)} projects for {partner['partner_name']}")
-                    
-                    log_action("DEBUG", f"Total projects to send for {partner['partner_name']}: {len(projects_to_send)}")
-                    if projects_to_send:
-                        all_projects_to_send.extend(projects_to_send)
-                        all_partners_info.append((partner, projects_to_send, all_partner_projects))
-                
-                continue  # Skip normal processing for -all
-            
-            # Find partner
-            partner = find_partner_by_name_or_username(conn, partner_name)
-            if not partner:
-                await message.channel.send(f'❌ Partner not found: **{partner_name}**')
-                continue
-            
-            # Luôn lấy toàn bộ projects của partner để tracking
-            cur.execute('SELECT project_id, project_name, channel_id FROM projects WHERE partner_id = ?', (partner['partner_id'],))
-            all_partner_projects = cur.fetchall()
-            log_action("DEBUG", f"Found {len(all_partner_projects)} total projects for {partner_name}")
-            
-            if not all_partner_projects:
-                await message.channel.send(f'❌ No projects found for partner **{partner_name}**')
-                continue
-            
-            # Xác định projects cần gửi theo lệnh
-            if send_specific and channels:
-                # Nếu chỉ định channels cụ thể, chỉ gửi đến những project đó
-                projects_to_send = []
-                for channel_name in channels:
-                    cur.execute('''
-                        SELECT project_id, project_name, channel_id
-                        FROM projects
-                        WHERE partner_id = ? AND LOWER(SUBSTR(project_name, 1, 6)) = LOWER(?)
-                    ''', (partner['partner_id'], channel_name[:6]))
-                    found_projects = cur.fetchall()
-                    log_action("DEBUG", f"Found {len(found_projects)} projects for {partner_name} with channel {channel_name}")
-                    if not found_projects:
-                        await message.channel.send(f'❌ Channel **{channel_name}** not found in partner **{partner_name}**')
-                        continue
-                    projects_to_send.extend(found_projects)
-            else:
-                # Nếu có -all hoặc không chỉ định channels, gửi đến tất cả projects
-                projects_to_send = all_partner_projects
-                log_action("DEBUG", f"Sending to all {len(projects_to_send)} projects for {partner_name}")
-            
-            log_action("DEBUG", f"Total projects to send for {partner_name}: {len(projects_to_send)}")
-            if projects_to_send:
-                all_projects_to_send.extend(projects_to_send)
-                all_partners_info.append((partner, projects_to_send, all_partner_projects))  # Thêm all_partner_projects để tracking
-        
-        if not all_projects_to_send:
-            conn.close()
+        if not all_partners_info:
             await message.channel.send('❌ No valid channels found to send the message')
             return
         
-        # Send message to each channel
-        sent_count = 0
-        failed_channels = []
-        
-        log_action("DEBUG", f"Total projects to send: {len(all_projects_to_send)}")
-        
-        for project in all_projects_to_send:
-            try:
-                log_action("DEBUG", f"Processing project: {project['project_name']} with channel_id: {project['channel_id']}")
-                
-                channel_id = int(project['channel_id']) if not isinstance(project['channel_id'], int) else project['channel_id']
-                
-                # Tìm channel trong tất cả servers mà bot tham gia (cross-server)
-                channel = None
-                client = message._state._get_client()
-                for guild in client.guilds:
-                    channel = guild.get_channel(channel_id)
-                    if channel:
-                        log_action("DEBUG", f"Found channel {channel.name} in server {guild.name}")
-                        break
-                
-                if not channel:
-                    log_action("DEBUG", f"Channel_id not found: {channel_id} for project {project['project_name']} in any server")
-                    failed_channels.append(project['project_name'])
-                    continue
-                
-                log_action("DEBUG", f"Found channel: {channel.name} for project {project['project_name']}")
-                
-                # Find partner for this project
-                partner_for_project = None
-                for partner_info, projects_to_send, all_partner_projects in all_partners_info:
-                    if any(p['project_id'] == project['project_id'] for p in projects_to_send):
-                        partner_for_project = partner_info
-                        break
-                
-                log_action("DEBUG", f"Partner for project {project['project_name']}: {partner_for_project['partner_name']}")
-                
-                try:
-                    tag_message = create_tag_message(conn, partner_for_project['partner_id'])
-                    log_action("DEBUG", f"Tag message for {project['project_name']}: {tag_message}")
-                    full_message = f"{tag_message}\n\n{message_content}"
-                    log_action("DEBUG", f"Full message for {project['project_name']}: {full_message}")
-                    discord_message = await channel.send(full_message)
-                    cur.execute('''
-                        INSERT INTO messages (partner_id, project_id, content, discord_message_id, status, timestamp)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (partner_for_project['partner_id'], project['project_id'], message_content, discord_message.id, 'request', datetime.now().isoformat()))
-                    sent_count += 1
-                    log_action("DEBUG", f"Successfully sent to {project['project_name']}")
-                except Exception as e:
-                    log_action("ERROR", f"Failed to send message to {project['project_name']}: {e}")
-                    failed_channels.append(project['project_name'])
-            except Exception as e:
-                log_action("ERROR", f"Failed to process project {project['project_name']}: {e}")
-                failed_channels.append(project['project_name'])
-        conn.commit()
-        conn.close()
-        # Tạo báo cáo cho tất cả partners trong hệ thống
-        reports = []
-        
-        # Lấy tất cả partners từ database
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute('SELECT partner_id, partner_name FROM partners ORDER BY partner_name')
-        all_partners = cur.fetchall()
-        conn.close()
-        
-        # Tạo mapping partner_id -> trạng thái gửi
-        sent_partners = set([partner['partner_id'] for partner, _, _ in all_partners_info])
-        
-        for partner_data in all_partners:
-            partner_id = partner_data['partner_id']
-            partner_name = partner_data['partner_name']
-            
-            # Kiểm tra xem partner này có được gửi không
-            if partner_id in sent_partners:
-                # Partner này được gửi - tìm thông tin chi tiết
-                partner_info = None
-                projects_to_send = []
-                all_partner_projects = []
-                
-                for p_info, p_projects, p_all_projects in all_partners_info:
-                    if p_info['partner_id'] == partner_id:
-                        partner_info = p_info
-                        projects_to_send = p_projects
-                        all_partner_projects = p_all_projects
-                        break
-                
-                if partner_info:
-                    # Tạo mapping project_name -> trạng thái gửi
-                    sent_projects = set([p['project_name'] for p in projects_to_send if p['project_name'] not in failed_channels])
-                    failed_projects = set([p['project_name'] for p in projects_to_send if p['project_name'] in failed_channels])
-                    
-                    # Báo cáo cho partner này - hiển thị tất cả projects
-                    report = f'- {partner_name}:'
-                    
-                    # Hiển thị tất cả projects của partner này
-                    for p in all_partner_projects:
-                        if p['project_name'] in sent_projects:
-                            report += f'\n    • {p["project_name"]}: The request has been sent to this project.'
-                        elif p['project_name'] in failed_projects:
-                            report += f'\n    • {p["project_name"]}: Failed to send the request.'
-                        else:
-                            report += f'\n    • {p["project_name"]}: This project didn\'t get the request.'
-                else:
-                    report = f'- {partner_name}: No projects were processed for this partner.'
-            else:
-                # Partner này không được gửi
-                report = f'- {partner_name}: This partner was not included in the send request.'
-            
-            reports.append(report)
+        # Resolve toàn bộ đích gửi (channel, partner, tag line) thành một plan phẳng
+        client = message._state._get_client()
+        render = None
+        if template is not None:
+            # Giờ địa phương tính một lần cho mỗi partner, template chỉ nối chuỗi cho từng đích
+            partner_times = {}
+            extra_message = message_content
+            def render(partner, project):
+                if partner['partner_id'] not in partner_times:
+                    partner_times[partner['partner_id']] = get_partner_time_with_timezone(partner['timezone'])
+                return render_template(template, {
+                    'partner': partner['partner_name'],
+                    'project': project['project_name'],
+                    'project_code': make_project_code(project['project_name']),
+                    'partner_time': partner_times[partner['partner_id']],
+                    'message': extra_message,
+                })
+            message_content = f'[template: {template_name}] {message_content}'.strip()
+        send_targets, missing = build_send_plan(
+            all_partners_info,
+            message_content,
+            lambda channel_id: resolve_channel(channel_id, client),
+            tag_line_for,
+            render
+        )
+        log_debug("Total targets to send: %s", len(send_targets))
+        
+        # Tag line + nội dung (render riêng cho từng đích với -t) phải nằm trong giới hạn của Discord
+        too_long = oversized_targets(send_targets)
+        if too_long:
+            names = [f"{t.partner['partner_name']} / {t.project['project_name']} ({len(t.content)})" for t in too_long[:10]]
+            if len(too_long) > 10:
+                names.append(f'and {len(too_long) - 10} more')
+            await message.channel.send(f'❌ Message too long (maximum {MAX_MESSAGE_LENGTH} characters) for: ' + ', '.join(names))
+            return
         
-        # Gửi Send Report một lần duy nhất
-        log_action("DEBUG", f"Final sent_count: {sent_count}")
-        log_action("DEBUG", f"Failed channels: {failed_channels}")
+        # Báo channel thiếu trước khi gửi
+        if missing:
+            missing_names = [project['project_name'] for _, project in missing]
+            log_debug("Channels not found in any server: %s", missing_names)
+            await message.channel.send(f'⚠️ Channel not found for {len(missing)} project(s): ' + ', '.join(missing_names))
         
-        if sent_count > 0:
-            await message.channel.send(f'**Send Report:**\n' + '\n'.join(reports))
-        else:
-            await message.channel.send('❌ Failed to send message to any channel')
+        # Lưu plan vào outbox trước khi gửi để có thể resume nếu bot restart giữa chừng
+        job_id = await create_job(message_content, message.channel.id, send_targets, missing)
+        await run_job(job_id, message_content, client)
+        await send_job_report(job_id, message.channel)
     except Exception as e:
+        command_failed()
         log_action("ERROR", f"Send message error: {e}")
         await message.channel.send(f'❌ Error: {e}')
 
@@ -302,227 +314,130 @@ async def handle_send(message):
 async def handle_list_messages(message):
     """Handle !list command (English)"""
     try:
-        args = shlex.split(message.content)
-        
-        # Parse arguments
-        partners = []
-        projects = []
-        show_all = False
-        
-        i = 1
-        while i < len(args):
-            if args[i] == '-p':
-                if i + 1 < len(args):
-                    partners.append(args[i + 1].strip())
-                    i += 2
-                else:
-                    await message.channel.send('❌ Invalid syntax! -p must be followed by a partner name')
-                    return
-            elif args[i] == '-c':
-                if i + 1 < len(args):
-                    projects.append(args[i + 1].strip())
-                    i += 2
-                else:
-                    await message.channel.send('❌ Invalid syntax! -c must be followed by a project name')
-                    return
-            elif args[i] == '-all':
-                show_all = True
-                i += 1
-            else:
-                i += 1
-        
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        if show_all:
-            # Hiển thị tất cả messages
-            cur.execute('''
-                SELECT m.content, m.status, m.timestamp, pt.partner_name, p.project_name, pt.timezone
-                FROM messages m
-                JOIN partners pt ON m.partner_id = pt.partner_id
-                JOIN projects p ON m.project_id = p.project_id
-                ORDER BY m.timestamp DESC
-                LIMIT 50
-            ''')
-            rows = cur.fetchall()
-            
-            if not rows:
-                conn.close()
-                await message.channel.send('❌ No messages found in the system.')
-                return
-            
-            # Tạo message
-            msg = '**📋 Recent messages (all):**\n\n'
-            
-            for row in rows:
-                formatted_time = format_time_with_timezones(row['timestamp'], '+07:00', row['timezone'])
-                content = row['content'][:100] + '...' if len(row['content']) > 100 else row['content']
-                msg += f'**{row["status"]}** - {row["partner_name"]}/{row["project_name"]}\n'
-                msg += f'• {content}\n'
-                msg += f'• {formatted_time}\n\n'
-            
-            conn.close()
-            await message.channel.send(msg)
-            
-        elif partners:
-            # Hiển thị messages của các partners cụ thể
-            all_messages = []
-            
-            for partner_name in partners:
-                partner = find_partner_by_name_or_username(conn, partner_name)
-                if not partner:
-                    await message.channel.send(f'❌ Partner not found: **{partner_name}**')
-                    continue
-                
-                # Build query based on projects filter
-                if projects:
-                    placeholders = ','.join(['?' for _ in projects])
-                    cur.execute(f'''
-                        SELECT m.content, m.status, m.timestamp, p.project_name, pt.timezone
-                        FROM messages m
-                        JOIN projects p ON m.project_id = p.project_id
-                        JOIN partners pt ON m.partner_id = pt.partner_id
-                        WHERE m.partner_id = ? AND p.project_name IN ({placeholders})
-                        ORDER BY m.timestamp DESC
-                        LIMIT 20
-                    ''', [partner['partner_id']] + projects)
-                else:
-                    cur.execute('''
-                        SELECT m.content, m.status, m.timestamp, p.project_name, pt.timezone
-                        FROM messages m
-                        JOIN projects p ON m.project_id = p.project_id
-                        JOIN partners pt ON m.partner_id = pt.partner_id
-                        WHERE m.partner_id = ?
-                        ORDER BY m.timestamp DESC
-                        LIMIT 20
-                    ''', (partner['partner_id'],))
-                
-                messages = cur.fetchall()
-                
-                if messages:
-                    all_messages.append({
-                        'partner_name': partner['partner_name'],
-                        'timezone': partner.get('timezone', '+07:00'),
-                        'messages': messages
-                    })
-            
-            conn.close()
-            
-            if not all_messages:
-                await message.channel.send('❌ No messages found for the specified partners.')
-                return
-            
-            # Tạo message
-            msg = '**📋 Messages by Partners:**\n\n'
-            
-            for partner_data in all_messages:
-                msg += f'**👥 {partner_data["partner_name"]}:**\n'
-                for msg_data in partner_data['messages']:
-                    formatted_time = format_time_with_timezones(msg_data['timestamp'], '+07:00', partner_data['timezone'])
-                    content = msg_data['content'][:100] + '...' if len(msg_data['content']) > 100 else msg_data['content']
-                    msg += f'• **{msg_data["status"]}** - {msg_data["project_name"]}\n'
-                    msg += f'  {content}\n'
-                    msg += f'  {formatted_time}\n\n'
-            
-            await message.channel.send(msg)
-            
-        else:
-            # Hiển thị tất cả messages (mặc định)
-            cur.execute('''
-                SELECT m.content, m.status, m.timestamp, pt.partner_name, p.project_name, pt.timezone
-                FROM messages m
-                JOIN partners pt ON m.partner_id = pt.partner_id
-                JOIN projects p ON m.project_id = p.project_id
-                ORDER BY m.timestamp DESC
-                LIMIT 30
-            ''')
-            rows = cur.fetchall()
-            
-            if not rows:
-                conn.close()
-                await message.channel.send('❌ No messages found in the system.')
-                return
-            
-            # Tạo message
-            msg = '**📋 Recent messages:**\n\n'
-            
-            for row in rows:
-                formatted_time = format_time_with_timezones(row['timestamp'], '+07:00', row['timezone'])
-                content = row['content'][:100] + '...' if len(row['content']) > 100 else row['content']
-                msg += f'**{row["status"]}** - {row["partner_name"]}/{row["project_name"]}\n'
-                msg += f'• {content}\n'
-                msg += f'• {formatted_time}\n\n'
-            
-            conn.close()
-            await message.channel.send(msg)
-        
+        def header(partner_names, show_all):
+            if partner_names:
+                return '**📋 Messages by Partners:**\n'
+            return '**📋 Recent messages (all):**\n' if show_all else '**📋 Recent messages:**\n'
+        await send_history(message, header, empty_text='❌ No messages found in the system.')
     except Exception as e:
+        command_failed()
         log_action("ERROR", f"List messages error: {e}")
         await message.channel.send(f'❌ Error: {e}')
 
+def _transition_messages(conn, new_code, condition, params, reply_content=None):
+    """Chuyển mọi message khớp condition sang status new_code trong một câu UPDATE, trả về số message đã cập nhật.
+
+    Chỉ message có status được phép chuyển sang new_code (ma trận trong modules/status.py) mới bị đổi.
+    """
+    sources = transition_sources(new_code)
+    if not sources:
+        return 0
+    cur = conn.execute(
+        MESSAGE_TRANSITION_SQL.format(condition=condition, sources=','.join('?' * len(sources))),
+        [status_name(new_code), new_code, now_epoch_ms(), reply_content, *params, *sources]
+    )
+    return cur.rowcount
+
+def _advance_partner_projects(conn, partner_name, new_code):
+    """Đưa message mới nhất của mọi project của partner lên status new_code, trả về (partner, số message đã cập nhật)"""
+    partner = find_partner_by_name_or_username(conn, partner_name)
+    if not partner:
+        return None, 0
+    updated = _transition_messages(conn, new_code, PARTNER_LATEST_MESSAGES_CONDITION, [partner['partner_id']])
+    return partner, updated
+
+def _advance_broadcast(conn, broadcast_id, new_code):
+    """Đưa mọi message của một broadcast lên status new_code, trả về (số message của broadcast, số đã cập nhật)"""
+    total = conn.execute(BROADCAST_COUNT_SQL, (broadcast_id,)).fetchone()[0]
+    if not total:
+        return 0, 0
+    return total, _transition_messages(conn, new_code, BROADCAST_CONDITION, [broadcast_id])
+
+def _update_latest_message_status(conn, partner_name, project_name, new_code):
+    """Cập nhật status tin nhắn mới nhất của project, trả về (partner, project, updated)"""
+    cur = conn.cursor()
+    
+    # Find partner
+    partner = find_partner_by_name_or_username(conn, partner_name)
+    if not partner:
+        return None, None, False
+    
+    # Find project
+    cur.execute(PROJECT_BY_NAME_SQL, (partner['partner_id'], project_name))
+    project = cur.fetchone()
+    
+    if not project:
+        return partner, None, False
+    
+    # Update status of the most recent message
+    cur.execute(LATEST_MESSAGE_STATUS_SQL, (status_name(new_code), new_code, now_epoch_ms(), project['project_id']))
+    
+    return partner, project, cur.rowcount > 0
+
 # Hàm xử lý lệnh !message_status
 async def handle_message_status(message):
     """Handle !message_status command (English)"""
     try:
         args = shlex.split(message.content)
-        if len(args) < 3:
-            await message.channel.send('❌ Invalid syntax! Use: !message_status <partner> <project> <status>')
+        if len(args) < 4:
+            await message.channel.send('❌ Invalid syntax! Use: !message_status <partner> <project> <status>, '
+                                       '!message_status <partner> -all <status> or !message_status -b <broadcast_id> <status>')
             return
         
         partner_name = args[1].strip()
         project_name = args[2].strip()
-        new_status = args[3].strip()
+        # Validation status (chấp nhận cả alias: 'test_pass', 'pass_test', tên cũ)
+        new_code = normalize_status(args[3])
+        if new_code is None:
+            await message.channel.send(f'❌ Invalid status! Valid statuses: {", ".join(STATUS_NAMES)}')
+            return
+        new_status = status_name(new_code)
         
-        # Validation status
-        valid_statuses = ['request', 'order received', 'build sent', 'test pass', 'release app']
-        if new_status not in valid_statuses:
-            await message.channel.send(f'❌ Invalid status! Valid statuses: {", ".join(valid_statuses)}')
+        # Cả một lần gửi: mọi message có cùng broadcast_id
+        if partner_name == '-b':
+            try:
+                broadcast_id = int(project_name.lstrip('#'))
+            except ValueError:
+                await message.channel.send('❌ Invalid broadcast ID! Use the number shown at the end of the Send Report')
+                return
+            total, updated = await db_write(_advance_broadcast, broadcast_id, new_code)
+            if not total:
+                await message.channel.send(f'❌ No messages found for broadcast **#{broadcast_id}**')
+                return
+            log_action("MESSAGE_STATUS", f"User {message.author} advanced broadcast #{broadcast_id} to {new_status}: {updated}/{total} message(s)")
+            await message.channel.send(f'✅ Advanced **{updated}/{total}** message(s) of broadcast **#{broadcast_id}** to **{new_status}** '
+                                       f'(messages already at or past this status were left unchanged)')
             return
         
-        conn = get_db_connection()
-        cur = conn.cursor()
+        # Message mới nhất của mọi project của partner
+        if project_name == '-all':
+            partner, updated = await db_write(_advance_partner_projects, partner_name, new_code)
+            if not partner:
+                await message.channel.send(f'❌ Partner not found: **{partner_name}**')
+                return
+            log_action("MESSAGE_STATUS", f"User {message.author} advanced all projects of {partner_name} to {new_status}: {updated} message(s)")
+            await message.channel.send(f'✅ Advanced the latest message of **{updated}** project(s) of **{partner["partner_name"]}** to **{new_status}** '
+                                       f'(projects already at or past this status were left unchanged)')
+            return
         
-        # Find partner
-        partner = find_partner_by_name_or_username(conn, partner_name)
+        partner, project, updated = await db_write(_update_latest_message_status, partner_name, project_name, new_code)
         if not partner:
-            conn.close()
             await message.channel.send(f'❌ Partner not found: **{partner_name}**')
             return
         
-        # Find project
-        cur.execute('''
-            SELECT project_id, project_name
-            FROM projects
-            WHERE partner_id = ? AND project_name = ?
-        ''', (partner['partner_id'], project_name))
-        project = cur.fetchone()
-        
         if not project:
-            conn.close()
             await message.channel.send(f'❌ Project **{project_name}** not found in partner **{partner_name}**')
             return
         
-        # Update status of the most recent message
-        cur.execute('''
-            UPDATE messages 
-            SET status = ?, reply_timestamp = ?
-            WHERE project_id = ?
-            ORDER BY timestamp DESC
-            LIMIT 1
-        ''', (new_status, datetime.now().isoformat(), project['project_id']))
-        
-        if cur.rowcount == 0:
-            conn.close()
+        if not updated:
             await message.channel.send(f'❌ No message found in project **{project_name}**')
             return
         
-        conn.commit()
-        conn.close()
-        
         log_action("MESSAGE_STATUS", f"User {message.author} updated status for {partner_name}/{project_name}: {new_status}")
         await message.channel.send(f'✅ Successfully updated the status of the latest message in **{project_name}** to **{new_status}**')
         
     except Exception as e:
+        command_failed()
         log_action("ERROR", f"Message status error: {e}")
         await message.channel.send(f'❌ Error: {e}')
 
@@ -597,9 +512,27 @@ Request → Order Received → Build Sent → Test Pass → Release App
         await message.channel.send(reply_rules_text)
         
     except Exception as e:
+        command_failed()
         log_action("ERROR", f"Reply rules error: {e}")
         await message.channel.send(f'❌ Error: {e}') 
 
+def _find_messages_by_discord_id(conn, discord_message_id):
+    cur = conn.cursor()
+    cur.execute(MESSAGES_BY_DISCORD_ID_SQL, (discord_message_id,))
+    return cur.fetchall()
+
+def _apply_status_reply(conn, message_data, new_code, reply_content):
+    """Cập nhật message được reply cùng các message anh em (cùng broadcast, cùng partner) chưa tới new_code.
+
+    Trả về số message đã cập nhật.
+    """
+    if message_data['broadcast_id'] is None:
+        return _transition_messages(conn, new_code, MESSAGE_ID_CONDITION, [message_data['message_id']], reply_content)
+    return _transition_messages(
+        conn, new_code, REPLY_SIBLINGS_CONDITION,
+        [message_data['message_id'], message_data['broadcast_id'], message_data['partner_id']], reply_content
+    )
+
 # Hàm xử lý reply vào tin nhắn của bot để update status (English)
 async def handle_status_reply(message):
     """Handle reply to bot message to update status (English)"""
@@ -615,63 +548,38 @@ async def handle_status_reply(message):
         if len(parts) != 2:
             await message.channel.send("❌ **Wrong format!** Use: `<status_tag> | <your message>`")
             return
-        status_tag = parts[0].strip().lower()
+        new_code = status_for_reply_tag(parts[0])
         reply_content = parts[1].strip()
-        valid_statuses = {
-            'order_received': 'order received',
-            'resend_build': 'build sent',
-            'pass_test': 'test pass',
-            'release_app': 'release app'
-        }
-        if status_tag not in valid_statuses:
+        if new_code is None:
             await message.channel.send(f"❌ **Invalid status tag!**\n\nValid tags: `order_received`, `resend_build`, `pass_test`, `release_app`\n\n**Example:** `order_received | Order received`")
             return
         original_message = message.reference.resolved
         original_message_id = original_message.id
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute('''
-            SELECT m.message_id, m.partner_id, m.project_id, m.status, m.timestamp,
-                   pt.partner_name, p.project_name, m.content
-            FROM messages m
-            JOIN partners pt ON m.partner_id = pt.partner_id
-            JOIN projects p ON m.project_id = p.project_id
-            WHERE m.discord_message_id = ?
-        ''', (original_message_id,))
-        messages_found = cur.fetchall()
+        messages_found = await db_read(_find_messages_by_discord_id, original_message_id)
         if not messages_found:
-            conn.close()
             await message.channel.send("❌ **Message not found in database!**\n\nThis message was not sent through the bot system.")
             return
         if len(messages_found) > 1:
             await message.channel.send("⚠️ More than one message found in the DB with this discord_message_id! Please check your data.")
         message_data = messages_found[0]
-        current_status = message_data[3]
-        new_status = valid_statuses[status_tag]
-        status_order = ['request', 'order received', 'build sent', 'test pass', 'release app']
-        try:
-            current_index = status_order.index(current_status)
-            new_index = status_order.index(new_status)
-            if new_index <= current_index:
-                await message.channel.send(f"❌ **Invalid status progression!**\n\nCurrent status: **{current_status}**\nCannot go back to: **{new_status}**\n\n**Valid next status:** {status_order[current_index + 1] if current_index + 1 < len(status_order) else 'None (completed)'}")
-                conn.close()
-                return
-        except ValueError:
-            pass
-        cur.execute('''
-            UPDATE messages 
-            SET status = ?, reply_timestamp = ?, reply_content = ?
-            WHERE message_id = ?
-        ''', (new_status, datetime.now().isoformat(), reply_content, message_data[0]))
-        if cur.rowcount == 0:
-            conn.close()
+        current_code = message_data['status_code']
+        current_status = status_name(current_code)
+        new_status = status_name(new_code)
+        if not can_transition(current_code, new_code):
+            following = next_status(current_code)
+            await message.channel.send(f"❌ **Invalid status progression!**\n\nCurrent status: **{current_status}**\nCannot go back to: **{new_status}**\n\n**Valid next status:** {following.name if following else 'None (completed)'}")
+            return
+        updated = await db_write(_apply_status_reply, message_data, new_code, reply_content)
+        if not updated:
             await message.channel.send("❌ **Failed to update status!**")
             return
-        conn.commit()
-        conn.close()
         confirmation_msg = f"""✅ **Status Updated Successfully!**\n\n**Project:** {message_data[6]}\n**Partner:** {message_data[5]}\n**Previous Status:** {current_status}\n**New Status:** {new_status}\n**Your Reply:** {reply_content}\n\n**Status progression:** {current_status} → {new_status}"""
+        if updated > 1:
+            # Các project khác của partner nhận cùng lần gửi cũng được cập nhật theo reply này
+            confirmation_msg += f"\n**Also updated:** {updated - 1} other project(s) that received the same message"
         log_action("STATUS_UPDATE", f"Partner {message_data[5]} updated status for {message_data[6]}: {current_status} → {new_status}")
         await message.channel.send(confirmation_msg)
     except Exception as e:
+        command_failed()
         log_action("ERROR", f"Status reply error: {e}")
         await message.channel.send(f"❌ Error processing reply: {str(e)}") 
\ No newline at end of file
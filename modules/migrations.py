@@ -0,0 +1,296 @@
+# Schema database được quản lý bằng các migration đánh số, áp dụng một lần khi khởi động
+from datetime import datetime, timezone
+from modules.utils import make_project_code
+from modules.status import REQUEST, normalize_status, status_name
+
+def _column_names(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+def _add_column_if_missing(conn, table, column, definition):
+    if column not in _column_names(conn, table):
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+# Migration 1: schema gốc (IF NOT EXISTS để giữ nguyên database cũ)
+def _create_base_schema(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS partners (
+            partner_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            partner_name TEXT NOT NULL,
+            server_id TEXT NOT NULL,
+            timezone TEXT DEFAULT '+07:00',
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(partner_name, server_id)
+        )
+    ''')
+    
+    # Nhiều Discord users cho một partner
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS partner_discord_users (
+            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            partner_id INTEGER NOT NULL,
+            discord_username TEXT NOT NULL,
+            tag_type TEXT DEFAULT 'username',
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (partner_id) REFERENCES partners (partner_id) ON DELETE CASCADE,
+            UNIQUE(partner_id, discord_username)
+        )
+    ''')
+    
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS projects (
+            project_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_name TEXT NOT NULL,
+            partner_id INTEGER NOT NULL,
+            channel_id TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (partner_id) REFERENCES partners (partner_id) ON DELETE CASCADE,
+            UNIQUE(project_name, partner_id)
+        )
+    ''')
+    
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS messages (
+            message_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            partner_id INTEGER NOT NULL,
+            project_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            discord_message_id TEXT,
+            status TEXT DEFAULT 'request',
+            reply_content TEXT,
+            reply_timestamp TEXT,
+            timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (partner_id) REFERENCES partners (partner_id) ON DELETE CASCADE,
+            FOREIGN KEY (project_id) REFERENCES projects (project_id) ON DELETE CASCADE
+        )
+    ''')
+    
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schedules (
+            schedule_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            partner_id INTEGER NOT NULL,
+            project_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            scheduled_for TEXT NOT NULL,
+            status TEXT DEFAULT 'pending',
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (partner_id) REFERENCES partners (partner_id) ON DELETE CASCADE,
+            FOREIGN KEY (project_id) REFERENCES projects (project_id) ON DELETE CASCADE
+        )
+    ''')
+    
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS templates (
+            template_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            template_name TEXT NOT NULL UNIQUE,
+            template_content TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+# Migration 2: đưa các database tạo bởi script cũ (bot.py/setup.py/reset_database.py) về cùng schema
+def _reconcile_legacy_columns(conn):
+    _add_column_if_missing(conn, 'messages', 'reply_content', 'TEXT')
+    _add_column_if_missing(conn, 'messages', 'reply_timestamp', 'TEXT')
+    
+    # bot.py cũ lưu Discord user trực tiếp trong partners.discord_username
+    if 'discord_username' in _column_names(conn, 'partners'):
+        conn.execute('''
+            INSERT OR IGNORE INTO partner_discord_users (partner_id, discord_username, tag_type)
+            SELECT partner_id, discord_username,
+                   CASE WHEN discord_username LIKE '<@%>' THEN 'user_mention' ELSE 'username' END
+            FROM partners
+            WHERE discord_username IS NOT NULL AND discord_username != ''
+        ''')
+
+# Migration 3: index cho các cột tra cứu thường xuyên
+def _create_lookup_indexes(conn):
+    # Reply của partner tra theo discord_message_id
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_messages_discord_message_id ON messages (discord_message_id)')
+    # !info_project, !message_status
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_messages_project_timestamp ON messages (project_id, timestamp)')
+    # !list -p, !info_partner
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_messages_partner_timestamp ON messages (partner_id, timestamp)')
+    # !list / !list -all
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp)')
+    # Projects của một partner (UNIQUE(project_name, partner_id) không dùng được cho partner_id)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_projects_partner_id ON projects (partner_id)')
+    # !update_projects
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_projects_channel_id ON projects (channel_id)')
+    # Tìm partner theo Discord username
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_partner_discord_users_username ON partner_discord_users (discord_username)')
+
+# Migration 4: cột project_code (6 ký tự đầu viết thường) có index cho tra cứu theo mã
+def _add_project_code(conn):
+    _add_column_if_missing(conn, 'projects', 'project_code', 'TEXT')
+    rows = conn.execute('SELECT project_id, project_name FROM projects').fetchall()
+    conn.executemany('UPDATE projects SET project_code = ? WHERE project_id = ?',
+                     [(make_project_code(name), project_id) for project_id, name in rows])
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_projects_partner_code ON projects (partner_id, project_code)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_projects_code ON projects (project_code)')
+
+# Migration 5: outbox lưu plan của !send trước khi gửi để resume được sau khi restart
+def _create_outbox(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS outbox_jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            content TEXT NOT NULL,
+            reply_channel_id INTEGER,
+            status TEXT NOT NULL DEFAULT 'pending',
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            finished_at TEXT
+        )
+    ''')
+    # status: pending -> sending -> sent | failed; sending còn sót lại khi restart -> unknown
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS outbox_items (
+            item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL,
+            partner_id INTEGER NOT NULL,
+            project_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            discord_message_id INTEGER,
+            error TEXT,
+            updated_at TEXT,
+            FOREIGN KEY (job_id) REFERENCES outbox_jobs (job_id)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_outbox_jobs_status ON outbox_jobs (status)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_outbox_items_job_status ON outbox_items (job_id, status)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_outbox_items_status ON outbox_items (status)')
+
+# Migration 6: schedules được scheduler đọc theo (status, scheduled_for) và báo cáo về channel đã đặt lịch
+def _prepare_schedules(conn):
+    _add_column_if_missing(conn, 'schedules', 'reply_channel_id', 'INTEGER')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_schedules_status_time ON schedules (status, scheduled_for)')
+
+# Migration 7: tìm partner theo server khi đồng bộ projects từ sự kiện channel
+def _create_partner_server_index(conn):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_partners_server_id ON partners (server_id)')
+
+def _legacy_time_to_epoch_ms(value):
+    """Chuỗi thời gian cũ -> epoch ms UTC, None nếu không parse được.
+
+    Chuỗi có 'T' do datetime.now().isoformat() ghi (giờ local của máy chạy bot),
+    chuỗi 'YYYY-MM-DD HH:MM:SS' là CURRENT_TIMESTAMP của SQLite (UTC).
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.astimezone() if 'T' in str(value) else parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+# Migration 8: thời gian của messages dạng epoch ms UTC (INTEGER) để sắp xếp/lọc bằng so sánh số
+def _add_epoch_timestamps(conn):
+    _add_column_if_missing(conn, 'messages', 'timestamp_ms', 'INTEGER NOT NULL DEFAULT 0')
+    _add_column_if_missing(conn, 'messages', 'reply_timestamp_ms', 'INTEGER')
+    rows = conn.execute('SELECT message_id, timestamp, reply_timestamp FROM messages').fetchall()
+    updates = []
+    for message_id, timestamp, reply_timestamp in rows:
+        timestamp_ms = _legacy_time_to_epoch_ms(timestamp) or 0
+        reply_timestamp_ms = _legacy_time_to_epoch_ms(reply_timestamp)
+        if reply_timestamp and reply_timestamp_ms is None:
+            # Đã có reply nhưng không đọc được thời gian: giữ trạng thái "đã reply"
+            reply_timestamp_ms = timestamp_ms
+        updates.append((timestamp_ms, reply_timestamp_ms, message_id))
+    conn.executemany('UPDATE messages SET timestamp_ms = ?, reply_timestamp_ms = ? WHERE message_id = ?', updates)
+    # Thay các index theo chuỗi timestamp bằng index theo timestamp_ms
+    conn.execute('DROP INDEX IF EXISTS idx_messages_project_timestamp')
+    conn.execute('DROP INDEX IF EXISTS idx_messages_partner_timestamp')
+    conn.execute('DROP INDEX IF EXISTS idx_messages_timestamp')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_messages_project_time ON messages (project_id, timestamp_ms)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_messages_partner_time ON messages (partner_id, timestamp_ms)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_messages_time ON messages (timestamp_ms)')
+
+# Migration 9: broadcast_id gom các messages tạo ra bởi cùng một lần gửi (= outbox job_id)
+def _add_broadcast_id(conn):
+    _add_column_if_missing(conn, 'messages', 'broadcast_id', 'INTEGER')
+    # Messages gửi qua outbox: lấy job_id của item có cùng discord_message_id (messages lưu dạng TEXT)
+    job_ids = {
+        str(discord_message_id): job_id
+        for discord_message_id, job_id in conn.execute(
+            'SELECT discord_message_id, job_id FROM outbox_items WHERE discord_message_id IS NOT NULL'
+        )
+    }
+    rows = conn.execute('SELECT message_id, discord_message_id FROM messages WHERE discord_message_id IS NOT NULL').fetchall()
+    conn.executemany('UPDATE messages SET broadcast_id = ? WHERE message_id = ?', [
+        (job_ids[str(discord_message_id)], message_id)
+        for message_id, discord_message_id in rows
+        if str(discord_message_id) in job_ids
+    ])
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_messages_broadcast_partner ON messages (broadcast_id, partner_id)')
+
+# Migration 10: status dạng mã số nguyên (modules/status.py); tên cũ tiếng Việt được chuẩn hóa
+def _add_status_code(conn):
+    _add_column_if_missing(conn, 'messages', 'status_code', f'INTEGER NOT NULL DEFAULT {REQUEST}')
+    updates = []
+    for message_id, status in conn.execute('SELECT message_id, status FROM messages').fetchall():
+        code = normalize_status(status)
+        if code is None:
+            # Status lạ: coi như request (trước đây reply vào message này được chuyển sang bất kỳ status nào)
+            updates.append((REQUEST, status, message_id))
+        else:
+            updates.append((code, status_name(code), message_id))
+    conn.executemany('UPDATE messages SET status_code = ?, status = ? WHERE message_id = ?', updates)
+
+# Migration 11: thời gian của outbox dạng epoch ms UTC như messages (chuỗi cũ là giờ local hoặc UTC)
+def _add_outbox_epoch_times(conn):
+    for table, key, column in (('outbox_jobs', 'job_id', 'created_at'),
+                               ('outbox_jobs', 'job_id', 'finished_at'),
+                               ('outbox_items', 'item_id', 'updated_at')):
+        _add_column_if_missing(conn, table, f'{column}_ms', 'INTEGER')
+        rows = conn.execute(f'SELECT {key}, {column} FROM {table} WHERE {column} IS NOT NULL').fetchall()
+        conn.executemany(f'UPDATE {table} SET {column}_ms = ? WHERE {key} = ?',
+                         [(_legacy_time_to_epoch_ms(value), row_id) for row_id, value in rows])
+
+# (version, tên, hàm migrate) - chỉ thêm mới ở cuối, không sửa migration đã phát hành
+MIGRATIONS = [
+    (1, 'base schema', _create_base_schema),
+    (2, 'reconcile legacy columns', _reconcile_legacy_columns),
+    (3, 'lookup indexes', _create_lookup_indexes),
+    (4, 'project code column', _add_project_code),
+    (5, 'send outbox', _create_outbox),
+    (6, 'schedule lookup', _prepare_schedules),
+    (7, 'partner server index', _create_partner_server_index),
+    (8, 'epoch ms message timestamps', _add_epoch_timestamps),
+    (9, 'message broadcast id', _add_broadcast_id),
+    (10, 'message status codes', _add_status_code),
+    (11, 'epoch ms outbox times', _add_outbox_epoch_times),
+]
+
+def get_schema_version(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+def apply_migrations(conn):
+    """Áp dụng các migration chưa chạy, mỗi migration trong một transaction riêng.
+
+    Trả về danh sách (version, name) vừa được áp dụng.
+    """
+    current_version = get_schema_version(conn)
+    applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version <= current_version:
+            continue
+        conn.execute('BEGIN')
+        try:
+            migrate(conn)
+            conn.execute('INSERT INTO schema_version (version, name) VALUES (?, ?)', (version, name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append((version, name))
+    return applied
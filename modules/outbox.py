@@ -0,0 +1,135 @@
+from modules.constants import OUTBOX_BATCH_SIZE
+from modules.db_utils import db_read, db_write
+from modules.dispatch import fan_out
+from modules.channel_index import resolve_channel
+from modules.logger import log_action, log_debug
+from modules.timezones import now_epoch_ms
+from modules.status import REQUEST, status_name
+from modules.tracked_messages import track_message
+from modules.queries import (
+    OUTBOX_PENDING_ITEMS_SQL, OUTBOX_MARK_SENDING_SQL, OUTBOX_MARK_SENT_SQL, INSERT_SENT_MESSAGE_SQL,
+    OUTBOX_MARK_FAILED_SQL, OUTBOX_FINISH_JOB_SQL, OUTBOX_PENDING_JOBS_SQL, OUTBOX_RECOVER_SENDING_SQL
+)
+
+# Outbox cho !send: plan được lưu trước khi gửi, mỗi lần gửi được ghi lại ngay.
+# Trạng thái item: pending -> sending -> sent | failed. Item chỉ chuyển sang 'sending'
+# ngay trước channel.send của chính nó, nên item còn 'sending' lúc khởi động lại có thể
+# đã tới Discord và được đánh dấu 'unknown', không gửi lại; item chưa gửi vẫn 'pending'.
+
+def insert_job(conn, content, reply_channel_id, targets, missing):
+    """Lưu job và toàn bộ item; project không có channel được ghi failed ngay"""
+    # Thời gian của outbox lưu ở các cột *_ms (epoch ms UTC) như bảng messages
+    now = now_epoch_ms()
+    cur = conn.execute('INSERT INTO outbox_jobs (content, reply_channel_id, created_at_ms) VALUES (?, ?, ?)',
+                       (content, reply_channel_id, now))
+    job_id = cur.lastrowid
+    rows = [
+        (job_id, t.partner['partner_id'], t.project['project_id'], t.project['channel_id'], t.content, 'pending', None, now)
+        for t in targets
+    ]
+    rows += [
+        (job_id, partner['partner_id'], project['project_id'], project['channel_id'], '', 'failed', 'Channel not found', now)
+        for partner, project in missing
+    ]
+    conn.executemany('''
+        INSERT INTO outbox_items (job_id, partner_id, project_id, channel_id, content, status, error, updated_at_ms)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    return job_id
+
+def _load_pending_items(conn, job_id, after_item_id, limit):
+    """Tối đa limit item pending của job có item_id > after_item_id (chưa đổi status)"""
+    return conn.execute(OUTBOX_PENDING_ITEMS_SQL, (job_id, after_item_id, limit)).fetchall()
+
+def _mark_sending(conn, item_id):
+    """Chuyển một item sang 'sending' ngay trước khi gửi; False nếu item không còn pending"""
+    cur = conn.execute(OUTBOX_MARK_SENDING_SQL, (now_epoch_ms(), item_id))
+    return cur.rowcount > 0
+
+def _mark_sent(conn, item, message_content, discord_message_id):
+    """Ghi nhận một lần gửi thành công cùng dòng messages để tracking status"""
+    now = now_epoch_ms()
+    conn.execute(OUTBOX_MARK_SENT_SQL, (discord_message_id, now, item['item_id']))
+    # timestamp (chuỗi) giữ mặc định CURRENT_TIMESTAMP (UTC); sắp xếp/lọc dùng timestamp_ms.
+    # broadcast_id = job_id: các messages của cùng một lần gửi được cập nhật status cùng nhau
+    conn.execute(INSERT_SENT_MESSAGE_SQL, (item['partner_id'], item['project_id'], message_content, discord_message_id,
+          status_name(REQUEST), REQUEST, now, item['job_id']))
+
+def _mark_failed(conn, failures):
+    """failures: list (item_id, error)"""
+    now = now_epoch_ms()
+    conn.executemany(OUTBOX_MARK_FAILED_SQL, [(error, now, item_id) for item_id, error in failures])
+
+def _finish_job(conn, job_id):
+    conn.execute(OUTBOX_FINISH_JOB_SQL, (now_epoch_ms(), job_id))
+
+def _load_pending_jobs(conn):
+    return conn.execute(OUTBOX_PENDING_JOBS_SQL).fetchall()
+
+def recover_interrupted_items(conn):
+    """Gọi lúc khởi động: item đang 'sending' khi bot dừng không được gửi lại"""
+    cur = conn.execute(OUTBOX_RECOVER_SENDING_SQL, (now_epoch_ms(),))
+    return cur.rowcount
+
+async def create_job(content, reply_channel_id, targets, missing):
+    """Lưu send plan vào outbox, trả về job_id"""
+    return await db_write(insert_job, content, reply_channel_id, targets, missing)
+
+async def load_pending_jobs():
+    return await db_read(_load_pending_jobs)
+
+async def _deliver(item, channel, message_content):
+    # Gọi sau khi limiter đã cho phép: chỉ item thực sự sắp gửi mới thành 'sending'
+    if not await db_write(_mark_sending, item['item_id']):
+        return None
+    sent_message = await channel.send(item['content'])
+    # Đánh dấu ngay sau khi gửi để reply đến sớm không bị on_message bỏ qua
+    track_message(sent_message.id)
+    try:
+        await db_write(_mark_sent, item, message_content, sent_message.id)
+    except Exception as e:
+        # Tin đã tới Discord: để item ở 'sending' (thành 'unknown' khi restart) thay vì gửi lại
+        log_action("ERROR", f"Outbox item {item['item_id']} was sent but could not be recorded: {e}")
+    return sent_message
+
+async def run_job(job_id, message_content, client, batch_size=OUTBOX_BATCH_SIZE):
+    """Gửi hết các item pending của job theo từng lô, trả về (sent_count, failed_count)"""
+    sent_count = 0
+    failed_count = 0
+    last_item_id = 0
+    while True:
+        items = await db_read(_load_pending_items, job_id, last_item_id, batch_size)
+        if not items:
+            break
+        last_item_id = items[-1]['item_id']
+
+        failures = []
+        jobs = []
+        for item in items:
+            channel = resolve_channel(item['channel_id'], client)
+            if channel is None:
+                failures.append((item['item_id'], 'Channel not found'))
+                continue
+            jobs.append((item, channel))
+
+        results = await fan_out([
+            (channel.id, lambda item=item, channel=channel: _deliver(item, channel, message_content))
+            for item, channel in jobs
+        ])
+        for (item, channel), (ok, result) in zip(jobs, results):
+            if ok:
+                # None: item đã được xử lý ở nơi khác (không còn pending)
+                if result is not None:
+                    sent_count += 1
+            else:
+                log_action("ERROR", f"Failed to send outbox item {item['item_id']} to channel {channel.id}: {result}")
+                failures.append((item['item_id'], str(result)))
+
+        if failures:
+            await db_write(_mark_failed, failures)
+        failed_count += len(failures)
+        log_debug("Outbox job %s: %s sent, %s failed so far", job_id, sent_count, failed_count)
+
+    await db_write(_finish_job, job_id)
+    log_action("SEND", f"Outbox job {job_id} finished: {sent_count} sent, {failed_count} failed")
+    return sent_count, failed_count
@@ -0,0 +1,60 @@
+import shlex
+from modules.constants import MAX_MESSAGE_LENGTH
+
+# Gom output theo dòng thành các trang < giới hạn ký tự của Discord và gửi ngay khi đầy
+class Paginator:
+    def __init__(self, channel, header=None, limit=MAX_MESSAGE_LENGTH):
+        self.channel = channel
+        self.limit = limit
+        self.lines = []
+        self.size = 0
+        self.pages_sent = 0
+        if header:
+            self.lines.append(header)
+            self.size = len(header) + 1
+
+    async def add_line(self, line):
+        if len(line) > self.limit:
+            line = line[:self.limit - 3] + '...'
+        if self.size + len(line) + 1 > self.limit:
+            await self.flush()
+        self.lines.append(line)
+        self.size += len(line) + 1
+
+    async def add(self, block):
+        """Thêm một khối nhiều dòng; khối vừa một trang thì không bị tách giữa hai trang"""
+        lines = block.split('\n')
+        block_size = sum(len(line) + 1 for line in lines)
+        if self.size + block_size > self.limit and block_size <= self.limit:
+            await self.flush()
+        for line in lines:
+            await self.add_line(line)
+
+    async def flush(self):
+        text = '\n'.join(self.lines).strip('\n')
+        self.lines = []
+        self.size = 0
+        if text:
+            await self.channel.send(text)
+            self.pages_sent += 1
+
+async def send_paginated(channel, text, limit=MAX_MESSAGE_LENGTH):
+    """Gửi một đoạn text dài thành nhiều tin nhắn, tách ở ranh giới dòng"""
+    paginator = Paginator(channel, limit=limit)
+    for line in text.split('\n'):
+        await paginator.add_line(line)
+    await paginator.flush()
+
+def next_page_command(args, cursor_flag, cursor):
+    """Dựng lại lệnh với cursor mới (bỏ cursor cũ nếu có) để người dùng gõ lấy trang tiếp theo"""
+    kept = []
+    skip = False
+    for arg in args[1:]:
+        if skip:
+            skip = False
+            continue
+        if arg == cursor_flag:
+            skip = True
+            continue
+        kept.append(arg)
+    return f"{args[0]} {shlex.join(kept + [cursor_flag, cursor])}"
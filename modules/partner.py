@@ -1,59 +1,62 @@
-from modules.db_utils import get_db_connection, log_action
-from modules.utils import normalize_name, format_timezone_display, get_partner_time_with_timezone, format_time_with_timezones
-import discord
+from modules.db_utils import db_read, db_write
+from modules.logger import log_action, log_debug
+from modules.utils import normalize_name
+from modules.timezones import get_tzinfo, format_epoch_ms, now_epoch_ms
+from modules.status import count_by_status, format_status_stats, status_name
+from modules.project_sync import project_channels, sync_partner_projects
+from modules.partner_summary import load_partner_summaries
+from modules.paginator import Paginator
+from modules.registry import find_partner, find_partner_by_name, refresh_partners
+from modules.router import command_failed
+from modules.queries import (
+    PARTNER_IN_SERVER_SQL, PARTNER_STATUS_COUNTS_SQL, PARTNER_RECENT_MESSAGES_SQL, FAIL_PARTNER_OUTBOX_ITEMS_SQL,
+    CANCEL_PARTNER_SCHEDULES_SQL, DELETE_PARTNER_MESSAGES_SQL, DELETE_PARTNER_PROJECTS_SQL, DELETE_PARTNER_USERS_SQL,
+    DELETE_PARTNER_SQL
+)
 import shlex
 
 # Hàm tìm partner theo tên hoặc discord username
 def find_partner_by_name_or_username(conn, identifier):
-    """Tìm partner theo tên hoặc discord username"""
+    """Tìm partner theo tên hoặc discord username (tra trong registry, không query DB)"""
+    partner = find_partner(conn, identifier)
+    return partner.as_partner_dict() if partner else None
+
+def _find_partner_in_server(conn, partner_name, server_id):
+    cur = conn.cursor()
+    cur.execute(PARTNER_IN_SERVER_SQL, (partner_name, server_id))
+    return cur.fetchone()
+
+def _insert_partner(conn, partner_name, server_id, partner_timezone, discord_usernames, accessible_channels):
+    """Thêm partner cùng Discord users và projects trong một transaction.
+
+    accessible_channels là dict channel_id -> tên. Trả về (partner_id, projects_added,
+    project_conflicts, duplicate_users) với project_conflicts là tên các channel bị trùng.
+    """
     cur = conn.cursor()
     
-    # Thử tìm theo partner_name
+    # Thêm partner
     cur.execute('''
-        SELECT partner_id, partner_name, server_id, timezone
-        FROM partners 
-        WHERE partner_name = ?
-    ''', (identifier,))
-    partner = cur.fetchone()
+        INSERT INTO partners (partner_name, server_id, timezone)
+        VALUES (?, ?, ?)
+    ''', (partner_name, server_id, partner_timezone))
     
-    if partner:
-        # Lấy discord_username cho partner này từ partner_discord_users table
-        cur.execute('''
-            SELECT discord_username FROM partner_discord_users 
-            WHERE partner_id = ?
-        ''', (partner['partner_id'],))
-        discord_users = cur.fetchall()
-        discord_username = ', '.join([u['discord_username'] for u in discord_users]) if discord_users else None
-        
-        # Tạo partner dict với discord_username
-        partner_dict = dict(partner)
-        partner_dict['discord_username'] = discord_username
-        return partner_dict
+    partner_id = cur.lastrowid
     
-    # Nếu không tìm thấy, thử tìm theo discord_username
-    cur.execute('''
-        SELECT p.partner_id, p.partner_name, p.server_id, p.timezone
-        FROM partners p
-        JOIN partner_discord_users pdu ON p.partner_id = pdu.partner_id
-        WHERE pdu.discord_username = ?
-    ''', (identifier,))
-    partner = cur.fetchone()
+    # Thêm tất cả Discord users, tag_type dựa trên dạng mention hay username
+    users = [
+        (partner_id, discord_username, 'user_mention' if discord_username.startswith('<@') and discord_username.endswith('>') else 'username')
+        for discord_username in discord_usernames
+    ]
+    inserted_users = cur.executemany('''
+        INSERT INTO partner_discord_users (partner_id, discord_username, tag_type)
+        VALUES (?, ?, ?)
+        ON CONFLICT (partner_id, discord_username) DO NOTHING
+    ''', users).rowcount
     
-    if partner:
-        # Lấy discord_username cho partner này
-        cur.execute('''
-            SELECT discord_username FROM partner_discord_users 
-            WHERE partner_id = ?
-        ''', (partner['partner_id'],))
-        discord_users = cur.fetchall()
-        discord_username = ', '.join([u['discord_username'] for u in discord_users]) if discord_users else None
-        
-        # Tạo partner dict với discord_username
-        partner_dict = dict(partner)
-        partner_dict['discord_username'] = discord_username
-        return partner_dict
+    # Thêm tất cả channels làm projects (channel trùng tên được đếm là conflict)
+    added, _, _, conflicts = sync_partner_projects(conn, {'partner_id': partner_id}, accessible_channels)
     
-    return None
+    return partner_id, len(added), conflicts, len(users) - inserted_users
 
 # Hàm xử lý lệnh !add_partner
 async def handle_add_partner(message):
@@ -89,7 +92,7 @@ async def handle_add_partner(message):
                 return
             
             # Test timezone parsing
-            get_partner_time_with_timezone(partner_timezone)
+            get_tzinfo(partner_timezone)
         except:
             await message.channel.send('❌ Invalid timezone! Use format: +07:00, +05:30, -05:00')
             return
@@ -105,85 +108,40 @@ async def handle_add_partner(message):
             await message.channel.send(f'❌ Server ID does not match!\n\n**Current Server:** {guild.name} (ID: {guild.id})\n**Server ID you entered:** {server_id}')
             return
 
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
         # Kiểm tra partner đã tồn tại chưa
-        cur.execute('SELECT partner_id FROM partners WHERE partner_name = ? AND server_id = ?', (partner_name, server_id))
-        existing_partner = cur.fetchone()
+        existing_partner = await db_read(_find_partner_in_server, partner_name, server_id)
         
         if existing_partner:
             await message.channel.send(f'❌ Partner **{partner_name}** already exists in this server.')
-            conn.close()
             return
         
         # Lấy tất cả text channels mà bot có thể truy cập
-        accessible_channels = []
-        for channel in guild.channels:
-            try:
-                if hasattr(channel, 'type') and str(channel.type) == 'text':
-                    bot_permissions = channel.permissions_for(guild.me)
-                    if bot_permissions.view_channel and bot_permissions.send_messages:
-                        accessible_channels.append({
-                            'name': channel.name,
-                            'id': channel.id
-                        })
-            except:
-                continue
+        accessible_channels = project_channels(guild)
         
         if not accessible_channels:
             await message.channel.send('❌ Bot does not have access to any channels in this server.')
-            conn.close()
             return
         
-        # Thêm partner
-        cur.execute('''
-            INSERT INTO partners (partner_name, server_id, timezone)
-            VALUES (?, ?, ?)
-        ''', (partner_name, server_id, partner_timezone))
-        
-        partner_id = cur.lastrowid
-        
-        # Thêm tất cả Discord users
-        for discord_username in discord_usernames:
-            # Xác định tag_type dựa trên discord_username
-            if discord_username.startswith('<@') and discord_username.endswith('>'):
-                tag_type = 'user_mention'
-            else:
-                tag_type = 'username'
-            
-            try:
-                cur.execute('''
-                    INSERT INTO partner_discord_users (partner_id, discord_username, tag_type)
-                    VALUES (?, ?, ?)
-                ''', (partner_id, discord_username, tag_type))
-            except:
-                # User đã tồn tại
-                continue
-        
-        # Thêm tất cả channels làm projects
-        projects_added = 0
-        for channel in accessible_channels:
-            try:
-                cur.execute('''
-                    INSERT INTO projects (project_name, partner_id, channel_id)
-                    VALUES (?, ?, ?)
-                ''', (channel['name'], partner_id, channel['id']))
-                projects_added += 1
-            except:
-                # Project đã tồn tại
-                continue
-        
-        conn.commit()
-        conn.close()
+        partner_id, projects_added, project_conflicts, duplicate_users = await db_write(
+            _insert_partner, partner_name, server_id, partner_timezone, discord_usernames, accessible_channels
+        )
+        await refresh_partners([partner_id])
         
         # Tạo danh sách Discord usernames để hiển thị
         discord_users_display = ', '.join(discord_usernames) if discord_usernames else 'None'
         
-        log_action("ADD_PARTNER", f"User {message.author} added server as partner: {partner_name} with {projects_added} projects and {len(discord_usernames)} Discord users")
-        await message.channel.send(f'✅ Partner **{partner_name}** added successfully!\n\n📊 **Information:**\n• **Server:** {guild.name}\n• **Discord Users:** {discord_users_display}\n• **Timezone:** {partner_timezone}\n• **Projects:** {projects_added} channels\n\n💡 **Next command:**\n• `!list_projects -p "{partner_name}"` - View project list\n• `!send -p "{partner_name}" -c "channel_name" | <content>` - Send message')
+        # Báo rõ các dòng bị bỏ qua do trùng thay vì nuốt lỗi
+        skipped_info = ''
+        if project_conflicts:
+            skipped_info += f'\n• **Skipped channels (duplicate name):** {", ".join(project_conflicts)}'
+        if duplicate_users:
+            skipped_info += f'\n• **Duplicate Discord users ignored:** {duplicate_users}'
+        
+        log_action("ADD_PARTNER", f"User {message.author} added server as partner: {partner_name} with {projects_added} projects and {len(discord_usernames)} Discord users ({len(project_conflicts)} project conflicts, {duplicate_users} duplicate users)")
+        await message.channel.send(f'✅ Partner **{partner_name}** added successfully!\n\n📊 **Information:**\n• **Server:** {guild.name}\n• **Discord Users:** {discord_users_display}\n• **Timezone:** {partner_timezone}\n• **Projects:** {projects_added} channels{skipped_info}\n\n💡 **Next command:**\n• `!list_projects -p "{partner_name}"` - View project list\n• `!send -p "{partner_name}" -c "channel_name" | <content>` - Send message')
         
     except Exception as e:
+        command_failed()
         log_action("ERROR", f"Add partner error: {e}")
         await message.channel.send(f'❌ An error occurred: {e}')
 
@@ -191,80 +149,51 @@ async def handle_add_partner(message):
 async def handle_list_partners(message):
     """Xử lý lệnh !list_partners"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Lấy thông tin partners đơn giản - chỉ thông tin cần thiết
-        cur.execute('''
-            SELECT pt.partner_id, pt.partner_name, pt.timezone,
-                   GROUP_CONCAT(p.project_name, ', ') as projects,
-                   COUNT(DISTINCT p.project_id) as project_count
-            FROM partners pt
-            LEFT JOIN projects p ON pt.partner_id = p.partner_id
-            GROUP BY pt.partner_id, pt.partner_name, pt.timezone
-            ORDER BY pt.partner_name
-        ''')
-        rows = cur.fetchall()
-        
-        if not rows:
-            conn.close()
+        summaries = await db_read(load_partner_summaries)
+        
+        if not summaries:
             await message.channel.send('❌ No partners found in the system.')
             return
         
-        # Lấy tất cả Discord users cho tất cả partners và convert sang username
-        partner_discord_users = {}
-        for row in rows:
-            cur.execute('''
-                SELECT discord_username FROM partner_discord_users 
-                WHERE partner_id = ?
-            ''', (row['partner_id'],))
-            discord_users = cur.fetchall()
-            
-            # Convert Discord User IDs sang usernames
-            discord_usernames = []
-            for user in discord_users:
-                username = user['discord_username']
-                if username.startswith('<@') and username.endswith('>'):
-                    # User ID mention - convert sang username
-                    user_id = username[2:-1]  # Bỏ <@ và >
-                    discord_usernames.append(f"@{user_id}")
-                else:
-                    # Username thường - thêm @
-                    clean_username = username.replace('@', '')
-                    discord_usernames.append(f"@{clean_username}")
-            
-            partner_discord_users[row['partner_id']] = ', '.join(discord_usernames) if discord_usernames else "N/A"
-        
-        conn.close()
-        
-        # Tạo message đơn giản - không dùng bảng
-        msg = '**👥 Partner List:**\n\n'
+        # Mỗi partner là một khối, gửi dần từng trang thay vì dựng một chuỗi lớn
+        paginator = Paginator(message.channel, header='**👥 Partner List:**\n')
         
-        for row in rows:
-            # Lấy danh sách Discord users cho partner này
-            discord_info = partner_discord_users.get(row['partner_id'], "N/A")
-            
-            # Format danh sách projects - loại bỏ trùng lặp
-            projects_list = row["projects"] if row["projects"] else "N/A"
-            if projects_list != "N/A":
-                # Loại bỏ trùng lặp trong danh sách projects
-                unique_projects = list(set([p.strip() for p in projects_list.split(',')]))
-                projects_list = ', '.join(unique_projects)
+        for summary in summaries:
+            # Projects giữ nguyên thứ tự theo tên
+            projects_list = ', '.join(p['project_name'] for p in summary.projects) or "N/A"
             
-            project_count = str(row["project_count"]) if row["project_count"] else "0"
-            
-            msg += f'**📋 {row["partner_name"]}**\n'
-            msg += f'   • Discord: {discord_info}\n'
-            msg += f'   • Timezone: {row["timezone"]}\n'
-            msg += f'   • Projects: {project_count}\n'
-            msg += f'   • Projects: {projects_list}\n\n'
+            await paginator.add(f'**📋 {summary.partner_name}**\n'
+                                f'   • Discord: {summary.display_discord_users()}\n'
+                                f'   • Timezone: {summary.timezone}\n'
+                                f'   • Projects: {len(summary.projects)}\n'
+                                f'   • Projects: {projects_list}\n')
         
-        await message.channel.send(msg)
+        await paginator.flush()
         
     except Exception as e:
+        command_failed()
         log_action("ERROR", f"List partners error: {e}")
         await message.channel.send(f'❌ An error occurred: {e}')
 
+def _load_partner_info(conn, partner_identifier):
+    """Trả về (PartnerSummary, stats, recent_messages) hoặc None nếu không tìm thấy"""
+    partner = find_partner_by_name_or_username(conn, partner_identifier)
+    if not partner:
+        return None
+    
+    summary = load_partner_summaries(conn, [partner['partner_id']])[0]
+    cur = conn.cursor()
+    
+    # Lấy thống kê messages
+    cur.execute(PARTNER_STATUS_COUNTS_SQL, (partner['partner_id'],))
+    stats = count_by_status(cur.fetchall())
+    
+    # Lấy tin nhắn gần đây
+    cur.execute(PARTNER_RECENT_MESSAGES_SQL, (partner['partner_id'],))
+    recent_messages = cur.fetchall()
+    
+    return summary, stats, recent_messages
+
 # Hàm xử lý lệnh !info_partner
 async def handle_info_partner(message):
     """Handle !info_partner command (English)"""
@@ -276,72 +205,27 @@ async def handle_info_partner(message):
         
         partner_identifier = args[1].strip()
         
-        conn = get_db_connection()
-        partner = find_partner_by_name_or_username(conn, partner_identifier)
+        partner_info = await db_read(_load_partner_info, partner_identifier)
         
-        if not partner:
-            conn.close()
+        if not partner_info:
             await message.channel.send(f'❌ Không tìm thấy partner với tên hoặc username: **{partner_identifier}**')
             return
         
-        # Lấy thông tin chi tiết về partner
-        cur = conn.cursor()
-        
-        # Lấy danh sách projects
-        cur.execute('''
-            SELECT project_name, created_at
-            FROM projects
-            WHERE partner_id = ?
-            ORDER BY project_name
-        ''', (partner['partner_id'],))
-        projects = cur.fetchall()
-        
-        # Lấy thống kê messages
-        cur.execute('''
-            SELECT 
-                COUNT(*) as total_messages,
-                SUM(CASE WHEN status = 'request' THEN 1 ELSE 0 END) as request_count,
-                SUM(CASE WHEN status IN ('nhận order', 'order received') THEN 1 ELSE 0 END) as order_count,
-                SUM(CASE WHEN status IN ('gửi lại bản build', 'build sent') THEN 1 ELSE 0 END) as build_count,
-                SUM(CASE WHEN status = 'test pass' THEN 1 ELSE 0 END) as test_count,
-                SUM(CASE WHEN status = 'release app' THEN 1 ELSE 0 END) as release_count
-            FROM messages
-            WHERE partner_id = ?
-        ''', (partner['partner_id'],))
-        stats = cur.fetchone()
-        
-        # Lấy tin nhắn gần đây
-        cur.execute('''
-            SELECT content, status, timestamp, reply_timestamp
-            FROM messages
-            WHERE partner_id = ?
-            ORDER BY timestamp DESC
-            LIMIT 5
-        ''', (partner['partner_id'],))
-        recent_messages = cur.fetchall()
-        
-        conn.close()
+        partner, stats, recent_messages = partner_info
+        projects = partner.projects
         
         # Format thông tin
-        partner_timezone = partner.get('timezone', '+07:00')
+        partner_timezone = partner.timezone or '+07:00'
         
         # Tạo message
-        msg = f'**📊 Partner Information: {partner["partner_name"]}**\n\n'
+        msg = f'**📊 Partner Information: {partner.partner_name}**\n\n'
         msg += f'**🔧 Basic Information:**\n'
-        msg += f'• **Server ID:** {partner["server_id"]}\n'
+        msg += f'• **Server ID:** {partner.server_id}\n'
         msg += f'• **Timezone:** {partner_timezone}\n'
-        msg += f'• **Discord Users:** {partner.get("discord_username", "N/A")}\n\n'
+        msg += f'• **Discord Users:** {", ".join(partner.discord_users) or "N/A"}\n\n'
         
         # Thống kê messages
-        if stats and stats['total_messages'] > 0:
-            total = stats['total_messages']
-            msg += f'**📈 Message Statistics:**\n'
-            msg += f'• **Total:** {total}\n'
-            msg += f'• **Request:** {stats["request_count"]} ({stats["request_count"]/total*100:.1f}%)\n'
-            msg += f'• **Order Received:** {stats["order_count"]} ({stats["order_count"]/total*100:.1f}%)\n'
-            msg += f'• **Build Sent:** {stats["build_count"]} ({stats["build_count"]/total*100:.1f}%)\n'
-            msg += f'• **Test Pass:** {stats["test_count"]} ({stats["test_count"]/total*100:.1f}%)\n'
-            msg += f'• **Release App:** {stats["release_count"]} ({stats["release_count"]/total*100:.1f}%)\n\n'
+        msg += format_status_stats(stats)
         
         # Danh sách projects
         if projects:
@@ -354,27 +238,30 @@ async def handle_info_partner(message):
         if recent_messages:
             msg += f'**💬 Recent messages:**\n'
             for msg_data in recent_messages:
-                status = msg_data['status']
+                status = status_name(msg_data['status_code'])
                 content = msg_data['content']
-                timestamp = msg_data['timestamp']
-                reply_timestamp = msg_data['reply_timestamp'] if 'reply_timestamp' in msg_data.keys() else None
-                # Thời gian cập nhật trạng thái (reply_timestamp nếu có, nếu không thì timestamp)
-                update_time = reply_timestamp if reply_timestamp else timestamp
-                # Định dạng thời gian cập nhật trạng thái (ngắn, +07:00)
-                update_time_str = ''
-                if update_time:
-                    try:
-                        update_time_str = str(update_time)[:19].replace('T', ' ') + ' (+07:00)'
-                    except:
-                        update_time_str = str(update_time) + ' (+07:00)'
+                timestamp = msg_data['timestamp_ms']
+                reply_timestamp = msg_data['reply_timestamp_ms']
+                # Thời gian cập nhật trạng thái (reply nếu có, nếu không thì lúc gửi), giờ +07:00
+                update_time = reply_timestamp if reply_timestamp is not None else timestamp
+                update_time_str = format_epoch_ms(update_time) + ' (+07:00)'
                 msg += f'• {status}  {update_time_str}\n{content}\n'
         
         await message.channel.send(msg)
         
     except Exception as e:
+        command_failed()
         log_action("ERROR", f"Info partner error: {e}")
         await message.channel.send(f'❌ Error: {e}')
 
+def _set_partner_timezone(conn, partner_name, new_timezone):
+    """Đổi timezone của partner (tìm theo tên trong registry), trả về partner_id hoặc None"""
+    partner = find_partner_by_name(conn, partner_name)
+    if not partner:
+        return None
+    conn.execute('UPDATE partners SET timezone = ? WHERE partner_id = ?', (new_timezone, partner.partner_id))
+    return partner.partner_id
+
 # Hàm xử lý lệnh !set_timezone
 async def handle_set_timezone(message):
     """Handle !set_timezone command (English)"""
@@ -389,27 +276,40 @@ async def handle_set_timezone(message):
             await message.channel.send('❌ Timezone must start with + or - (e.g. +07:00, +05:30)')
             return
         try:
-            get_partner_time_with_timezone(new_timezone)
-        except:
+            get_tzinfo(new_timezone)
+        except ValueError:
             await message.channel.send('❌ Invalid timezone! Use format: +07:00, +05:30, -05:00')
             return
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute('SELECT partner_id, partner_name FROM partners WHERE partner_name = ?', (partner_name,))
-        partner = cur.fetchone()
-        if not partner:
-            conn.close()
+        partner_id = await db_write(_set_partner_timezone, partner_name, new_timezone)
+        if not partner_id:
             await message.channel.send(f'❌ Partner not found: **{partner_name}**')
             return
-        cur.execute('UPDATE partners SET timezone = ? WHERE partner_id = ?', (new_timezone, partner['partner_id']))
-        conn.commit()
-        conn.close()
+        await refresh_partners([partner_id])
         log_action("SET_TIMEZONE", f"User {message.author} updated timezone for {partner_name}: {new_timezone}")
         await message.channel.send(f'✅ Timezone for **{partner_name}** updated to **{new_timezone}**')
     except Exception as e:
+        command_failed()
         log_action("ERROR", f"Set timezone error: {e}")
         await message.channel.send(f'❌ Error: {e}')
 
+def _delete_partner(conn, partner_name):
+    """Xóa partner và toàn bộ dữ liệu liên quan, trả về partner_id hoặc None"""
+    # Tìm partner theo tên trong registry
+    partner = find_partner_by_name(conn, partner_name)
+    if not partner:
+        return None
+    partner_id = partner.partner_id
+    
+    # Tin chưa gửi trong outbox và lịch hẹn còn pending của partner sẽ không được gửi nữa
+    cur = conn.cursor()
+    cur.execute(FAIL_PARTNER_OUTBOX_ITEMS_SQL, (now_epoch_ms(), partner_id))
+    cur.execute(CANCEL_PARTNER_SCHEDULES_SQL, (partner_id,))
+    
+    # Xóa tất cả dữ liệu liên quan
+    for query in (DELETE_PARTNER_MESSAGES_SQL, DELETE_PARTNER_PROJECTS_SQL, DELETE_PARTNER_USERS_SQL, DELETE_PARTNER_SQL):
+        cur.execute(query, (partner_id,))
+    return partner_id
+
 # Hàm xử lý lệnh !delete_partner
 async def handle_delete_partner(message):
     """Xử lý lệnh !delete_partner"""
@@ -421,34 +321,46 @@ async def handle_delete_partner(message):
         
         partner_name = args[1].strip()
         
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Tìm partner
-        cur.execute('SELECT partner_id, partner_name FROM partners WHERE partner_name = ?', (partner_name,))
-        partner = cur.fetchone()
+        partner_id = await db_write(_delete_partner, partner_name)
         
-        if not partner:
-            conn.close()
+        if not partner_id:
             await message.channel.send(f'❌ Partner not found: **{partner_name}**')
             return
         
-        # Xóa tất cả dữ liệu liên quan
-        cur.execute('DELETE FROM messages WHERE partner_id = ?', (partner['partner_id'],))
-        cur.execute('DELETE FROM projects WHERE partner_id = ?', (partner['partner_id'],))
-        cur.execute('DELETE FROM partner_discord_users WHERE partner_id = ?', (partner['partner_id'],))
-        cur.execute('DELETE FROM partners WHERE partner_id = ?', (partner['partner_id'],))
-        
-        conn.commit()
-        conn.close()
+        await refresh_partners([partner_id])
         
         log_action("DELETE_PARTNER", f"User {message.author} deleted partner: {partner_name}")
         await message.channel.send(f'✅ Partner **{partner_name}** and all related data deleted')
         
     except Exception as e:
+        command_failed()
         log_action("ERROR", f"Delete partner error: {e}")
         await message.channel.send(f'❌ An error occurred: {e}') 
 
+def _replace_discord_user(conn, partner_id, old_discord_user, new_discord_user):
+    """Thay Discord user cũ bằng user mới, trả về danh sách users hiện tại"""
+    cur = conn.cursor()
+    
+    # Update Discord users in partner_discord_users table
+    # First, delete the old user
+    cur.execute('''
+        DELETE FROM partner_discord_users 
+        WHERE partner_id = ? AND discord_username = ?
+    ''', (partner_id, old_discord_user))
+    
+    # Then, add the new user
+    cur.execute('''
+        INSERT INTO partner_discord_users (partner_id, discord_username, tag_type)
+        VALUES (?, ?, ?)
+    ''', (partner_id, new_discord_user, 'user_mention'))
+    
+    # Get updated Discord users for display
+    cur.execute('''
+        SELECT discord_username FROM partner_discord_users 
+        WHERE partner_id = ?
+    ''', (partner_id,))
+    return cur.fetchall()
+
 # Hàm xử lý lệnh !update_discord_user
 async def handle_update_discord_user(message):
     """Handle !update_discord_user command (English)"""
@@ -458,8 +370,8 @@ async def handle_update_discord_user(message):
         # Use shlex.split to correctly handle quoted arguments
         args = shlex.split(content)
         
-        log_action("DEBUG", f"Update Discord user command: {content}")
-        log_action("DEBUG", f"Parsed args: {args}")
+        log_debug("Update Discord user command: %s", content)
+        log_debug("Parsed args: %s", args)
         
         if len(args) < 5 or args[1] != '-p':
             await message.channel.send('❌ Invalid syntax! Use: `!update_discord_user -p <partner_name> <@old_user> <@new_user>`')
@@ -470,7 +382,7 @@ async def handle_update_discord_user(message):
         old_discord_user = args[3]
         new_discord_user = args[4]
         
-        log_action("DEBUG", f"Looking for partner: '{partner_name}'")
+        log_debug("Looking for partner: '%s'", partner_name)
         
         # Validate Discord user format
         if not (old_discord_user.startswith('<@') and old_discord_user.endswith('>')):
@@ -481,63 +393,30 @@ async def handle_update_discord_user(message):
             await message.channel.send('❌ Invalid new Discord user format! Use: @username or <@user_id>')
             return
         
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Debug: Kiểm tra tất cả partners
-        cur.execute('SELECT partner_id, partner_name FROM partners')
-        all_partners = cur.fetchall()
-        log_action("DEBUG", f"All partners in DB: {all_partners}")
-        
         # Find partner
-        partner = find_partner_by_name_or_username(conn, partner_name)
+        partner = await db_read(find_partner_by_name_or_username, partner_name)
         if not partner:
-            conn.close()
             await message.channel.send(f'❌ Partner not found: **{partner_name}**')
             return
         
-        log_action("DEBUG", f"Found partner: {partner['partner_name']} (ID: {partner['partner_id']})")
+        log_debug("Found partner: %s (ID: %s)", partner['partner_name'], partner['partner_id'])
         
         # Get current Discord users
-        current_discord_users = partner.get('discord_username', '')
-        log_action("DEBUG", f"Current Discord users: '{current_discord_users}'")
+        current_discord_users = partner.get('discord_username') or ''
+        log_debug("Current Discord users: '%s'", current_discord_users)
         
         # Check if old user exists in current users
         if old_discord_user not in current_discord_users:
-            conn.close()
             await message.channel.send(f'❌ Discord user **{old_discord_user}** not found for partner **{partner_name}**')
             return
         
         # Replace old user with new user
         updated_discord_users = current_discord_users.replace(old_discord_user, new_discord_user)
-        log_action("DEBUG", f"Updated Discord users: '{updated_discord_users}'")
-        
-        # Update Discord users in partner_discord_users table
-        # First, delete the old user
-        cur.execute('''
-            DELETE FROM partner_discord_users 
-            WHERE partner_id = ? AND discord_username = ?
-        ''', (partner['partner_id'], old_discord_user))
-        
-        # Then, add the new user
-        cur.execute('''
-            INSERT INTO partner_discord_users (partner_id, discord_username, tag_type)
-            VALUES (?, ?, ?)
-        ''', (partner['partner_id'], new_discord_user, 'user_mention'))
-        
-        conn.commit()
-        conn.close()
-        
-        # Get updated Discord users for display
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute('''
-            SELECT discord_username FROM partner_discord_users 
-            WHERE partner_id = ?
-        ''', (partner['partner_id'],))
-        updated_users = cur.fetchall()
+        log_debug("Updated Discord users: '%s'", updated_discord_users)
+        
+        updated_users = await db_write(_replace_discord_user, partner['partner_id'], old_discord_user, new_discord_user)
+        await refresh_partners([partner['partner_id']])
         updated_discord_users_display = ', '.join([u['discord_username'] for u in updated_users]) if updated_users else 'None'
-        conn.close()
         
         # Log action
         log_action("UPDATE_DISCORD_USER", f"User {message.author} updated Discord user for {partner_name}: {old_discord_user} → {new_discord_user}")
@@ -552,5 +431,6 @@ async def handle_update_discord_user(message):
         await message.channel.send(report)
         
     except Exception as e:
+        command_failed()
         log_action("ERROR", f"Update Discord user error: {e}")
         await message.channel.send(f'❌ Error: {e}') 
\ No newline at end of file
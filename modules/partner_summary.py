@@ -0,0 +1,59 @@
+from dataclasses import dataclass, field
+from typing import Any, List
+from modules.queries import PARTNER_IDS_WHERE, PARTNER_SUMMARY_SQL, PARTNER_SUMMARY_USERS_SQL
+
+# Tổng hợp một partner cho !list_partners, !info_partner và Send Report
+@dataclass
+class PartnerSummary:
+    partner_id: int
+    partner_name: str
+    server_id: str
+    timezone: str
+    discord_users: List[str] = field(default_factory=list)  # discord_username theo thứ tự thêm vào
+    projects: List[Any] = field(default_factory=list)       # Row (project_id, project_name, project_code, channel_id) theo tên
+
+    def display_discord_users(self):
+        """'<@123>' -> '@123', 'name' -> '@name'; 'N/A' nếu không có user"""
+        names = [f"@{u[2:-1]}" if u.startswith('<@') and u.endswith('>') else f"@{u.replace('@', '')}"
+                 for u in self.discord_users]
+        return ', '.join(names) if names else "N/A"
+
+    def as_partner_dict(self):
+        """Dạng dict của find_partner_by_name_or_username (discord_username nối bằng ', ')"""
+        return {
+            'partner_id': self.partner_id,
+            'partner_name': self.partner_name,
+            'server_id': self.server_id,
+            'timezone': self.timezone,
+            'discord_username': ', '.join(self.discord_users) or None,
+        }
+
+def load_partner_summaries(conn, partner_ids=None):
+    """Tải PartnerSummary (theo tên partner) bằng hai query gộp, không truy vấn theo từng partner.
+
+    partner_ids=None để lấy tất cả partners.
+    """
+    where = ''
+    params = ()
+    if partner_ids is not None:
+        if not partner_ids:
+            return []
+        params = tuple(partner_ids)
+        where = PARTNER_IDS_WHERE.format(placeholders=','.join('?' * len(params)))
+
+    # Query 1: partners kèm projects, đã sắp xếp sẵn
+    summaries = {}
+    for row in conn.execute(PARTNER_SUMMARY_SQL.format(where=where), params):
+        summary = summaries.get(row['partner_id'])
+        if summary is None:
+            summary = summaries[row['partner_id']] = PartnerSummary(
+                row['partner_id'], row['partner_name'], row['server_id'], row['timezone']
+            )
+        if row['project_id'] is not None:
+            summary.projects.append(row)
+
+    # Query 2: Discord users của các partners đó
+    for row in conn.execute(PARTNER_SUMMARY_USERS_SQL.format(where=where), params):
+        summaries[row['partner_id']].discord_users.append(row['discord_username'])
+
+    return list(summaries.values())
@@ -1,20 +1,53 @@
-from modules.db_utils import get_db_connection, log_action
-from modules.utils import normalize_name, format_time_with_timezones
+from modules.db_utils import db_read, db_write
+from modules.logger import log_action
+from modules.utils import format_time_with_timezones, make_project_code
 from modules.partner import find_partner_by_name_or_username
-import discord
+from modules.paginator import Paginator
+from modules.registry import refresh_partners
+from modules.timezones import format_epoch_ms
+from modules.status import count_by_status, format_status_stats, status_name, status_emoji
+from modules.router import command_failed
+from modules.queries import (
+    ALL_PROJECTS_SQL, PROJECT_WITH_PARTNER_BY_NAME_SQL, DELETE_PROJECT_MESSAGES_SQL, DELETE_PROJECT_SQL, PROJECT_BY_CODE_SQL, PARTNER_PROJECT_LIST_SQL, PROJECT_INFO_IN_PARTNER_SQL, PROJECT_INFO_SQL,
+    PROJECT_STATUS_COUNTS_SQL, PROJECT_RECENT_MESSAGES_SQL
+)
 import shlex
 
 # Hàm tìm project theo partner_id và mã project (6 ký tự đầu, không phân biệt hoa thường)
 def find_project_by_code(conn, partner_id, project_code):
     cur = conn.cursor()
-    cur.execute('''
-        SELECT project_id, project_name, created_at
-        FROM projects
-        WHERE partner_id = ? AND LOWER(SUBSTR(project_name, 1, 6)) = LOWER(?)
-        ORDER BY project_id
-    ''', (partner_id, project_code[:6]))
+    cur.execute(PROJECT_BY_CODE_SQL, (partner_id, make_project_code(project_code)))
     return cur.fetchone()
 
+def _load_all_projects(conn):
+    cur = conn.cursor()
+    cur.execute(ALL_PROJECTS_SQL)
+    return cur.fetchall()
+
+def _load_partner_projects(conn, partner_names):
+    """Trả về (danh sách projects theo partner, các tên partner không tìm thấy)"""
+    cur = conn.cursor()
+    all_projects = []
+    missing_partners = []
+    
+    for partner_name in partner_names:
+        partner = find_partner_by_name_or_username(conn, partner_name)
+        if not partner:
+            missing_partners.append(partner_name)
+            continue
+        
+        cur.execute(PARTNER_PROJECT_LIST_SQL, (partner['partner_id'],))
+        projects = cur.fetchall()
+        
+        if projects:
+            all_projects.append({
+                'partner_name': partner['partner_name'],
+                'timezone': partner.get('timezone', '+07:00'),
+                'projects': projects
+            })
+    
+    return all_projects, missing_partners
+
 # Hàm xử lý lệnh !list_projects
 async def handle_list_projects(message):
     """Handle !list_projects command (English)"""
@@ -40,116 +73,81 @@ async def handle_list_projects(message):
             else:
                 i += 1
         
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        if show_all:
-            # Hiển thị tất cả projects của tất cả partners
-            cur.execute('''
-                SELECT p.project_name, p.created_at, pt.partner_name, pt.timezone
-                FROM projects p
-                JOIN partners pt ON p.partner_id = pt.partner_id
-                ORDER BY pt.partner_name, p.project_name
-            ''')
-            rows = cur.fetchall()
-            
-            if not rows:
-                conn.close()
-                await message.channel.send('❌ No projects found in the system.')
-                return
-            
-            # Tạo message
-            msg = '**�� All Projects:**\n\n'
-            
-            current_partner = None
-            for row in rows:
-                if current_partner != row['partner_name']:
-                    current_partner = row['partner_name']
-                    msg += f'**👥 {current_partner}:**\n'
-                
-                formatted_time = format_time_with_timezones(row['created_at'], '+07:00', row['timezone'])
-                msg += f'• **{row["project_name"]}** - {formatted_time}\n'
-            
-            conn.close()
-            await message.channel.send(msg)
-            
-        elif partners:
+        if partners:
             # Hiển thị projects của các partners cụ thể
-            all_projects = []
+            all_projects, missing_partners = await db_read(_load_partner_projects, partners)
             
-            for partner_name in partners:
-                partner = find_partner_by_name_or_username(conn, partner_name)
-                if not partner:
-                    await message.channel.send(f'❌ Không tìm thấy partner: **{partner_name}**')
-                    continue
-                
-                cur.execute('''
-                    SELECT project_name, created_at
-                    FROM projects
-                    WHERE partner_id = ?
-                    ORDER BY project_name
-                ''', (partner['partner_id'],))
-                projects = cur.fetchall()
-                
-                if projects:
-                    all_projects.append({
-                        'partner_name': partner['partner_name'],
-                        'timezone': partner.get('timezone', '+07:00'),
-                        'projects': projects
-                    })
-            
-            conn.close()
+            for partner_name in missing_partners:
+                await message.channel.send(f'❌ Không tìm thấy partner: **{partner_name}**')
             
             if not all_projects:
                 await message.channel.send('❌ Không tìm thấy projects cho các partners đã chỉ định.')
                 return
             
-            # Tạo message
-            msg = '**📁 Danh sách Projects:**\n\n'
-            
+            # Gửi dần từng trang, mỗi partner là một khối riêng
+            paginator = Paginator(message.channel, header='**📁 Danh sách Projects:**\n')
             for partner_data in all_projects:
-                msg += f'**👥 {partner_data["partner_name"]}:**\n'
+                await paginator.add_line(f'**👥 {partner_data["partner_name"]}:**')
                 for project in partner_data['projects']:
                     formatted_time = format_time_with_timezones(project['created_at'], '+07:00', partner_data['timezone'])
-                    msg += f'• **{project["project_name"]}** - {formatted_time}\n'
-                msg += '\n'
-            
-            await message.channel.send(msg)
+                    await paginator.add_line(f'• **{project["project_name"]}** - {formatted_time}')
+                await paginator.add_line('')
+            await paginator.flush()
             
         else:
-            # Hiển thị tất cả projects (mặc định)
-            cur.execute('''
-                SELECT p.project_name, p.created_at, pt.partner_name, pt.timezone
-                FROM projects p
-                JOIN partners pt ON p.partner_id = pt.partner_id
-                ORDER BY pt.partner_name, p.project_name
-            ''')
-            rows = cur.fetchall()
+            # Hiển thị tất cả projects (mặc định hoặc -all)
+            rows = await db_read(_load_all_projects)
             
             if not rows:
-                conn.close()
                 await message.channel.send('❌ No projects found in the system.')
                 return
             
-            # Tạo message
-            msg = '**📁 All Projects:**\n\n'
-            
+            paginator = Paginator(message.channel, header='**📁 All Projects:**\n')
             current_partner = None
             for row in rows:
                 if current_partner != row['partner_name']:
                     current_partner = row['partner_name']
-                    msg += f'**👥 {current_partner}:**\n'
+                    await paginator.add_line(f'**👥 {current_partner}:**')
                 
                 formatted_time = format_time_with_timezones(row['created_at'], '+07:00', row['timezone'])
-                msg += f'• **{row["project_name"]}** - {formatted_time}\n'
-            
-            conn.close()
-            await message.channel.send(msg)
+                await paginator.add_line(f'• **{row["project_name"]}** - {formatted_time}')
+            await paginator.flush()
         
     except Exception as e:
+        command_failed()
         log_action("ERROR", f"List projects error: {e}")
         await message.channel.send(f'❌ Error: {e}')
 
+def _load_project_info(conn, partner_name, project_code):
+    """Trả về (projects, stats, recent_messages), hoặc None nếu không tìm thấy partner.
+
+    stats và recent_messages chỉ được lấy khi khớp đúng một project.
+    """
+    cur = conn.cursor()
+    if partner_name:
+        # Tìm partner
+        partner = find_partner_by_name_or_username(conn, partner_name)
+        if not partner:
+            return None
+        # Tìm project theo partner
+        cur.execute(PROJECT_INFO_IN_PARTNER_SQL, (partner['partner_id'], make_project_code(project_code)))
+        projects = cur.fetchall()
+    else:
+        # Tìm toàn bộ
+        cur.execute(PROJECT_INFO_SQL, (make_project_code(project_code),))
+        projects = cur.fetchall()
+    if len(projects) != 1:
+        return projects, None, []
+    project = projects[0]
+    # Lấy thống kê messages cho project này
+    cur.execute(PROJECT_STATUS_COUNTS_SQL, (project['project_id'],))
+    stats = count_by_status(cur.fetchall())
+    
+    # Lấy tin nhắn gần đây
+    cur.execute(PROJECT_RECENT_MESSAGES_SQL, (project['project_id'],))
+    recent_messages = cur.fetchall()
+    return projects, stats, recent_messages
+
 # Hàm xử lý lệnh !info_project
 async def handle_info_project(message):
     """Handle !info_project command (English)"""
@@ -174,36 +172,12 @@ async def handle_info_project(message):
         if not project_code:
             await message.channel.send('❌ Sai cú pháp! Dùng: !info_project -p <partner> -c <mã_project> hoặc !info_project <mã_project>')
             return
-        conn = get_db_connection()
-        cur = conn.cursor()
-        if partner_name:
-            # Tìm partner
-            partner = find_partner_by_name_or_username(conn, partner_name)
-            if not partner:
-                conn.close()
-                await message.channel.send(f'❌ Không tìm thấy partner: **{partner_name}**')
-                return
-            # Tìm project theo partner
-            cur.execute('''
-                SELECT p.project_id, p.project_name, p.created_at, pt.partner_name, pt.timezone
-                FROM projects p
-                JOIN partners pt ON p.partner_id = pt.partner_id
-                WHERE p.partner_id = ? AND LOWER(SUBSTR(p.project_name, 1, 6)) = LOWER(?)
-                ORDER BY pt.partner_name, p.project_name
-            ''', (partner['partner_id'], project_code[:6]))
-            projects = cur.fetchall()
-        else:
-            # Tìm toàn bộ
-            cur.execute('''
-                SELECT p.project_id, p.project_name, p.created_at, pt.partner_name, pt.timezone
-                FROM projects p
-                JOIN partners pt ON p.partner_id = pt.partner_id
-                WHERE LOWER(SUBSTR(p.project_name, 1, 6)) = LOWER(?)
-                ORDER BY pt.partner_name, p.project_name
-            ''', (project_code[:6],))
-            projects = cur.fetchall()
+        project_info = await db_read(_load_project_info, partner_name, project_code)
+        if project_info is None:
+            await message.channel.send(f'❌ Không tìm thấy partner: **{partner_name}**')
+            return
+        projects, stats, recent_messages = project_info
         if not projects:
-            conn.close()
             await message.channel.send(f'❌ Không tìm thấy project với mã: {project_code}')
             return
         # Nếu có nhiều projects, hiển thị danh sách
@@ -213,36 +187,10 @@ async def handle_info_project(message):
                 formatted_time = format_time_with_timezones(project['created_at'], '+07:00', project['timezone'])
                 msg += f'• **{project["project_name"]}** ({project["partner_name"]}) - {formatted_time}\n'
             msg += f'\n💡 **Gợi ý:** Sử dụng tên partner cụ thể để xem chi tiết hơn.'
-            conn.close()
             await message.channel.send(msg)
             return
         # Nếu chỉ có 1 project, hiển thị chi tiết
         project = projects[0]
-        # Lấy thống kê messages cho project này
-        cur.execute('''
-            SELECT 
-                COUNT(*) as total_messages,
-                SUM(CASE WHEN status = 'request' THEN 1 ELSE 0 END) as request_count,
-                SUM(CASE WHEN status IN ('nhận order', 'order received') THEN 1 ELSE 0 END) as order_count,
-                SUM(CASE WHEN status IN ('gửi lại bản build', 'build sent') THEN 1 ELSE 0 END) as build_count,
-                SUM(CASE WHEN status = 'test pass' THEN 1 ELSE 0 END) as test_count,
-                SUM(CASE WHEN status = 'release app' THEN 1 ELSE 0 END) as release_count
-            FROM messages
-            WHERE project_id = ?
-        ''', (project['project_id'],))
-        stats = cur.fetchone()
-        
-        # Lấy tin nhắn gần đây
-        cur.execute('''
-            SELECT content, status, timestamp, reply_timestamp
-            FROM messages
-            WHERE project_id = ?
-            ORDER BY timestamp DESC
-            LIMIT 5
-        ''', (project['project_id'],))
-        recent_messages = cur.fetchall()
-        
-        conn.close()
         
         # Tạo message
         msg = f'**📊 Project Information: {project["project_name"]}**\n\n'
@@ -252,50 +200,38 @@ async def handle_info_project(message):
         msg += f'• **Created:** {format_time_with_timezones(project["created_at"], "+07:00", project["timezone"])}\n\n'
         
         # Thống kê messages
-        if stats and stats['total_messages'] > 0:
-            total = stats['total_messages']
-            msg += f'**📈 Message Statistics:**\n'
-            msg += f'• **Total:** {total}\n'
-            msg += f'• **Request:** {stats["request_count"]} ({stats["request_count"]/total*100:.1f}%)\n'
-            msg += f'• **Order Received:** {stats["order_count"]} ({stats["order_count"]/total*100:.1f}%)\n'
-            msg += f'• **Build Sent:** {stats["build_count"]} ({stats["build_count"]/total*100:.1f}%)\n'
-            msg += f'• **Test Pass:** {stats["test_count"]} ({stats["test_count"]/total*100:.1f}%)\n'
-            msg += f'• **Release App:** {stats["release_count"]} ({stats["release_count"]/total*100:.1f}%)\n\n'
+        msg += format_status_stats(stats)
         
         # Tin nhắn gần đây
         if recent_messages:
             msg += f'**💬 Recent messages:**\n'
-            status_emoji = {
-                'request': '📝',
-                'order received': '📥',
-                'build sent': '📦',
-                'test pass': '✅',
-                'release app': '🚀',
-                'nhận order': '📥',
-                'gửi lại bản build': '📦'
-            }
             for msg_data in recent_messages:
-                status = msg_data['status']
-                timestamp = msg_data['timestamp']
-                reply_timestamp = msg_data['reply_timestamp']
-                emoji = status_emoji.get(status, '💬')
-                # Thời gian cập nhật trạng thái (reply_timestamp nếu có, nếu không thì timestamp)
-                update_time = reply_timestamp if reply_timestamp else timestamp
-                # Định dạng ngắn cho update_time
-                update_time_str = ''
-                if update_time:
-                    try:
-                        update_time_str = str(update_time)[:19].replace('T', ' ')
-                    except:
-                        update_time_str = str(update_time)
+                status = status_name(msg_data['status_code'])
+                timestamp = msg_data['timestamp_ms']
+                reply_timestamp = msg_data['reply_timestamp_ms']
+                emoji = status_emoji(msg_data['status_code'])
+                # Thời gian cập nhật trạng thái (reply nếu có, nếu không thì lúc gửi), giờ +07:00
+                update_time = reply_timestamp if reply_timestamp is not None else timestamp
+                update_time_str = format_epoch_ms(update_time)
                 formatted_time = format_time_with_timezones(timestamp, '+07:00', project['timezone'])
                 content = msg_data['content']
                 msg += f'{emoji} {status} ({update_time_str})\n{content}\n{formatted_time}\n'
         await message.channel.send(msg)
     except Exception as e:
+        command_failed()
         log_action("ERROR", f"Info project error: {e}")
         await message.channel.send(f'❌ Error: {e}')
 
+def _delete_project(conn, project_name):
+    cur = conn.cursor()
+    cur.execute(PROJECT_WITH_PARTNER_BY_NAME_SQL, (project_name,))
+    project = cur.fetchone()
+    if not project:
+        return None
+    cur.execute(DELETE_PROJECT_MESSAGES_SQL, (project['project_id'],))
+    cur.execute(DELETE_PROJECT_SQL, (project['project_id'],))
+    return project
+
 # Hàm xử lý lệnh !delete_project
 async def handle_delete_project(message):
     """Handle !delete_project command (English)"""
@@ -305,25 +241,14 @@ async def handle_delete_project(message):
             await message.channel.send('❌ Invalid syntax! Use: !delete_project <project_name>')
             return
         project_name = args[1].strip()
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute('''
-            SELECT p.project_id, p.project_name, pt.partner_name
-            FROM projects p
-            JOIN partners pt ON p.partner_id = pt.partner_id
-            WHERE p.project_name = ?
-        ''', (project_name,))
-        project = cur.fetchone()
+        project = await db_write(_delete_project, project_name)
         if not project:
-            conn.close()
             await message.channel.send(f'❌ Project not found: **{project_name}**')
             return
-        cur.execute('DELETE FROM messages WHERE project_id = ?', (project['project_id'],))
-        cur.execute('DELETE FROM projects WHERE project_id = ?', (project['project_id'],))
-        conn.commit()
-        conn.close()
+        await refresh_partners([project['partner_id']])
         log_action("DELETE_PROJECT", f"User {message.author} deleted project: {project_name} from {project['partner_name']}")
         await message.channel.send(f'✅ Project **{project_name}** deleted from partner **{project["partner_name"]}**')
     except Exception as e:
+        command_failed()
         log_action("ERROR", f"Delete project error: {e}")
         await message.channel.send(f'❌ Error: {e}') 
\ No newline at end of file
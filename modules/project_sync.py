@@ -0,0 +1,183 @@
+import asyncio
+from modules.constants import PROJECT_RECONCILE_INTERVAL
+from modules.db_utils import db_read, db_write
+from modules.logger import log_action, log_debug
+from modules.utils import make_project_code
+from modules.registry import ensure_registry, get_partner, partner_ids_for_server, refresh_partners, reload_registry
+from modules.queries import (
+    SERVER_PARTNERS_SQL, PARTNER_CHANNEL_PROJECTS_SQL, RENAME_CHANNEL_PROJECT_SQL,
+    INSERT_CHANNEL_PROJECT_SQL, DELETE_CHANNEL_PROJECT_SQL
+)
+
+# Đồng bộ projects với channels của server partner:
+# - sự kiện tạo/sửa/xóa channel -> thay đổi đúng một project cho mỗi partner của server
+# - reconcile định kỳ -> diff toàn bộ và ghi theo lô (bắt các thay đổi lúc bot offline)
+
+def is_project_channel(channel):
+    """Text channel mà bot xem và gửi tin được thì được coi là project"""
+    try:
+        if str(channel.type) != 'text':
+            return False
+        permissions = channel.permissions_for(channel.guild.me)
+        return permissions.view_channel and permissions.send_messages
+    except Exception:
+        return False
+
+def project_channels(guild):
+    """Trả về dict channel_id (str) -> tên cho các project channel của guild"""
+    return {str(channel.id): channel.name for channel in guild.channels if is_project_channel(channel)}
+
+def _partners_for_guild(conn, guild_id):
+    return conn.execute(SERVER_PARTNERS_SQL, (str(guild_id),)).fetchall()
+
+def _upsert_channel_project(conn, guild_id, channel_id, channel_name):
+    """Đổi tên project của channel (nếu có) và thêm project cho partner nào của server chưa có"""
+    partners = _partners_for_guild(conn, guild_id)
+    if not partners:
+        return 0
+    project_code = make_project_code(channel_name)
+    cur = conn.execute(RENAME_CHANNEL_PROJECT_SQL, (channel_name, project_code, channel_id))
+    changes = cur.rowcount
+    before = conn.total_changes
+    conn.executemany(INSERT_CHANNEL_PROJECT_SQL, [(p['partner_id'], channel_name, project_code, channel_id, p['partner_id'], channel_id) for p in partners])
+    return changes + conn.total_changes - before
+
+def _delete_channel_project(conn, channel_id):
+    return conn.execute(DELETE_CHANNEL_PROJECT_SQL, (channel_id,)).rowcount
+
+def _has_channel_project(partner_ids, channel_id):
+    """Channel đang là project của một trong các partner (tra trong registry)"""
+    channel_id = str(channel_id)
+    for partner_id in partner_ids:
+        summary = get_partner(None, partner_id)
+        if summary and any(str(project['channel_id']) == channel_id for project in summary.projects):
+            return True
+    return False
+
+async def _event_partner_ids(channel):
+    """Các partner của server chứa channel; rỗng nếu sự kiện không thể ảnh hưởng project nào"""
+    await ensure_registry()
+    return partner_ids_for_server(channel.guild.id)
+
+async def project_channel_changed(channel):
+    """Gọi từ on_guild_channel_create/update: cập nhật project của channel"""
+    try:
+        # Lọc trên event loop trước khi ghi: server không có partner, hoặc channel không phải
+        # project và cũng chưa từng là project (voice, category...) thì không cần ghi DB
+        partner_ids = await _event_partner_ids(channel)
+        if not partner_ids:
+            return
+        if is_project_channel(channel):
+            changes = await db_write(_upsert_channel_project, channel.guild.id, str(channel.id), channel.name)
+        elif _has_channel_project(partner_ids, channel.id):
+            # Không còn là text channel hoặc bot mất quyền
+            changes = await db_write(_delete_channel_project, str(channel.id))
+        else:
+            return
+        if changes:
+            await refresh_partners(partner_ids)
+            log_action("PROJECT_SYNC", f"Channel {channel.name} ({channel.id}) synced: {changes} project row(s) changed")
+    except Exception as e:
+        log_action("ERROR", f"Project sync failed for channel {channel.id}: {e}")
+
+async def project_channel_updated(before, after):
+    """Gọi từ on_guild_channel_update: chỉ ghi DB khi tên hoặc quyền truy cập thay đổi"""
+    if before.name != after.name or is_project_channel(before) != is_project_channel(after):
+        await project_channel_changed(after)
+
+async def project_channel_deleted(channel):
+    """Gọi từ on_guild_channel_delete: xóa project của channel"""
+    try:
+        partner_ids = await _event_partner_ids(channel)
+        if not _has_channel_project(partner_ids, channel.id):
+            return
+        removed = await db_write(_delete_channel_project, str(channel.id))
+        if removed:
+            await refresh_partners(partner_ids)
+            log_action("PROJECT_SYNC", f"Channel {channel.name} ({channel.id}) deleted: {removed} project(s) removed")
+    except Exception as e:
+        log_action("ERROR", f"Project sync failed for deleted channel {channel.id}: {e}")
+
+def sync_partner_projects(conn, partner, channels_map):
+    """Đồng bộ projects của partner với channels_map (channel_id -> tên) bằng các lệnh ghi theo lô.
+
+    Trả về (added, updated, removed, conflicts) là list tên để báo cáo; conflicts là các
+    channel không thêm/đổi tên được vì partner đã có project trùng tên.
+    """
+    partner_id = partner['partner_id']
+    db_projects = conn.execute(PARTNER_CHANNEL_PROJECTS_SQL, (partner_id,)).fetchall()
+    remaining = {str(p['channel_id']): p for p in db_projects}
+
+    inserts, renames = [], []
+    for channel_id, channel_name in channels_map.items():
+        db_project = remaining.pop(channel_id, None)
+        if db_project is None:
+            inserts.append((partner_id, channel_name, make_project_code(channel_name), channel_id))
+        elif db_project['project_name'] != channel_name:
+            renames.append((channel_name, make_project_code(channel_name), db_project['project_id'], db_project['project_name'], channel_id))
+    removed = [p['project_name'] for p in remaining.values()]
+
+    # Xóa trước để tên của channel đã mất có thể được channel khác dùng lại
+    conn.executemany('DELETE FROM projects WHERE project_id = ?', [(p['project_id'],) for p in remaining.values()])
+    renamed = conn.executemany('UPDATE OR IGNORE projects SET project_name = ?, project_code = ? WHERE project_id = ?',
+                               [rename[:3] for rename in renames]).rowcount
+    inserted = conn.executemany('''
+        INSERT INTO projects (partner_id, project_name, project_code, channel_id)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (project_name, partner_id) DO NOTHING
+    ''', inserts).rowcount
+
+    added = [name for _, name, _, _ in inserts]
+    updated = [f"{old_name} → {name}" for name, _, _, old_name, _ in renames]
+    conflicts = []
+    if inserted < len(inserts) or renamed < len(renames):
+        # Có dòng bị bỏ qua: đọc lại để biết chính xác channel nào bị trùng tên
+        current = {str(row['channel_id']): row['project_name'] for row in conn.execute(
+            'SELECT project_name, channel_id FROM projects WHERE partner_id = ?', (partner_id,))}
+        added = [name for _, name, _, channel_id in inserts if current.get(channel_id) == name]
+        updated = [f"{old_name} → {name}" for name, _, _, old_name, channel_id in renames if current.get(channel_id) == name]
+        conflicts = ([name for _, name, _, channel_id in inserts if current.get(channel_id) != name] +
+                     [name for name, _, _, _, channel_id in renames if current.get(channel_id) != name])
+        log_action("WARNING", f"Project sync for partner {partner_id}: {len(conflicts)} channel(s) skipped, name already used: {', '.join(conflicts)}")
+    return added, updated, removed, conflicts
+
+def _load_partner_servers(conn):
+    return conn.execute('SELECT partner_id, partner_name, server_id FROM partners ORDER BY partner_id').fetchall()
+
+def _reconcile_partners(conn, partner_channels):
+    """partner_channels: list (partner, channels_map); trả về tổng (added, updated, removed, conflicts)"""
+    totals = [0, 0, 0, 0]
+    for partner, channels_map in partner_channels:
+        for i, names in enumerate(sync_partner_projects(conn, partner, channels_map)):
+            totals[i] += len(names)
+    return tuple(totals)
+
+async def reconcile_projects(client):
+    """Diff toàn bộ projects của mọi partner với channels hiện tại của server tương ứng"""
+    partner_channels = []
+    for partner in await db_read(_load_partner_servers):
+        try:
+            guild = client.get_guild(int(partner['server_id']))
+        except (TypeError, ValueError):
+            continue
+        # Server không truy cập được thì bỏ qua, không xóa projects
+        if guild is None or getattr(guild, 'unavailable', False):
+            continue
+        partner_channels.append((partner, project_channels(guild)))
+
+    added, updated, removed, conflicts = await db_write(_reconcile_partners, partner_channels)
+    if added or updated or removed:
+        await reload_registry()
+    log_action("PROJECT_SYNC", f"Reconciled {len(partner_channels)} partner(s): {added} added, {updated} renamed, "
+                               f"{removed} removed, {conflicts} conflict(s)")
+    return added, updated, removed, conflicts
+
+async def run_project_reconciler(client, interval=PROJECT_RECONCILE_INTERVAL):
+    """Reconcile ngay khi khởi động rồi lặp lại theo chu kỳ"""
+    while True:
+        try:
+            await reconcile_projects(client)
+        except Exception as e:
+            log_action("ERROR", f"Project reconciliation failed: {e}")
+        log_debug("Next project reconciliation in %s seconds", interval)
+        await asyncio.sleep(interval)
@@ -0,0 +1,319 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+# Các query chạy thường xuyên của handlers. Handlers dùng trực tiếp các hằng/hàm ở đây và
+# check_query_plans.py chạy EXPLAIN QUERY PLAN trên chính chúng, nên query bị sửa mà mất
+# index sẽ bị phát hiện ngay. Query có số placeholder thay đổi được viết dạng template:
+# {placeholders} là danh sách '?' của IN (...), {where}/{condition} là điều kiện lọc.
+
+# --- messages ---
+
+MESSAGES_BY_DISCORD_ID_SQL = '''
+    SELECT m.message_id, m.partner_id, m.project_id, m.status_code, m.timestamp_ms,
+           pt.partner_name, p.project_name, m.content, m.broadcast_id
+    FROM messages m
+    JOIN partners pt ON m.partner_id = pt.partner_id
+    JOIN projects p ON m.project_id = p.project_id
+    WHERE m.discord_message_id = ?
+'''
+
+# {sources}: placeholders của các status được phép chuyển sang status mới (transition_sources)
+MESSAGE_TRANSITION_SQL = '''
+    UPDATE messages
+    SET status = ?, status_code = ?, reply_timestamp = CURRENT_TIMESTAMP, reply_timestamp_ms = ?,
+        reply_content = COALESCE(?, reply_content)
+    WHERE ({condition}) AND status_code IN ({sources})
+'''
+
+# Các condition của MESSAGE_TRANSITION_SQL
+MESSAGE_ID_CONDITION = 'message_id = ?'
+BROADCAST_CONDITION = 'broadcast_id = ?'
+# Message được reply cùng các message anh em (cùng broadcast, cùng partner)
+REPLY_SIBLINGS_CONDITION = 'message_id = ? OR (broadcast_id = ? AND partner_id = ?)'
+# Message mới nhất của mọi project của một partner
+PARTNER_LATEST_MESSAGES_CONDITION = '''
+    message_id IN (
+        SELECT (SELECT m.message_id FROM messages m
+                WHERE m.project_id = p.project_id
+                ORDER BY m.timestamp_ms DESC, m.message_id DESC
+                LIMIT 1)
+        FROM projects p
+        WHERE p.partner_id = ?
+    )
+'''
+
+BROADCAST_COUNT_SQL = 'SELECT COUNT(*) FROM messages WHERE broadcast_id = ?'
+
+LATEST_MESSAGE_STATUS_SQL = '''
+    UPDATE messages
+    SET status = ?, status_code = ?, reply_timestamp = CURRENT_TIMESTAMP, reply_timestamp_ms = ?
+    WHERE message_id = (
+        SELECT message_id FROM messages
+        WHERE project_id = ?
+        ORDER BY timestamp_ms DESC, message_id DESC
+        LIMIT 1
+    )
+'''
+
+# --- projects ---
+
+ALL_PROJECTS_SQL = '''
+    SELECT p.project_name, p.created_at, pt.partner_name, pt.timezone
+    FROM projects p
+    JOIN partners pt ON p.partner_id = pt.partner_id
+    ORDER BY pt.partner_name, p.project_name
+'''
+
+PROJECT_BY_NAME_SQL = '''
+    SELECT project_id, project_name
+    FROM projects
+    WHERE partner_id = ? AND project_name = ?
+'''
+
+PROJECT_BY_CODE_SQL = '''
+    SELECT project_id, project_name, created_at
+    FROM projects
+    WHERE partner_id = ? AND project_code = ?
+    ORDER BY project_id
+'''
+
+PARTNER_PROJECT_LIST_SQL = '''
+    SELECT project_name, created_at
+    FROM projects
+    WHERE partner_id = ?
+    ORDER BY project_name
+'''
+
+PROJECT_INFO_IN_PARTNER_SQL = '''
+    SELECT p.project_id, p.project_name, p.created_at, pt.partner_name, pt.timezone
+    FROM projects p
+    JOIN partners pt ON p.partner_id = pt.partner_id
+    WHERE p.partner_id = ? AND p.project_code = ?
+    ORDER BY pt.partner_name, p.project_name
+'''
+
+PROJECT_INFO_SQL = '''
+    SELECT p.project_id, p.project_name, p.created_at, pt.partner_name, pt.timezone
+    FROM projects p
+    JOIN partners pt ON p.partner_id = pt.partner_id
+    WHERE p.project_code = ?
+    ORDER BY pt.partner_name, p.project_name
+'''
+
+PROJECT_STATUS_COUNTS_SQL = '''
+    SELECT status_code, COUNT(*)
+    FROM messages
+    WHERE project_id = ?
+    GROUP BY status_code
+'''
+
+PROJECT_RECENT_MESSAGES_SQL = '''
+    SELECT content, status_code, timestamp_ms, reply_timestamp_ms
+    FROM messages
+    WHERE project_id = ?
+    ORDER BY timestamp_ms DESC, message_id DESC
+    LIMIT 5
+'''
+
+# !delete_project: project theo tên ở mọi partner
+PROJECT_WITH_PARTNER_BY_NAME_SQL = '''
+    SELECT p.project_id, p.project_name, p.partner_id, pt.partner_name
+    FROM projects p
+    JOIN partners pt ON p.partner_id = pt.partner_id
+    WHERE p.project_name = ?
+'''
+
+DELETE_PROJECT_MESSAGES_SQL = 'DELETE FROM messages WHERE project_id = ?'
+
+DELETE_PROJECT_SQL = 'DELETE FROM projects WHERE project_id = ?'
+
+# --- đồng bộ projects với channels ---
+
+SERVER_PARTNERS_SQL = 'SELECT partner_id, partner_name FROM partners WHERE server_id = ?'
+
+PARTNER_CHANNEL_PROJECTS_SQL = 'SELECT project_id, project_name, channel_id FROM projects WHERE partner_id = ?'
+
+RENAME_CHANNEL_PROJECT_SQL = 'UPDATE OR IGNORE projects SET project_name = ?, project_code = ? WHERE channel_id = ?'
+
+INSERT_CHANNEL_PROJECT_SQL = '''
+    INSERT INTO projects (partner_id, project_name, project_code, channel_id)
+    SELECT ?, ?, ?, ?
+    WHERE NOT EXISTS (SELECT 1 FROM projects WHERE partner_id = ? AND channel_id = ?)
+    ON CONFLICT (project_name, partner_id) DO NOTHING
+'''
+
+DELETE_CHANNEL_PROJECT_SQL = 'DELETE FROM projects WHERE channel_id = ?'
+
+# --- partners ---
+
+PARTNER_IN_SERVER_SQL = 'SELECT partner_id FROM partners WHERE partner_name = ? AND server_id = ?'
+
+PARTNER_STATUS_COUNTS_SQL = '''
+    SELECT status_code, COUNT(*)
+    FROM messages
+    WHERE partner_id = ?
+    GROUP BY status_code
+'''
+
+PARTNER_RECENT_MESSAGES_SQL = '''
+    SELECT content, status_code, timestamp_ms, reply_timestamp_ms
+    FROM messages
+    WHERE partner_id = ?
+    ORDER BY timestamp_ms DESC, message_id DESC
+    LIMIT 5
+'''
+
+# !delete_partner: tin chưa gửi và lịch hẹn còn pending bị hủy, dữ liệu còn lại bị xóa
+FAIL_PARTNER_OUTBOX_ITEMS_SQL = '''
+    UPDATE outbox_items SET status = 'failed', error = 'Partner deleted', updated_at_ms = ?
+    WHERE partner_id = ? AND status = 'pending'
+'''
+
+CANCEL_PARTNER_SCHEDULES_SQL = "UPDATE schedules SET status = 'cancelled' WHERE partner_id = ? AND status = 'pending'"
+
+DELETE_PARTNER_MESSAGES_SQL = 'DELETE FROM messages WHERE partner_id = ?'
+
+DELETE_PARTNER_PROJECTS_SQL = 'DELETE FROM projects WHERE partner_id = ?'
+
+DELETE_PARTNER_USERS_SQL = 'DELETE FROM partner_discord_users WHERE partner_id = ?'
+
+DELETE_PARTNER_SQL = 'DELETE FROM partners WHERE partner_id = ?'
+
+# {where}: rỗng (mọi partner) hoặc PARTNER_IDS_WHERE
+PARTNER_IDS_WHERE = 'WHERE pt.partner_id IN ({placeholders})'
+
+PARTNER_SUMMARY_SQL = '''
+    SELECT pt.partner_id, pt.partner_name, pt.server_id, pt.timezone,
+           p.project_id, p.project_name, p.project_code, p.channel_id
+    FROM partners pt
+    LEFT JOIN projects p ON p.partner_id = pt.partner_id
+    {where}
+    ORDER BY pt.partner_name, pt.partner_id, p.project_name
+'''
+
+PARTNER_SUMMARY_USERS_SQL = '''
+    SELECT pdu.partner_id, pdu.discord_username
+    FROM partner_discord_users pdu
+    JOIN partners pt ON pt.partner_id = pdu.partner_id
+    {where}
+    ORDER BY pdu.partner_id, pdu.rowid
+'''
+
+# --- outbox ---
+
+OUTBOX_PENDING_ITEMS_SQL = '''
+    SELECT item_id, job_id, partner_id, project_id, channel_id, content
+    FROM outbox_items
+    WHERE job_id = ? AND status = 'pending' AND item_id > ?
+    ORDER BY item_id
+    LIMIT ?
+'''
+
+OUTBOX_MARK_SENDING_SQL = "UPDATE outbox_items SET status = 'sending', updated_at_ms = ? WHERE item_id = ? AND status = 'pending'"
+
+OUTBOX_MARK_SENT_SQL = "UPDATE outbox_items SET status = 'sent', discord_message_id = ?, updated_at_ms = ? WHERE item_id = ?"
+
+INSERT_SENT_MESSAGE_SQL = '''
+    INSERT INTO messages (partner_id, project_id, content, discord_message_id, status, status_code, timestamp_ms, broadcast_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+OUTBOX_MARK_FAILED_SQL = "UPDATE outbox_items SET status = 'failed', error = ?, updated_at_ms = ? WHERE item_id = ?"
+
+OUTBOX_FINISH_JOB_SQL = "UPDATE outbox_jobs SET status = 'done', finished_at_ms = ? WHERE job_id = ?"
+
+# Send Report của một job
+OUTBOX_JOB_ITEMS_SQL = 'SELECT partner_id, project_id, status FROM outbox_items WHERE job_id = ?'
+
+OUTBOX_PENDING_JOBS_SQL = '''
+    SELECT job_id, content, reply_channel_id
+    FROM outbox_jobs
+    WHERE status = 'pending'
+    ORDER BY job_id
+'''
+
+OUTBOX_RECOVER_SENDING_SQL = "UPDATE outbox_items SET status = 'unknown', updated_at_ms = ? WHERE status = 'sending'"
+
+# --- schedules ---
+
+DUE_SCHEDULES_SQL = '''
+    SELECT s.schedule_id, s.content, s.reply_channel_id,
+           pt.partner_id, pt.partner_name, p.project_id, p.project_name, p.channel_id
+    FROM schedules s
+    JOIN partners pt ON s.partner_id = pt.partner_id
+    JOIN projects p ON s.project_id = p.project_id
+    WHERE s.schedule_id IN ({placeholders}) AND s.status = 'pending'
+    ORDER BY s.schedule_id
+'''
+
+PENDING_SCHEDULE_PROJECTS_SQL = "SELECT project_id FROM schedules WHERE schedule_id IN ({placeholders}) AND status = 'pending'"
+
+MARK_SCHEDULES_SENT_SQL = "UPDATE schedules SET status = 'sent' WHERE schedule_id IN ({placeholders}) AND status = 'pending'"
+
+CANCEL_SCHEDULES_SQL = "UPDATE schedules SET status = 'cancelled' WHERE schedule_id IN ({placeholders}) AND status = 'pending'"
+
+PENDING_SCHEDULE_LIST_SQL = '''
+    SELECT s.schedule_id, s.scheduled_for, s.content, pt.partner_name, pt.timezone, p.project_name
+    FROM schedules s
+    JOIN partners pt ON s.partner_id = pt.partner_id
+    JOIN projects p ON s.project_id = p.project_id
+    WHERE s.status = 'pending'
+    ORDER BY s.scheduled_for, s.schedule_id
+    LIMIT ?
+'''
+
+# --- templates ---
+
+TEMPLATE_BY_NAME_SQL = 'SELECT template_content FROM templates WHERE template_name = ?'
+
+# --- history (!list / !history) ---
+
+@dataclass
+class HistoryFilter:
+    partner_ids: List[int] = field(default_factory=list)
+    project_codes: List[str] = field(default_factory=list)  # projects.project_code (qua make_project_code)
+    statuses: List[int] = field(default_factory=list)       # Status code (modules/status.py)
+    since: Optional[int] = None      # timestamp_ms >= since
+    until: Optional[int] = None      # timestamp_ms < until
+    replied: Optional[bool] = None   # True: đã có reply, False: chưa có reply
+
+HISTORY_SQL = '''
+    SELECT m.message_id, m.content, m.status_code, m.timestamp_ms, m.reply_content, m.reply_timestamp_ms,
+           pt.partner_name, pt.timezone, p.project_name
+    FROM messages m
+    JOIN partners pt ON m.partner_id = pt.partner_id
+    JOIN projects p ON m.project_id = p.project_id
+    {where}
+    ORDER BY m.timestamp_ms DESC, m.message_id DESC
+    LIMIT ?
+'''
+
+def history_query(filters, limit, cursor=None):
+    """HistoryFilter + cursor (timestamp_ms, message_id) -> (sql, params) của HISTORY_SQL"""
+    conditions = []
+    params = []
+    if filters.partner_ids:
+        conditions.append(f"m.partner_id IN ({','.join('?' * len(filters.partner_ids))})")
+        params += filters.partner_ids
+    if filters.project_codes:
+        conditions.append(f"p.project_code IN ({','.join('?' * len(filters.project_codes))})")
+        params += filters.project_codes
+    if filters.statuses:
+        conditions.append(f"m.status_code IN ({','.join('?' * len(filters.statuses))})")
+        params += filters.statuses
+    if filters.since:
+        conditions.append('m.timestamp_ms >= ?')
+        params.append(filters.since)
+    if filters.until:
+        conditions.append('m.timestamp_ms < ?')
+        params.append(filters.until)
+    if filters.replied is not None:
+        conditions.append('m.reply_timestamp_ms IS NOT NULL' if filters.replied else 'm.reply_timestamp_ms IS NULL')
+    if cursor:
+        # Viết tách để SQLite dùng được range trên index timestamp_ms
+        timestamp_ms, message_id = cursor
+        conditions.append('m.timestamp_ms <= ? AND (m.timestamp_ms < ? OR m.message_id < ?)')
+        params += [timestamp_ms, timestamp_ms, message_id]
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    return HISTORY_SQL.format(where=where), params + [limit]
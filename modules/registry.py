@@ -0,0 +1,126 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from modules.db_utils import db_read
+from modules.logger import log_action, log_debug
+from modules.partner_summary import PartnerSummary, load_partner_summaries
+from modules.utils import format_tag_line
+
+# Registry trong bộ nhớ của partners, Discord users và projects để tra cứu không cần query.
+# Nạp một lần lúc khởi động; sau mỗi lệnh ghi, các partner bị ảnh hưởng được đọc lại và
+# thay vào registry. Mỗi lần cập nhật tạo snapshot mới rồi thay cả snapshot, nên các
+# thread đọc DB (db_read) không bao giờ thấy trạng thái cập nhật dở dang.
+
+@dataclass
+class _Snapshot:
+    partners: Dict[int, PartnerSummary] = field(default_factory=dict)
+    by_name: Dict[str, int] = field(default_factory=dict)           # partner_name -> partner_id nhỏ nhất
+    by_username: Dict[str, int] = field(default_factory=dict)       # discord_username -> partner_id nhỏ nhất
+    by_name_lower: Dict[str, int] = field(default_factory=dict)
+    by_username_lower: Dict[str, int] = field(default_factory=dict)
+    tag_lines: Dict[int, str] = field(default_factory=dict)         # partner_id -> "Dear @user," cho !send/!schedule
+
+_snapshot = None
+
+def _build_snapshot(partners):
+    snapshot = _Snapshot(partners=partners)
+    # Duyệt theo partner_id tăng dần, giữ partner đầu tiên như thứ tự rowid của query cũ
+    for partner_id in sorted(partners):
+        partner = partners[partner_id]
+        snapshot.by_name.setdefault(partner.partner_name, partner_id)
+        snapshot.by_name_lower.setdefault(partner.partner_name.lower(), partner_id)
+        # Tag line theo Discord user đầu tiên (thứ tự thêm vào), tên partner nếu không có user
+        snapshot.tag_lines[partner_id] = format_tag_line(
+            partner.partner_name, partner.discord_users[0] if partner.discord_users else None
+        )
+        for username in partner.discord_users:
+            snapshot.by_username.setdefault(username, partner_id)
+            snapshot.by_username_lower.setdefault(username.lower(), partner_id)
+    return snapshot
+
+def load_registry(conn):
+    """Nạp lại toàn bộ registry từ DB, trả về số partners"""
+    global _snapshot
+    _snapshot = _build_snapshot({s.partner_id: s for s in load_partner_summaries(conn)})
+    log_debug("Registry loaded: %s partner(s)", len(_snapshot.partners))
+    return len(_snapshot.partners)
+
+def _get_snapshot(conn):
+    # Nạp lười cho các script/công cụ không gọi load_registry lúc khởi động;
+    # conn=None khi tra cứu trực tiếp trên event loop (sau ensure_registry)
+    if _snapshot is None:
+        if conn is None:
+            raise RuntimeError('Partner registry is not loaded')
+        load_registry(conn)
+    return _snapshot
+
+def _apply_summaries(partner_ids, summaries):
+    global _snapshot
+    if _snapshot is None:
+        # Chưa nạp: lần tra cứu đầu tiên sẽ nạp toàn bộ từ DB
+        return
+    partners = dict(_snapshot.partners)
+    for partner_id in partner_ids:
+        partners.pop(partner_id, None)
+    for summary in summaries:
+        partners[summary.partner_id] = summary
+    _snapshot = _build_snapshot(partners)
+
+async def refresh_partners(partner_ids):
+    """Đọc lại các partners vừa được ghi và thay vào registry (partner đã bị xóa sẽ bị bỏ)"""
+    partner_ids = list(dict.fromkeys(partner_ids))
+    if not partner_ids:
+        return
+    try:
+        summaries = await db_read(load_partner_summaries, partner_ids)
+        _apply_summaries(partner_ids, summaries)
+    except Exception as e:
+        # Không để registry cũ tiếp tục phục vụ: lần tra cứu sau sẽ nạp lại toàn bộ
+        invalidate_registry()
+        log_action("ERROR", f"Registry refresh failed for partners {partner_ids}: {e}")
+
+async def reload_registry():
+    """Nạp lại toàn bộ registry (sau reconcile hoặc thay đổi hàng loạt)"""
+    return await db_read(load_registry)
+
+async def ensure_registry():
+    """Nạp registry nếu chưa có (hoặc vừa bị invalidate) để tra cứu với conn=None không cần thread DB"""
+    if _snapshot is None:
+        await reload_registry()
+
+def invalidate_registry():
+    global _snapshot
+    _snapshot = None
+
+def find_partner(conn, identifier, ignore_case=False) -> Optional[PartnerSummary]:
+    """Tìm partner theo tên, sau đó theo Discord username"""
+    snapshot = _get_snapshot(conn)
+    if ignore_case:
+        key = identifier.lower()
+        partner_id = snapshot.by_name_lower.get(key, snapshot.by_username_lower.get(key))
+    else:
+        partner_id = snapshot.by_name.get(identifier, snapshot.by_username.get(identifier))
+    return snapshot.partners.get(partner_id) if partner_id is not None else None
+
+def find_partner_by_name(conn, partner_name) -> Optional[PartnerSummary]:
+    """Tìm partner theo đúng tên (không xét Discord username)"""
+    snapshot = _get_snapshot(conn)
+    partner_id = snapshot.by_name.get(partner_name)
+    return snapshot.partners.get(partner_id) if partner_id is not None else None
+
+def get_partner(conn, partner_id) -> Optional[PartnerSummary]:
+    return _get_snapshot(conn).partners.get(partner_id)
+
+def all_partners(conn) -> List[PartnerSummary]:
+    """Tất cả partners theo tên (cùng thứ tự với !list_partners)"""
+    return sorted(_get_snapshot(conn).partners.values(), key=lambda p: (p.partner_name, p.partner_id))
+
+def tag_line_for(partner_id):
+    """Tag line của partner khi gửi tin (tra trực tiếp trên event loop, gọi sau ensure_registry)"""
+    return _get_snapshot(None).tag_lines.get(partner_id, 'Dear @everyone,')
+
+def partner_ids_for_server(server_id):
+    """Các partner_id của một server; rỗng nếu registry chưa được nạp"""
+    if _snapshot is None:
+        return []
+    server_id = str(server_id)
+    return [p.partner_id for p in _snapshot.partners.values() if p.server_id == server_id]
@@ -0,0 +1,74 @@
+import time
+from contextvars import ContextVar
+from modules.constants import COMMAND_PREFIX
+
+# Bảng lệnh: tên lệnh (token đầu tiên, gồm cả prefix) -> handler
+_commands = {}
+
+# handler -> tên chính, để alias được cộng dồn vào cùng một dòng thống kê
+_command_names = {}
+
+# Thống kê theo lệnh (thời gian tính bằng giây)
+_command_stats = {}
+
+# Thống kê của lệnh đang chạy trong task hiện tại (handlers tự bắt lỗi và báo qua command_failed)
+_current_stats = ContextVar('current_command_stats', default=None)
+
+def register_command(name, handler, *aliases):
+    """Đăng ký handler cho một lệnh và các alias của nó"""
+    for command in (name, *aliases):
+        _commands[command] = handler
+    _command_stats.setdefault(name, {'calls': 0, 'errors': 0, 'total': 0.0, 'max': 0.0})
+    _command_names[handler] = name
+
+def parse_command(content):
+    """Trả về tên lệnh nếu tin nhắn là lệnh đã đăng ký, ngược lại None"""
+    if not content.startswith(COMMAND_PREFIX):
+        return None
+    name = content.split(maxsplit=1)[0]
+    return name if name in _commands else None
+
+async def dispatch(message):
+    """Chạy handler của lệnh trong tin nhắn; trả về False nếu không phải lệnh"""
+    command = parse_command(message.content)
+    if command is None:
+        return False
+
+    handler = _commands[command]
+    stats = _command_stats[_command_names[handler]]
+    token = _current_stats.set(stats)
+    start = time.perf_counter()
+    try:
+        await handler(message)
+    except Exception:
+        stats['errors'] += 1
+        raise
+    finally:
+        _current_stats.reset(token)
+        elapsed = time.perf_counter() - start
+        stats['calls'] += 1
+        stats['total'] += elapsed
+        stats['max'] = max(stats['max'], elapsed)
+    return True
+
+def command_failed():
+    """Gọi trong except của handler (lỗi đã được báo cho user) để !stats đếm lỗi của lệnh đang chạy"""
+    stats = _current_stats.get()
+    if stats is not None:
+        stats['errors'] += 1
+
+def get_command_stats(reset=False):
+    """Trả về {lệnh: {calls, errors, avg, max}} cho các lệnh đã được gọi"""
+    result = {
+        name: {
+            'calls': s['calls'],
+            'errors': s['errors'],
+            'avg': s['total'] / s['calls'],
+            'max': s['max'],
+        }
+        for name, s in _command_stats.items() if s['calls']
+    }
+    if reset:
+        for s in _command_stats.values():
+            s.update(calls=0, errors=0, total=0.0, max=0.0)
+    return result
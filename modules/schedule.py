@@ -0,0 +1,228 @@
+from modules.db_utils import db_read, db_write
+from modules.logger import log_action, log_debug
+from modules.constants import SCHEDULE_TIME_FORMAT, SCHEDULE_LIST_LIMIT
+from modules.utils import validate_message_content, parse_timezone_offset
+from modules.message import parse_send_args, resolve_send_partners, send_job_report
+from modules.outbox import insert_job, run_job
+from modules.send_plan import build_send_plan
+from modules.channel_index import resolve_channel
+from modules.scheduler import add_schedules
+from modules.registry import ensure_registry, tag_line_for
+from modules.router import command_failed
+from modules.queries import (
+    DUE_SCHEDULES_SQL, PENDING_SCHEDULE_PROJECTS_SQL, MARK_SCHEDULES_SENT_SQL, CANCEL_SCHEDULES_SQL, PENDING_SCHEDULE_LIST_SQL
+)
+from datetime import datetime, timezone
+import shlex
+
+SCHEDULE_USAGE = ('❌ Invalid syntax! Use: !schedule <YYYY-MM-DD> <HH:MM> -p <partner> [-c <channel>] | <content>\n'
+                  '• `!schedule list` - Pending scheduled messages\n'
+                  '• `!schedule cancel <id> [<id> ...]` - Cancel scheduled messages')
+
+def _chunks(ids, size=500):
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+def _insert_schedules(conn, all_partners_info, local_time, content, reply_channel_id):
+    """Lưu một dòng schedule cho mỗi project, giờ hẹn tính theo timezone của từng partner.
+
+    Trả về (entries, summary, past_partners) với entries là list (schedule_id, due UTC)
+    và summary là list (partner_name, timezone, schedule_ids).
+    """
+    now = datetime.now(timezone.utc)
+    entries = []
+    summary = []
+    past_partners = []
+    seen_project_ids = set()
+
+    for partner, projects_to_send, _ in all_partners_info:
+        # partner là dict từ registry (resolve_send_partners), đã có sẵn timezone
+        partner_timezone = partner['timezone'] or '+07:00'
+        due = local_time.replace(tzinfo=parse_timezone_offset(partner_timezone)).astimezone(timezone.utc)
+        if due <= now:
+            past_partners.append(partner['partner_name'])
+            continue
+
+        schedule_ids = []
+        for project in projects_to_send:
+            if project['project_id'] in seen_project_ids:
+                continue
+            seen_project_ids.add(project['project_id'])
+            cur = conn.execute('''
+                INSERT INTO schedules (partner_id, project_id, content, scheduled_for, reply_channel_id)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (partner['partner_id'], project['project_id'], content, due.isoformat(), reply_channel_id))
+            schedule_ids.append(cur.lastrowid)
+            entries.append((cur.lastrowid, due))
+        if schedule_ids:
+            summary.append((partner['partner_name'], partner_timezone, schedule_ids))
+
+    return entries, summary, past_partners
+
+def _load_due_schedules(conn, schedule_ids):
+    """Các dòng schedule còn pending kèm partner/project"""
+    rows = []
+    for chunk in _chunks(schedule_ids):
+        placeholders = ','.join('?' * len(chunk))
+        rows += conn.execute(DUE_SCHEDULES_SQL.format(placeholders=placeholders), chunk).fetchall()
+    return rows
+
+def _enqueue_scheduled(conn, schedule_ids, content, reply_channel_id, targets, missing):
+    """Chuyển các schedule còn pending sang 'sent' và tạo outbox job trong cùng transaction.
+
+    Schedule bị hủy sau khi được nạp sẽ bị bỏ qua; trả về None nếu không còn gì để gửi.
+    """
+    pending_project_ids = set()
+    for chunk in _chunks(schedule_ids):
+        placeholders = ','.join('?' * len(chunk))
+        pending_project_ids.update(
+            row['project_id'] for row in conn.execute(PENDING_SCHEDULE_PROJECTS_SQL.format(placeholders=placeholders), chunk)
+        )
+        conn.execute(MARK_SCHEDULES_SENT_SQL.format(placeholders=placeholders), chunk)
+
+    targets = [t for t in targets if t.project['project_id'] in pending_project_ids]
+    missing = [(partner, project) for partner, project in missing if project['project_id'] in pending_project_ids]
+    if not targets and not missing:
+        return None
+    return insert_job(conn, content, reply_channel_id, targets, missing)
+
+async def send_scheduled(schedule_ids, client):
+    """Gửi các schedule đến hạn qua outbox như !send, báo cáo về channel đã đặt lịch"""
+    rows = await db_read(_load_due_schedules, schedule_ids)
+    # Tag line lấy từ registry như !send
+    await ensure_registry()
+
+    # Gom theo (nội dung, channel báo cáo): mỗi nhóm là một lần gửi
+    groups = {}
+    for row in rows:
+        group = groups.setdefault((row['content'], row['reply_channel_id']), {'ids': [], 'partners': {}})
+        group['ids'].append(row['schedule_id'])
+        partner = {'partner_id': row['partner_id'], 'partner_name': row['partner_name']}
+        group['partners'].setdefault(row['partner_id'], (partner, []))[1].append(row)
+
+    for (content, reply_channel_id), group in groups.items():
+        partner_entries = [(partner, projects, projects) for partner, projects in group['partners'].values()]
+        targets, missing = build_send_plan(
+            partner_entries,
+            content,
+            lambda channel_id: resolve_channel(channel_id, client),
+            tag_line_for
+        )
+        job_id = await db_write(_enqueue_scheduled, group['ids'], content, reply_channel_id, targets, missing)
+        if job_id is None:
+            continue
+        log_action("SCHEDULE", f"Sending {len(group['ids'])} scheduled item(s) as outbox job {job_id}")
+        await run_job(job_id, content, client)
+        channel = resolve_channel(reply_channel_id, client) if reply_channel_id else None
+        if channel is not None:
+            await send_job_report(job_id, channel, title=f'Scheduled Send Report (job #{job_id})')
+
+def _load_pending_schedule_list(conn, limit):
+    return conn.execute(PENDING_SCHEDULE_LIST_SQL, (limit,)).fetchall()
+
+def _cancel_schedules(conn, schedule_ids):
+    placeholders = ','.join('?' * len(schedule_ids))
+    cur = conn.execute(CANCEL_SCHEDULES_SQL.format(placeholders=placeholders), schedule_ids)
+    return cur.rowcount
+
+async def _handle_schedule_list(message):
+    schedules = await db_read(_load_pending_schedule_list, SCHEDULE_LIST_LIMIT)
+    if not schedules:
+        await message.channel.send('📋 No pending scheduled messages.')
+        return
+
+    response = f'**⏰ Pending Scheduled Messages (next {len(schedules)}):**\n\n'
+    for s in schedules:
+        partner_timezone = s['timezone'] or '+07:00'
+        local_due = datetime.fromisoformat(s['scheduled_for']).astimezone(parse_timezone_offset(partner_timezone))
+        preview = s['content'][:50] + ('...' if len(s['content']) > 50 else '')
+        response += (f"• `#{s['schedule_id']}` {local_due.strftime(SCHEDULE_TIME_FORMAT)} ({partner_timezone}) - "
+                     f"**{s['partner_name']}** / {s['project_name']}: {preview}\n")
+    await message.channel.send(response)
+
+async def _handle_schedule_cancel(message, args):
+    try:
+        schedule_ids = [int(arg.lstrip('#')) for arg in args]
+    except ValueError:
+        await message.channel.send('❌ Schedule IDs must be numbers. Use: !schedule cancel <id> [<id> ...]')
+        return
+    if not schedule_ids:
+        await message.channel.send('❌ Invalid syntax! Use: !schedule cancel <id> [<id> ...]')
+        return
+
+    cancelled = await db_write(_cancel_schedules, schedule_ids)
+    log_action("SCHEDULE", f"User {message.author} cancelled {cancelled} scheduled message(s)")
+    await message.channel.send(f'✅ Cancelled {cancelled} of {len(schedule_ids)} scheduled message(s).')
+
+# Hàm xử lý lệnh !schedule
+async def handle_schedule(message):
+    """Handle !schedule command (English)"""
+    try:
+        content = message.content
+        parts = content.split()
+        if len(parts) >= 2 and parts[1] == 'list':
+            await _handle_schedule_list(message)
+            return
+        if len(parts) >= 2 and parts[1] == 'cancel':
+            await _handle_schedule_cancel(message, parts[2:])
+            return
+
+        if '|' not in content:
+            await message.channel.send(SCHEDULE_USAGE)
+            return
+
+        command_part, message_content = content.split('|', 1)
+        message_content = message_content.strip()
+        is_valid, error_msg = validate_message_content(message_content)
+        if not is_valid:
+            await message.channel.send(f'❌ {error_msg}')
+            return
+
+        args = shlex.split(command_part)
+        if len(args) < 3:
+            await message.channel.send(SCHEDULE_USAGE)
+            return
+        try:
+            local_time = datetime.strptime(f'{args[1]} {args[2]}', SCHEDULE_TIME_FORMAT)
+        except ValueError:
+            await message.channel.send("❌ Invalid time! Use: YYYY-MM-DD HH:MM (in each partner's timezone)")
+            return
+
+        partners_config, error = parse_send_args(args, start=3)
+        if error:
+            await message.channel.send(error)
+            return
+        if not partners_config:
+            await message.channel.send('❌ Invalid syntax! You must specify at least one partner with -p')
+            return
+
+        await ensure_registry()
+        all_partners_info, errors = resolve_send_partners(partners_config)
+        for error in errors:
+            await message.channel.send(error)
+        if not all_partners_info:
+            await message.channel.send('❌ No valid channels found to schedule the message')
+            return
+
+        entries, summary, past_partners = await db_write(
+            _insert_schedules, all_partners_info, local_time, message_content, message.channel.id
+        )
+        add_schedules(entries)
+        log_debug("Scheduled %s item(s) for %s", len(entries), local_time)
+
+        if past_partners:
+            await message.channel.send(f'⚠️ Time already passed in the timezone of: {", ".join(past_partners)}')
+        if not entries:
+            await message.channel.send('❌ Nothing was scheduled')
+            return
+
+        response = f'✅ Scheduled for **{local_time.strftime(SCHEDULE_TIME_FORMAT)}** (partner local time):\n'
+        for partner_name, partner_timezone, schedule_ids in summary:
+            id_range = f'#{schedule_ids[0]}' if len(schedule_ids) == 1 else f'#{schedule_ids[0]}–#{schedule_ids[-1]}'
+            response += f'• **{partner_name}** ({partner_timezone}): {len(schedule_ids)} project(s), IDs {id_range}\n'
+        log_action("SCHEDULE", f"User {message.author} scheduled {len(entries)} message(s) for {local_time}")
+        await message.channel.send(response)
+    except Exception as e:
+        command_failed()
+        log_action("ERROR", f"Schedule error: {e}")
+        await message.channel.send(f'❌ Error: {e}')
@@ -0,0 +1,63 @@
+import asyncio
+import heapq
+import time
+from datetime import datetime
+from modules.db_utils import db_read
+from modules.logger import log_action, log_debug
+
+# Min-heap (thời điểm đến hạn epoch giây, schedule_id) của các schedule pending.
+# Lịch bị hủy không bị xóa khỏi heap: khi đến hạn, lệnh gửi chỉ lấy dòng còn 'pending'.
+_heap = []
+_wakeup = None
+_running = set()
+
+def _load_pending_schedules(conn):
+    return conn.execute("SELECT schedule_id, scheduled_for FROM schedules WHERE status = 'pending'").fetchall()
+
+def add_schedules(entries):
+    """Đưa lịch mới vào heap; entries là list (schedule_id, thời điểm UTC có tzinfo)"""
+    earliest = _heap[0][0] if _heap else None
+    for schedule_id, due in entries:
+        heapq.heappush(_heap, (due.timestamp(), schedule_id))
+    # Chỉ đánh thức scheduler khi lịch sớm nhất thay đổi
+    if _wakeup is not None and _heap and (earliest is None or _heap[0][0] < earliest):
+        _wakeup.set()
+
+def _pop_due(now):
+    due_ids = []
+    while _heap and _heap[0][0] <= now:
+        due_ids.append(heapq.heappop(_heap)[1])
+    return due_ids
+
+async def _fire(on_due, schedule_ids):
+    try:
+        await on_due(schedule_ids)
+    except Exception as e:
+        log_action("ERROR", f"Scheduled send failed for {len(schedule_ids)} item(s): {e}")
+
+async def run_scheduler(on_due):
+    """Nạp schedules pending rồi ngủ đến lịch gần nhất, gọi on_due(schedule_ids) khi đến hạn"""
+    global _wakeup
+    _wakeup = asyncio.Event()
+    rows = await db_read(_load_pending_schedules)
+    for row in rows:
+        _heap.append((datetime.fromisoformat(row['scheduled_for']).timestamp(), row['schedule_id']))
+    heapq.heapify(_heap)
+    log_action("SCHEDULE", f"Scheduler started with {len(_heap)} pending item(s)")
+
+    while True:
+        # Không có lịch thì chờ đến khi có lịch mới, không poll
+        timeout = max(0.0, _heap[0][0] - time.time()) if _heap else None
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+        due_ids = _pop_due(time.time())
+        if due_ids:
+            log_debug("Scheduler: %s item(s) due", len(due_ids))
+            # Chạy gửi ở task riêng để broadcast dài không làm trễ các lịch kế tiếp
+            task = asyncio.create_task(_fire(on_due, due_ids))
+            _running.add(task)
+            task.add_done_callback(_running.discard)
@@ -0,0 +1,54 @@
+from dataclasses import dataclass
+from typing import Any
+from modules.constants import MAX_MESSAGE_LENGTH
+
+# Một đích gửi đã được resolve đầy đủ cho !send
+@dataclass
+class SendTarget:
+    partner: Any        # dict/Row có partner_id, partner_name
+    project: Any        # Row có project_id, project_name, channel_id
+    channel: Any        # discord channel object
+    tag_line: str       # "Dear @user,"
+    content: str        # Tin nhắn hoàn chỉnh sẽ gửi đi
+
+def build_send_plan(partner_entries, message_content, resolve_channel, tag_line_for, render=None):
+    """Chuyển danh sách (partner, projects_to_send, all_partner_projects) thành plan phẳng.
+
+    Nếu có render(partner, project), nội dung của từng đích được render riêng
+    thay cho message_content (dùng cho !send -t).
+
+    Trả về (targets, missing) với missing là list (partner, project) không tìm thấy channel. Tag line được tính một lần cho mỗi partner,
+    project trùng (nhiều -c cùng khớp một project) chỉ được gửi một lần.
+    """
+    targets = []
+    missing = []
+    seen_project_ids = set()
+
+    for partner, projects_to_send, _ in partner_entries:
+        tag_line = None
+        for project in projects_to_send:
+            if project['project_id'] in seen_project_ids:
+                continue
+            seen_project_ids.add(project['project_id'])
+
+            channel = resolve_channel(project['channel_id'])
+            if channel is None:
+                missing.append((partner, project))
+                continue
+
+            if tag_line is None:
+                tag_line = tag_line_for(partner['partner_id'])
+            body = render(partner, project) if render else message_content
+            targets.append(SendTarget(
+                partner=partner,
+                project=project,
+                channel=channel,
+                tag_line=tag_line,
+                content=f"{tag_line}\n\n{body}"
+            ))
+
+    return targets, missing
+
+def oversized_targets(targets):
+    """Các đích có nội dung (kèm tag line) vượt quá giới hạn tin nhắn của Discord"""
+    return [t for t in targets if len(t.content) > MAX_MESSAGE_LENGTH]
@@ -0,0 +1,90 @@
+from dataclasses import dataclass
+from typing import Optional
+
+# Workflow status của messages. Mã số nguyên được lưu ở messages.status_code (cột status
+# dạng chuỗi vẫn được ghi tên chuẩn cho công cụ cũ). Alias và ma trận chuyển trạng thái
+# được tính sẵn một lần khi import, handlers chỉ tra dict/list.
+
+REQUEST, ORDER_RECEIVED, BUILD_SENT, TEST_PASS, RELEASE_APP = range(5)
+
+@dataclass(frozen=True)
+class Status:
+    code: int
+    name: str                  # Tên chuẩn, được ghi vào messages.status
+    label: str                 # Tên hiển thị trong thống kê
+    emoji: str
+    reply_tag: Optional[str]   # Tag partner dùng khi reply (request không có)
+    aliases: tuple = ()        # Tên cũ (tiếng Việt) còn trong DB cũ
+
+STATUSES = [
+    Status(REQUEST, 'request', 'Request', '📝', None),
+    Status(ORDER_RECEIVED, 'order received', 'Order Received', '📥', 'order_received', ('nhận order',)),
+    Status(BUILD_SENT, 'build sent', 'Build Sent', '📦', 'resend_build', ('gửi lại bản build',)),
+    Status(TEST_PASS, 'test pass', 'Test Pass', '✅', 'pass_test'),
+    Status(RELEASE_APP, 'release app', 'Release App', '🚀', 'release_app'),
+]
+
+STATUS_NAMES = [s.name for s in STATUSES]
+
+# Tên chuẩn, tên cũ, reply tag và dạng có gạch dưới ('order_received', 'test_pass') -> code
+_ALIASES = {}
+for _status in STATUSES:
+    for _alias in (_status.name, _status.name.replace(' ', '_'), _status.reply_tag, *_status.aliases):
+        if _alias:
+            _ALIASES[_alias] = _status.code
+
+_REPLY_TAGS = {s.reply_tag: s.code for s in STATUSES if s.reply_tag}
+
+# _TRANSITIONS[from][to]: partner chỉ được đưa status đi tới, không lùi lại
+_TRANSITIONS = [[to_code > from_code for to_code in range(len(STATUSES))] for from_code in range(len(STATUSES))]
+
+# Các status được phép chuyển sang mỗi status (dùng cho điều kiện UPDATE hàng loạt)
+_SOURCES = [
+    tuple(from_code for from_code in range(len(STATUSES)) if _TRANSITIONS[from_code][to_code])
+    for to_code in range(len(STATUSES))
+]
+
+def normalize_status(value):
+    """Tên/alias/reply tag bất kỳ -> status code, None nếu không hợp lệ"""
+    if value is None:
+        return None
+    return _ALIASES.get(value.strip().lower())
+
+def status_for_reply_tag(tag):
+    return _REPLY_TAGS.get(tag.strip().lower())
+
+def status_name(code):
+    return STATUSES[code].name
+
+def status_emoji(code):
+    return STATUSES[code].emoji
+
+def can_transition(from_code, to_code):
+    return _TRANSITIONS[from_code][to_code]
+
+def transition_sources(to_code):
+    """Các status code được phép chuyển sang to_code"""
+    return _SOURCES[to_code]
+
+def next_status(code):
+    """Status kế tiếp trong workflow, None nếu đã hoàn tất"""
+    return STATUSES[code + 1] if code + 1 < len(STATUSES) else None
+
+def count_by_status(rows):
+    """Rows (status_code, count) của GROUP BY status_code -> list số lượng theo code"""
+    counts = [0] * len(STATUSES)
+    for code, count in rows:
+        counts[code] += count
+    return counts
+
+def format_status_stats(counts):
+    """Khối '📈 Message Statistics' cho !info_project / !info_partner, rỗng nếu chưa có message"""
+    total = sum(counts)
+    if not total:
+        return ''
+    msg = '**📈 Message Statistics:**\n'
+    msg += f'• **Total:** {total}\n'
+    for status in STATUSES:
+        count = counts[status.code]
+        msg += f'• **{status.label}:** {count} ({count/total*100:.1f}%)\n'
+    return msg + '\n'
@@ -0,0 +1,149 @@
+from modules.db_utils import db_read, db_write
+from modules.logger import log_action
+from modules.utils import validate_message_content
+from modules.router import command_failed
+from modules.queries import TEMPLATE_BY_NAME_SQL
+from string import Formatter
+
+# Placeholder hợp lệ trong template, giá trị được tính cho từng đích gửi
+TEMPLATE_FIELDS = {
+    'partner': 'partner name',
+    'project': 'project (channel) name',
+    'project_code': 'first 6 characters of the project name',
+    'partner_time': "current time in the partner's timezone",
+    'message': 'text after | in !send -t',
+}
+
+# Cache template đã compile theo tên, xóa khi template được thêm/sửa/xóa. Chỉ được đọc/ghi
+# trên event loop; _template_version tăng mỗi lần xóa cache để kết quả đọc DB trước đó
+# (có thể là nội dung cũ) không được lưu đè lên.
+_compiled_templates = {}
+_template_version = 0
+
+def invalidate_template(template_name=None):
+    """Xóa template đã compile (hoặc toàn bộ nếu template_name=None)"""
+    global _template_version
+    _template_version += 1
+    if template_name is None:
+        _compiled_templates.clear()
+    else:
+        _compiled_templates.pop(template_name, None)
+
+def compile_template(template_content):
+    """Parse template một lần thành list (literal, field hoặc None).
+
+    Raise ValueError nếu có placeholder không hợp lệ.
+    """
+    parts = []
+    for literal, field_name, format_spec, conversion in Formatter().parse(template_content):
+        if field_name is not None:
+            if field_name not in TEMPLATE_FIELDS or format_spec or conversion:
+                raise ValueError(f'Unknown placeholder {{{field_name}}}')
+        parts.append((literal, field_name))
+    return parts
+
+def render_template(parts, values):
+    """Render template đã compile với dict values (field -> str)"""
+    return ''.join(literal + (values[field_name] if field_name else '') for literal, field_name in parts)
+
+def _load_template_content(conn, template_name):
+    row = conn.execute(TEMPLATE_BY_NAME_SQL, (template_name,)).fetchone()
+    return row['template_content'] if row else None
+
+async def get_template(template_name):
+    """Trả về template đã compile theo tên (đọc DB ở lần đầu), None nếu không có"""
+    parts = _compiled_templates.get(template_name)
+    if parts is None:
+        version = _template_version
+        template_content = await db_read(_load_template_content, template_name)
+        if template_content is None:
+            return None
+        parts = compile_template(template_content)
+        # Template bị sửa/xóa trong lúc đọc: dùng kết quả cho lần gửi này nhưng không cache
+        if version == _template_version:
+            _compiled_templates[template_name] = parts
+    return parts
+
+def _save_template(conn, template_name, template_content):
+    """Thêm hoặc cập nhật template, trả về True nếu là template mới"""
+    existing = conn.execute('SELECT 1 FROM templates WHERE template_name = ?', (template_name,)).fetchone()
+    conn.execute('''
+        INSERT INTO templates (template_name, template_content) VALUES (?, ?)
+        ON CONFLICT (template_name) DO UPDATE SET template_content = excluded.template_content
+    ''', (template_name, template_content))
+    return existing is None
+
+def _load_templates(conn):
+    return conn.execute('SELECT template_name, template_content FROM templates ORDER BY template_name').fetchall()
+
+def _delete_template(conn, template_name):
+    return conn.execute('DELETE FROM templates WHERE template_name = ?', (template_name,)).rowcount
+
+TEMPLATE_USAGE = ('❌ Invalid syntax! Use:\n'
+                  '• `!template add <name> | <content>` - Add or replace a template\n'
+                  '• `!template list` - List templates\n'
+                  '• `!template delete <name>` - Delete a template\n'
+                  '• `!send -t <name> -p <partner> [| <message>]` - Send a template\n\n'
+                  '**Placeholders:** ' + ', '.join(f'`{{{field}}}` ({description})' for field, description in TEMPLATE_FIELDS.items()))
+
+# Hàm xử lý lệnh !template
+async def handle_template(message):
+    """Handle !template command (English)"""
+    try:
+        content = message.content
+        parts = content.split(maxsplit=2)
+        action = parts[1] if len(parts) > 1 else ''
+
+        if action == 'list':
+            templates = await db_read(_load_templates)
+            if not templates:
+                await message.channel.send('📋 No templates yet. Use `!template add <name> | <content>`')
+                return
+            response = '**📝 Templates:**\n\n'
+            for t in templates:
+                preview = t['template_content'][:80] + ('...' if len(t['template_content']) > 80 else '')
+                response += f"• **{t['template_name']}**: {preview}\n"
+            await message.channel.send(response)
+            return
+
+        if action == 'delete' and len(parts) == 3:
+            template_name = parts[2].strip()
+            deleted = await db_write(_delete_template, template_name)
+            invalidate_template(template_name)
+            if not deleted:
+                await message.channel.send(f'❌ Template not found: **{template_name}**')
+                return
+            log_action("TEMPLATE", f"User {message.author} deleted template {template_name}")
+            await message.channel.send(f'✅ Deleted template **{template_name}**')
+            return
+
+        if action == 'add' and '|' in content:
+            name_part, template_content = content.split('|', 1)
+            name_tokens = name_part.split()[2:]
+            template_content = template_content.strip()
+            if len(name_tokens) != 1:
+                await message.channel.send('❌ Template name must be a single word. Use: !template add <name> | <content>')
+                return
+            template_name = name_tokens[0]
+
+            is_valid, error_msg = validate_message_content(template_content)
+            if not is_valid:
+                await message.channel.send(f'❌ {error_msg}')
+                return
+            try:
+                compile_template(template_content)
+            except ValueError as e:
+                await message.channel.send(f'❌ {e}. Available: ' + ', '.join(f'`{{{field}}}`' for field in TEMPLATE_FIELDS))
+                return
+
+            is_new = await db_write(_save_template, template_name, template_content)
+            invalidate_template(template_name)
+            log_action("TEMPLATE", f"User {message.author} {'added' if is_new else 'updated'} template {template_name}")
+            await message.channel.send(f"✅ Template **{template_name}** {'added' if is_new else 'updated'}")
+            return
+
+        await message.channel.send(TEMPLATE_USAGE)
+    except Exception as e:
+        command_failed()
+        log_action("ERROR", f"Template error: {e}")
+        await message.channel.send(f'❌ Error: {e}')
@@ -0,0 +1,49 @@
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+# Timezone offset ('+07:00') và thời gian dạng epoch milliseconds (int, UTC):
+# mỗi chuỗi offset chỉ được parse một lần, các tzinfo được dùng chung
+
+DEFAULT_TIMEZONE = '+07:00'
+
+# Chỉ chấp nhận đúng dạng ±HH:MM ('+0730', '+07:3', '+7' đều bị từ chối)
+_OFFSET_PATTERN = re.compile(r'([+-])([0-9]{2}):([0-9]{2})')
+
+@lru_cache(maxsize=None)
+def get_tzinfo(offset):
+    """'+05:30' / '-05:00' -> tzinfo (đã memoize); raise ValueError nếu sai định dạng"""
+    match = _OFFSET_PATTERN.fullmatch(offset) if isinstance(offset, str) else None
+    if not match:
+        raise ValueError(f'Invalid timezone offset: {offset!r}')
+    sign, hours, minutes = match.group(1), int(match.group(2)), int(match.group(3))
+    if hours > 23 or minutes > 59:
+        raise ValueError(f'Invalid timezone offset: {offset!r}')
+    delta = timedelta(hours=hours, minutes=minutes)
+    return timezone(-delta if sign == '-' else delta)
+
+@lru_cache(maxsize=None)
+def _offset_seconds(offset):
+    return int(get_tzinfo(offset).utcoffset(None).total_seconds())
+
+def now_epoch_ms():
+    return time.time_ns() // 1_000_000
+
+def to_epoch_ms(value):
+    """int (epoch ms), datetime hoặc chuỗi ISO -> epoch ms; chuỗi/datetime không có tzinfo được coi là UTC"""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+def from_epoch_ms(epoch_ms, offset=None):
+    """epoch ms -> datetime có tzinfo (UTC nếu không truyền offset)"""
+    return datetime.fromtimestamp(epoch_ms / 1000, get_tzinfo(offset) if offset else timezone.utc)
+
+def format_epoch_ms(epoch_ms, offset=DEFAULT_TIMEZONE):
+    """epoch ms -> 'YYYY-MM-DD HH:MM:SS' theo offset (cộng offset rồi format như UTC, không tạo datetime)"""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(epoch_ms // 1000 + _offset_seconds(offset)))
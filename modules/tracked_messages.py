@@ -0,0 +1,31 @@
+from modules.logger import log_debug
+
+# discord_message_id của các tin bot đã gửi và đang được tracking trong bảng messages.
+# on_message dùng set này để bỏ qua reply vào tin khác mà không cần query SQLite.
+# Id của messages đã bị xóa có thể còn trong set: reply vào đó chỉ rơi xuống tra DB như trước.
+_tracked_ids = set()
+_loaded = False
+
+def load_tracked_messages(conn):
+    """Nạp toàn bộ discord_message_id từ bảng messages (gọi một lần khi khởi động)"""
+    global _loaded
+    _tracked_ids.clear()
+    for (discord_message_id,) in conn.execute(
+        'SELECT DISTINCT discord_message_id FROM messages WHERE discord_message_id IS NOT NULL'
+    ):
+        try:
+            _tracked_ids.add(int(discord_message_id))
+        except (TypeError, ValueError):
+            continue
+    _loaded = True
+    log_debug("Tracking %s sent message(s) for status replies", len(_tracked_ids))
+    return len(_tracked_ids)
+
+def track_message(discord_message_id):
+    _tracked_ids.add(int(discord_message_id))
+
+def is_tracked_message(discord_message_id):
+    """True nếu có thể là tin bot đang tracking; chưa nạp thì luôn True để không bỏ sót reply"""
+    if not _loaded:
+        return True
+    return discord_message_id is not None and int(discord_message_id) in _tracked_ids
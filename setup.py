@@ -6,6 +6,7 @@ Script setup để kiểm tra và khởi tạo database cho Bot Discord
 import sqlite3
 import os
 from datetime import datetime
+from modules.migrations import apply_migrations, get_schema_version
 
 def setup_database():
     """Khởi tạo database và tạo các bảng cần thiết"""
@@ -13,95 +14,13 @@ def setup_database():
     
     # Kết nối database
     conn = sqlite3.connect('bot_database.db')
-    cur = conn.cursor()
     
-    # Tạo bảng partners
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS partners (
-            partner_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            partner_name TEXT NOT NULL,
-            server_id TEXT NOT NULL,
-            timezone TEXT DEFAULT '+07:00',
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(partner_name, server_id)
-        )
-    ''')
-    print("✅ Bảng partners đã được tạo")
+    # Tạo/cập nhật bảng qua migration (partners, partner_discord_users, projects, messages, schedules, templates)
+    applied = apply_migrations(conn)
+    for version, name in applied:
+        print(f"✅ Migration {version}: {name}")
+    print(f"✅ Schema version: {get_schema_version(conn)}")
     
-    # Tạo bảng partner_discord_users để lưu nhiều Discord users cho một partner
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS partner_discord_users (
-            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            partner_id INTEGER NOT NULL,
-            discord_username TEXT NOT NULL,
-            tag_type TEXT DEFAULT 'username',
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (partner_id) REFERENCES partners (partner_id) ON DELETE CASCADE,
-            UNIQUE(partner_id, discord_username)
-        )
-    ''')
-    print("✅ Bảng partner_discord_users đã được tạo")
-    
-    # Tạo bảng projects
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS projects (
-            project_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            project_name TEXT NOT NULL,
-            partner_id INTEGER NOT NULL,
-            channel_id TEXT NOT NULL,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (partner_id) REFERENCES partners (partner_id) ON DELETE CASCADE,
-            UNIQUE(project_name, partner_id)
-        )
-    ''')
-    print("✅ Bảng projects đã được tạo")
-    
-    # Tạo bảng messages
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS messages (
-            message_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            partner_id INTEGER NOT NULL,
-            project_id INTEGER NOT NULL,
-            content TEXT NOT NULL,
-            discord_message_id TEXT,
-            status TEXT DEFAULT 'request',
-            reply_timestamp TEXT,
-            timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (partner_id) REFERENCES partners (partner_id) ON DELETE CASCADE,
-            FOREIGN KEY (project_id) REFERENCES projects (project_id) ON DELETE CASCADE
-        )
-    ''')
-    print("✅ Bảng messages đã được tạo")
-    
-    # Tạo bảng schedules
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS schedules (
-            schedule_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            partner_id INTEGER NOT NULL,
-            project_id INTEGER NOT NULL,
-            content TEXT NOT NULL,
-            scheduled_for TEXT NOT NULL,
-            status TEXT DEFAULT 'pending',
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (partner_id) REFERENCES partners (partner_id) ON DELETE CASCADE,
-            FOREIGN KEY (project_id) REFERENCES projects (project_id) ON DELETE CASCADE
-        )
-    ''')
-    print("✅ Bảng schedules đã được tạo")
-    
-    # Tạo bảng templates
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS templates (
-            template_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            template_name TEXT NOT NULL UNIQUE,
-            template_content TEXT NOT NULL,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    print("✅ Bảng templates đã được tạo")
-    
-    # Commit và đóng kết nối
-    conn.commit()
     conn.close()
     
     print("✅ Database đã được khởi tạo thành công!")
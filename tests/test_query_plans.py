@@ -0,0 +1,8 @@
+import sqlite3
+from check_query_plans import HOT_QUERIES, find_full_scans
+from modules.migrations import apply_migrations
+
+def test_hot_queries_use_indexes():
+    conn = sqlite3.connect(':memory:')
+    apply_migrations(conn)
+    assert find_full_scans(conn, HOT_QUERIES) == []